@@ -0,0 +1,208 @@
+"""
+本機音訊快取 - 以影片 ID 為鍵的 Ogg/Opus 檔案快取
+
+- 有總容量上限，超過時依 LRU 順序刪除最久未播放的檔案
+- 以暫存檔寫入後 os.replace，避免播放到寫到一半的檔案
+- 由背景的 FFmpeg 子行程下載並轉檔，不阻塞播放
+"""
+
+import asyncio
+import logging
+import os
+from collections import Counter, OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AudioFileCache:
+    """Ogg/Opus 檔案的 LRU 快取"""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        ffmpeg_path: str = "ffmpeg",
+        min_plays: int = 2,
+        workers: int = 1,
+        bitrate: str = "128k",
+        timeout: float = 600.0,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ffmpeg_path = ffmpeg_path
+        self.min_plays = max(1, min_plays)
+        self.bitrate = bitrate
+        self.timeout = timeout
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # video_id -> 位元組
+        self._play_counts: Counter = Counter()
+        self._populating = {}  # video_id -> Task
+        self._workers = asyncio.Semaphore(max(1, workers))
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._scan()
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory, f"{video_id}.opus")
+
+    def _scan(self):
+        """啟動時掃描既有檔案，依修改時間重建 LRU 順序"""
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tmp"):
+                # 上次未完成的寫入
+                self._remove(entry.path)
+            elif entry.name.endswith(".opus"):
+                try:
+                    stat = entry.stat()
+                except OSError as e:
+                    logger.warning(f"略過無法讀取的音訊快取檔案: {entry.name}: {str(e)}")
+                    continue
+                files.append((stat.st_mtime, entry.name[: -len(".opus")], stat.st_size))
+
+        for _, video_id, size in sorted(files):
+            self._entries[video_id] = size
+            self.total_bytes += size
+        self._evict()
+        logger.info(
+            f"音訊快取: {len(self._entries)} 個檔案, {self.total_bytes / 1024 / 1024:.1f} MB"
+        )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, video_id):
+        return video_id in self._entries
+
+    def lookup(self, video_id: Optional[str]) -> Optional[str]:
+        """查詢快取檔案路徑；命中時更新 LRU 順序"""
+        if video_id and video_id in self._entries:
+            path = self._path(video_id)
+            if os.path.exists(path):
+                self._entries.move_to_end(video_id)
+                self.hits += 1
+                try:
+                    os.utime(path)  # 讓重新啟動後的 LRU 順序保持正確
+                except OSError:
+                    pass
+                return path
+            self.total_bytes -= self._entries.pop(video_id)
+
+        self.misses += 1
+        return None
+
+    def record_play(self, video_id: Optional[str], stream_url: str, copy: bool = False):
+        """記錄一次播放；播放次數達到門檻時在背景寫入快取
+
+        copy=True 表示來源已是 Opus，只需重新封裝為 Ogg 而不必轉碼。
+        """
+        if not video_id or video_id in self._entries or video_id in self._populating:
+            return
+        if len(self._play_counts) > 10000:
+            self._play_counts.clear()  # 避免計數表無限成長
+        self._play_counts[video_id] += 1
+        if self._play_counts[video_id] < self.min_plays:
+            return
+
+        del self._play_counts[video_id]
+        task = asyncio.create_task(self._populate(video_id, stream_url, copy))
+        self._populating[video_id] = task
+
+    async def _populate(self, video_id: str, stream_url: str, copy: bool = False):
+        """以 FFmpeg 下載並轉成 Ogg/Opus，完成後原子替換進快取"""
+        path = self._path(video_id)
+        tmp_path = f"{path}.tmp"
+        try:
+            async with self._workers:
+                process = await asyncio.create_subprocess_exec(
+                    self.ffmpeg_path,
+                    "-nostdin",
+                    "-loglevel",
+                    "error",
+                    "-reconnect",
+                    "1",
+                    "-reconnect_streamed",
+                    "1",
+                    "-reconnect_delay_max",
+                    "5",
+                    "-i",
+                    stream_url,
+                    "-vn",
+                    *(
+                        ["-c:a", "copy"]
+                        if copy
+                        else ["-c:a", "libopus", "-b:a", self.bitrate]
+                    ),
+                    "-f",
+                    "ogg",
+                    "-y",
+                    tmp_path,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+                try:
+                    _, stderr = await asyncio.wait_for(
+                        process.communicate(), timeout=self.timeout
+                    )
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    process.kill()
+                    await process.wait()
+                    raise
+
+            if process.returncode != 0:
+                raise RuntimeError(stderr.decode(errors="ignore")[-300:])
+
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+            self._entries[video_id] = size
+            self.total_bytes += size
+            self._evict()
+            logger.info(f"已寫入音訊快取: {video_id} ({size / 1024:.0f} KB)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"寫入音訊快取失敗: {video_id}: {str(e)}")
+        finally:
+            self._populating.pop(video_id, None)
+            if os.path.exists(tmp_path):
+                self._remove(tmp_path)
+
+    def _evict(self):
+        """超過容量上限時刪除最久未使用的檔案"""
+        while self.total_bytes > self.max_bytes and self._entries:
+            video_id, size = self._entries.popitem(last=False)
+            self.total_bytes -= size
+            # 刪除失敗（例如檔案仍被開啟）時也不再追蹤，避免反覆嘗試
+            if self._remove(self._path(video_id)):
+                logger.info(f"已從音訊快取移除: {video_id}")
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        """刪除檔案；檔案仍被開啟或目錄唯讀時記錄後略過，回傳是否已不存在"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"無法刪除音訊快取檔案 {os.path.basename(path)}: {str(e)}")
+            return False
+        return True
+
+    def cancel_all(self):
+        """取消所有背景寫入"""
+        for task in list(self._populating.values()):
+            task.cancel()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "files": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "populating": len(self._populating),
+        }
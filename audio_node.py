@@ -0,0 +1,897 @@
+"""
+音訊節點 - 在獨立行程中管理語音連線與 FFmpeg
+
+機器人只保留 Gateway 連線，語音 WebSocket／UDP、播放執行緒與 FFmpeg 子行程
+都移到節點行程，不再與機器人的事件迴圈競爭 GIL。Music 透過本機 socket
+（每行一個 JSON 訊息）控制節點：
+
+- 請求：connect、voice_update、play、stop、skip、seek、destroy、stats，
+  回應為 {"id": n, "ok": true, ...} 或 {"id": n, "ok": false, "error": "..."}
+- 事件：track_start、track_end、track_error，以及 voice_request
+  （節點請機器人在 Gateway 上加入或離開語音頻道）
+
+語音交握沿用 discord.py 的 VoiceClient：機器人把自己的 VOICE_STATE_UPDATE 與
+VOICE_SERVER_UPDATE 轉送給節點，節點以同一個 Bot Token 透過 HTTP 登入後自行
+連線到語音伺服器（不開啟 Gateway）。
+
+以 --stand-in 啟動時不連線到 Discord，語音客戶端以相同節奏讀取並丟棄封包，
+音訊源為依歌曲長度產生的靜音封包（加上 --with-ffmpeg 則照常執行 FFmpeg），
+供測試與負載模擬使用。
+
+用法：
+    python audio_node.py --address 127.0.0.1:2334
+    python audio_node.py --address /tmp/partybot-audio.sock --stand-in
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import discord
+from discord.opus import OPUS_SILENCE
+from discord.player import AudioPlayer
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.02  # 每個 Opus 封包 20 ms
+STREAM_LIMIT = 2**20  # 單行訊息上限（語音狀態事件含成員資料）
+
+
+class AudioNodeError(Exception):
+    """節點請求失敗或連線中斷"""
+
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """'host:port' 為 TCP，其餘（路徑或 unix: 前綴）為 Unix socket"""
+    if address.startswith("unix:"):
+        return "unix", address[5:]
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return "tcp", (host or "127.0.0.1", int(port))
+    return "unix", address
+
+
+async def open_connection(address: str):
+    kind, target = parse_address(address)
+    if kind == "unix":
+        return await asyncio.open_unix_connection(target, limit=STREAM_LIMIT)
+    return await asyncio.open_connection(*target, limit=STREAM_LIMIT)
+
+
+async def start_server(handler, address: str):
+    kind, target = parse_address(address)
+    if kind == "unix":
+        if os.path.exists(target):
+            os.unlink(target)  # 上次異常結束留下的 socket 檔案
+        return await asyncio.start_unix_server(handler, target, limit=STREAM_LIMIT)
+    return await asyncio.start_server(handler, *target, limit=STREAM_LIMIT)
+
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode() + b"\n"
+
+
+class NodeTrack:
+    """交給節點播放的音軌：與 FFmpegOpusAudio 相同的參數，由節點建立音訊源"""
+
+    def __init__(
+        self,
+        source: str,
+        *,
+        codec: Optional[str] = None,
+        bitrate: int = 128,
+        before_options: Optional[str] = None,
+        options: Optional[str] = None,
+        duration: Optional[float] = None,
+        position: float = 0.0,
+    ):
+        self.source = source
+        self.codec = codec
+        self.bitrate = bitrate
+        self.before_options = before_options
+        self.options = options
+        self.duration = duration
+        self.position = position
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "codec": self.codec,
+            "bitrate": self.bitrate,
+            "before_options": self.before_options,
+            "options": self.options,
+            "duration": self.duration,
+        }
+
+
+# ---------------------------------------------------------------------------
+# 機器人端
+# ---------------------------------------------------------------------------
+
+
+class NodeVoiceClient(discord.VoiceProtocol):
+    """由音訊節點負責語音連線的 VoiceProtocol
+
+    提供 Music 使用的 VoiceClient 介面（play、stop、is_playing、is_connected、
+    disconnect），實際的語音連線與 FFmpeg 都在節點中。以
+    channel.connect(cls=node.voice_client) 建立。
+    """
+
+    def __init__(self, client, channel, node: "AudioNodeClient"):
+        super().__init__(client, channel)
+        self.node = node
+        self.guild = channel.guild
+        self._connected = False
+        self._current: Optional[int] = None
+        # track_id -> (after, on_start)
+        self._tracks: Dict[int, Tuple[Optional[Callable], Optional[Callable]]] = {}
+        self.position = 0.0  # 最後一次事件回報的播放位置（秒）
+
+    # 由 discord.py 在收到機器人自己的語音事件時呼叫，轉送給節點完成語音交握
+    async def on_voice_state_update(self, data):
+        channel_id = data.get("channel_id")
+        if channel_id is not None:
+            self.channel = self.guild.get_channel(int(channel_id)) or self.channel
+        try:
+            await self.node.request(
+                "voice_update", guild_id=self.guild.id, kind="state", data=data
+            )
+        except AudioNodeError as e:
+            logger.warning(f"轉送語音狀態到節點失敗 (伺服器 ID: {self.guild.id}): {str(e)}")
+        if channel_id is None and self._connected:
+            # 被踢出或頻道被刪除
+            self._connected = False
+            self._fail_tracks(None)
+            self.cleanup()
+
+    async def on_voice_server_update(self, data):
+        try:
+            await self.node.request(
+                "voice_update", guild_id=self.guild.id, kind="server", data=data
+            )
+        except AudioNodeError as e:
+            logger.warning(f"轉送語音伺服器資訊到節點失敗 (伺服器 ID: {self.guild.id}): {str(e)}")
+
+    async def connect(self, *, timeout: float, reconnect: bool, self_deaf: bool = False, self_mute: bool = False):
+        self.node.voice_clients[self.guild.id] = self
+        await self.node.request(
+            "connect",
+            guild_id=self.guild.id,
+            channel_id=self.channel.id,
+            self_deaf=self_deaf,
+            self_mute=self_mute,
+            reconnect=reconnect,
+            connect_timeout=timeout,
+            timeout=timeout + self.node.request_timeout,
+        )
+        self._connected = True
+
+    async def disconnect(self, *, force: bool = False):
+        if not force and not self._connected:
+            return
+        self._fail_tracks(None)
+        try:
+            await self.node.request("destroy", guild_id=self.guild.id)
+        except AudioNodeError:
+            # 節點無法處理時由機器人直接離開頻道
+            await self.guild.change_voice_state(channel=None)
+        finally:
+            self._connected = False
+            self.cleanup()
+
+    def cleanup(self):
+        if self.node.voice_clients.get(self.guild.id) is self:
+            del self.node.voice_clients[self.guild.id]
+        super().cleanup()
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_playing(self) -> bool:
+        return self._current is not None
+
+    def play(self, source: NodeTrack, *, after=None, on_start=None):
+        """要求節點播放音軌；after 在節點回報結束或錯誤時呼叫（於事件迴圈中）"""
+        if not self._connected:
+            raise discord.ClientException("Not connected to voice.")
+        if self.is_playing():
+            raise discord.ClientException("Already playing audio.")
+        track_id = self.node.next_track_id()
+        self._current = track_id
+        self._tracks[track_id] = (after, on_start)
+        self.position = source.position
+        self.node.spawn(
+            self._request_track(
+                "play",
+                track_id,
+                track=source.to_payload(),
+                track_id=track_id,
+                position=source.position,
+            )
+        )
+
+    def stop(self):
+        """停止目前的音軌；節點回報 track_end 後才呼叫 after"""
+        self._send_stop("stop")
+
+    def skip(self):
+        self._send_stop("skip")
+
+    def _send_stop(self, op: str):
+        if self._current is None:
+            return
+        track_id, self._current = self._current, None
+        self.node.spawn(self._request_track(op, track_id))
+
+    async def seek(self, position: float) -> float:
+        """跳到目前音軌的指定位置（秒），回傳節點實際的播放位置"""
+        if self._current is None:
+            raise discord.ClientException("Not playing audio.")
+        result = await self.node.request(
+            "seek", guild_id=self.guild.id, position=max(0.0, position)
+        )
+        self.position = result.get("position", position)
+        return self.position
+
+    async def _request_track(self, op: str, current: int, **data):
+        try:
+            await self.node.request(op, guild_id=self.guild.id, **data)
+        except AudioNodeError as e:
+            self._finish_track(current, e)
+
+    def _finish_track(self, track_id: int, error: Optional[Exception]):
+        callbacks = self._tracks.pop(track_id, None)
+        if self._current == track_id:
+            self._current = None
+        if callbacks and callbacks[0]:
+            try:
+                callbacks[0](error)
+            except Exception:
+                logger.exception("音軌結束回調失敗")
+
+    def _fail_tracks(self, error: Optional[Exception]):
+        for track_id in list(self._tracks):
+            self._finish_track(track_id, error)
+
+    async def handle_event(self, event: str, data: Dict[str, Any]):
+        track_id = data.get("track_id")
+        if "position" in data:
+            self.position = data["position"]
+        if event == "track_start":
+            # seek 重新啟動 FFmpeg 時也會送出 track_start，on_start 只在第一次呼叫
+            callbacks = self._tracks.get(track_id)
+            if callbacks and callbacks[1]:
+                self._tracks[track_id] = (callbacks[0], None)
+                callbacks[1]()
+        elif event == "track_end":
+            self._finish_track(track_id, None)
+        elif event == "track_error":
+            self._finish_track(track_id, AudioNodeError(data.get("error", "unknown")))
+        elif event == "voice_request":
+            channel_id = data.get("channel_id")
+            await self.guild.change_voice_state(
+                channel=discord.Object(id=int(channel_id)) if channel_id else None,
+                self_mute=data.get("self_mute", False),
+                self_deaf=data.get("self_deaf", False),
+            )
+
+    def node_lost(self):
+        """節點連線中斷：語音連線已隨節點消失，離開頻道讓 Music 重設狀態"""
+        self._connected = False
+        self._fail_tracks(AudioNodeError("音訊節點連線中斷"))
+        self.cleanup()
+        self.node.spawn(self.guild.change_voice_state(channel=None))
+
+
+class AudioNodeClient:
+    """機器人端的節點連線：送出請求並把事件分派到各伺服器的 NodeVoiceClient
+
+    連線中斷時讓所有進行中的請求失敗，並在背景重新連線。
+    """
+
+    def __init__(self, address: str, *, request_timeout: float = 10.0, reconnect_delay: float = 2.0):
+        self.address = address
+        self.request_timeout = request_timeout
+        self.reconnect_delay = reconnect_delay
+        self.voice_clients: Dict[int, NodeVoiceClient] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._track_ids = itertools.count(1)
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self.requests = 0
+        self.reconnects = 0
+
+    def voice_client(self, client, channel) -> NodeVoiceClient:
+        """作為 channel.connect(cls=...) 的工廠"""
+        return NodeVoiceClient(client, channel, self)
+
+    def next_track_id(self) -> int:
+        return next(self._track_ids)
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def is_connected(self) -> bool:
+        return self._connected.is_set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def wait_connected(self, timeout: Optional[float] = None):
+        await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._writer:
+            self._writer.close()
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await open_connection(self.address)
+            except OSError as e:
+                logger.warning(f"無法連線到音訊節點 {self.address}: {str(e)}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            self._writer = writer
+            self._connected.set()
+            logger.info(f"已連線到音訊節點 {self.address}")
+            try:
+                while line := await reader.readline():
+                    self._dispatch(json.loads(line))
+            except (OSError, ValueError) as e:
+                logger.error(f"讀取音訊節點訊息時發生錯誤: {str(e)}")
+            finally:
+                self._connected.clear()
+                self._writer = None
+                writer.close()
+                self._connection_lost()
+
+            self.reconnects += 1
+            logger.warning(f"音訊節點連線中斷，{self.reconnect_delay} 秒後重新連線")
+            await asyncio.sleep(self.reconnect_delay)
+
+    def _connection_lost(self):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(AudioNodeError("音訊節點連線中斷"))
+        self._pending.clear()
+        for voice_client in list(self.voice_clients.values()):
+            voice_client.node_lost()
+
+    def _dispatch(self, message: Dict[str, Any]):
+        if "id" in message:
+            future = self._pending.pop(message["id"], None)
+            if future and not future.done():
+                if message.get("ok"):
+                    future.set_result(message)
+                else:
+                    future.set_exception(AudioNodeError(message.get("error", "unknown")))
+            return
+
+        voice_client = self.voice_clients.get(message.get("guild_id"))
+        if voice_client:
+            self.spawn(voice_client.handle_event(message["event"], message))
+
+    async def request(self, op: str, *, timeout: Optional[float] = None, **data) -> Dict[str, Any]:
+        if self._writer is None:
+            raise AudioNodeError("尚未連線到音訊節點")
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.requests += 1
+        try:
+            self._writer.write(encode_message({"id": request_id, "op": op, **data}))
+            return await asyncio.wait_for(future, timeout or self.request_timeout)
+        except asyncio.TimeoutError:
+            raise AudioNodeError(f"音訊節點請求逾時: {op}") from None
+        finally:
+            self._pending.pop(request_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.is_connected(),
+            "voice_clients": len(self.voice_clients),
+            "requests": self.requests,
+            "reconnects": self.reconnects,
+        }
+
+
+# ---------------------------------------------------------------------------
+# 節點端
+# ---------------------------------------------------------------------------
+
+
+class _RemoteGuild:
+    """節點端的伺服器替身：語音狀態變更轉交給持有 Gateway 連線的機器人"""
+
+    def __init__(self, guild_id: int, session: "NodeSession"):
+        self.id = guild_id
+        self._session = session
+        self.me = SimpleNamespace(voice=None)
+
+    def get_channel(self, channel_id: int) -> "_RemoteChannel":
+        return _RemoteChannel(channel_id, self)
+
+    async def change_voice_state(self, *, channel, self_mute: bool = False, self_deaf: bool = False, **kwargs):
+        self._session.send_event(
+            "voice_request",
+            guild_id=self.id,
+            channel_id=channel.id if channel else None,
+            self_mute=self_mute,
+            self_deaf=self_deaf,
+        )
+
+
+class _RemoteChannel:
+    def __init__(self, channel_id: int, guild: _RemoteGuild):
+        self.id = channel_id
+        self.guild = guild
+
+    def _get_voice_client_key(self):
+        return self.guild.id, "guild_id"
+
+
+class _StandInWebSocket:
+    async def speak(self, state):
+        pass
+
+
+class StandInVoiceClient:
+    """不連線到 Discord 的語音客戶端
+
+    使用 discord.py 的 AudioPlayer 以相同的 20 ms 節奏讀取音訊源，
+    封包只計數後丟棄。
+    """
+
+    timeout = 30.0
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.client = SimpleNamespace(loop=loop)
+        self.ws = _StandInWebSocket()
+        self._player: Optional[AudioPlayer] = None
+        self._connected = False
+        self.packets_sent = 0
+        self.bytes_sent = 0
+
+    async def connect(self, **kwargs):
+        self._connected = True
+
+    async def disconnect(self, *, force: bool = False):
+        self.stop()
+        self._connected = False
+
+    async def on_voice_state_update(self, data):
+        pass
+
+    async def on_voice_server_update(self, data):
+        pass
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def wait_until_connected(self, timeout: Optional[float] = None) -> bool:
+        return self._connected
+
+    def send_audio_packet(self, data: bytes, *, encode: bool = True):
+        self.packets_sent += 1
+        self.bytes_sent += len(data)
+
+    def play(self, source: discord.AudioSource, *, after=None):
+        if not self._connected:
+            raise discord.ClientException("Not connected to voice.")
+        if self.is_playing():
+            raise discord.ClientException("Already playing audio.")
+        self._player = AudioPlayer(source, self, after=after)
+        self._player.start()
+
+    def is_playing(self) -> bool:
+        return self._player is not None and self._player.is_playing()
+
+    def stop(self):
+        if self._player:
+            self._player.stop()
+            self._player = None
+
+
+class SilenceSource(discord.AudioSource):
+    """替身節點的音訊源：在指定長度內回傳靜音封包，不啟動 FFmpeg"""
+
+    def __init__(self, seconds: float):
+        self.remaining = max(0, round(seconds / FRAME_SECONDS))
+
+    def read(self) -> bytes:
+        if self.remaining <= 0:
+            return b""
+        self.remaining -= 1
+        return OPUS_SILENCE
+
+    def is_opus(self) -> bool:
+        return True
+
+
+class TrackSource(discord.AudioSource):
+    """包裝音訊源：計算已送出的封包數，並在第一個封包時通知事件迴圈"""
+
+    def __init__(self, source: discord.AudioSource, loop, on_start: Callable[[], None]):
+        self.source = source
+        self.frames = 0
+        self._loop = loop
+        self._on_start = on_start
+
+    def read(self) -> bytes:
+        data = self.source.read()
+        if data:
+            self.frames += 1
+            if self._on_start is not None:
+                on_start, self._on_start = self._on_start, None
+                self._loop.call_soon_threadsafe(on_start)
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.source.cleanup()
+
+
+class NodePlayer:
+    """節點中單一伺服器的播放狀態
+
+    每次播放（包含 seek 重新啟動 FFmpeg）都會遞增 generation，
+    被取代的播放執行緒結束時不會再送出事件。
+    """
+
+    def __init__(self, node: "AudioNode", session: "NodeSession", guild_id: int, voice):
+        self.node = node
+        self.session = session
+        self.guild_id = guild_id
+        self.voice = voice
+        self.track: Optional[Dict[str, Any]] = None
+        self.track_id: Optional[int] = None
+        self.generation = 0
+        self.offset = 0.0
+        self._source: Optional[TrackSource] = None
+        self._end_reason: Optional[str] = None
+
+    @property
+    def position(self) -> float:
+        frames = self._source.frames if self._source else 0
+        return round(self.offset + frames * FRAME_SECONDS, 3)
+
+    @property
+    def ffmpeg_running(self) -> bool:
+        process = getattr(self._source.source, "_process", None) if self._source else None
+        return process is not None and process.poll() is None
+
+    def _create_source(self, track: Dict[str, Any], position: float) -> discord.AudioSource:
+        if self.node.stand_in and not self.node.with_ffmpeg:
+            duration = track.get("duration") or self.node.track_seconds
+            return SilenceSource(duration - position)
+
+        before_options = track.get("before_options") or ""
+        if position > 0:
+            # 放在輸入端：HTTP 來源以 Range 請求直接跳到位置，不需先解碼前段
+            before_options = f"{before_options} -ss {position:.3f}".strip()
+        return discord.FFmpegOpusAudio(
+            track["source"],
+            bitrate=track.get("bitrate") or 128,
+            codec=track.get("codec"),
+            executable=self.node.ffmpeg_path,
+            before_options=before_options or None,
+            options=track.get("options"),
+        )
+
+    def play(self, track: Dict[str, Any], track_id: int, position: float = 0.0):
+        if self.track_id is not None and self.track_id != track_id:
+            # 取代正在播放的音軌，先回報上一首結束
+            self.session.send_event(
+                "track_end",
+                guild_id=self.guild_id,
+                track_id=self.track_id,
+                reason="replaced",
+                position=self.position,
+            )
+        self.voice.stop()
+        self.generation += 1
+        generation = self.generation
+        self.track, self.track_id, self.offset = track, track_id, position
+        self._end_reason = None
+        loop = asyncio.get_running_loop()
+        self._source = TrackSource(
+            self._create_source(track, position),
+            loop,
+            lambda: self._on_start(generation),
+        )
+        self.voice.play(
+            self._source,
+            after=lambda error: loop.call_soon_threadsafe(self._on_finished, generation, error),
+        )
+
+    def seek(self, position: float) -> float:
+        if self.track is None:
+            raise AudioNodeError("目前沒有播放中的音軌")
+        duration = self.track.get("duration")
+        if duration:
+            position = min(position, max(0.0, duration - 1))
+        self.play(self.track, self.track_id, position)
+        return position
+
+    def stop(self, reason: str):
+        if self.track is None:
+            return
+        self._end_reason = reason
+        self.voice.stop()
+
+    def _on_start(self, generation: int):
+        if generation == self.generation and self.track_id is not None:
+            self.session.send_event(
+                "track_start",
+                guild_id=self.guild_id,
+                track_id=self.track_id,
+                position=self.offset,
+            )
+
+    def _on_finished(self, generation: int, error: Optional[Exception]):
+        if generation != self.generation or self.track_id is None:
+            return  # 已被新的播放取代
+        if error is None and self._source is not None:
+            error = getattr(self._source.source, "_current_error", None)
+        position = self.position
+        track_id, self.track_id, self.track = self.track_id, None, None
+        if error is not None:
+            self.session.send_event(
+                "track_error",
+                guild_id=self.guild_id,
+                track_id=track_id,
+                error=f"{type(error).__name__}: {error}",
+                position=position,
+            )
+        else:
+            self.session.send_event(
+                "track_end",
+                guild_id=self.guild_id,
+                track_id=track_id,
+                reason=self._end_reason or "finished",
+                position=position,
+            )
+
+
+class NodeSession:
+    """一個機器人行程（叢集模式下每個行程各一條）與節點之間的連線"""
+
+    def __init__(self, node: "AudioNode", reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.node = node
+        self.reader = reader
+        self.writer = writer
+        self._tasks = set()
+
+    def send_event(self, event: str, **data):
+        if not self.writer.is_closing():
+            self.writer.write(encode_message({"event": event, **data}))
+
+    async def run(self):
+        try:
+            while line := await self.reader.readline():
+                message = json.loads(line)
+                task = asyncio.create_task(self._handle(message))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (OSError, ValueError) as e:
+            logger.error(f"讀取機器人訊息時發生錯誤: {str(e)}")
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            self.writer.close()
+
+    async def _handle(self, message: Dict[str, Any]):
+        request_id = message.pop("id", None)
+        op = message.pop("op", None)
+        try:
+            handler = getattr(self.node, f"op_{op}", None)
+            if handler is None:
+                raise AudioNodeError(f"未知的操作: {op}")
+            result = await handler(self, **message) or {}
+            reply = {"id": request_id, "ok": True, **result}
+        except Exception as e:
+            if not isinstance(e, AudioNodeError):
+                logger.exception(f"處理節點請求 {op} 時發生錯誤")
+            reply = {"id": request_id, "ok": False, "error": f"{type(e).__name__}: {e}"}
+        if not self.writer.is_closing():
+            self.writer.write(encode_message(reply))
+
+
+class AudioNode:
+    """音訊節點伺服器：每個伺服器一個 NodePlayer，由建立它的連線控制"""
+
+    def __init__(
+        self,
+        address: str,
+        *,
+        token: Optional[str] = None,
+        stand_in: bool = False,
+        with_ffmpeg: bool = False,
+        track_seconds: float = 30.0,
+        ffmpeg_path: str = "ffmpeg",
+    ):
+        self.address = address
+        self.token = token
+        self.stand_in = stand_in
+        self.with_ffmpeg = with_ffmpeg
+        self.track_seconds = track_seconds
+        self.ffmpeg_path = ffmpeg_path
+        self.players: Dict[int, NodePlayer] = {}
+        self.client: Optional[discord.Client] = None
+        self._server = None
+        self.started_at = time.monotonic()
+
+    async def start(self):
+        if not self.stand_in:
+            # 只以 HTTP 登入取得機器人使用者與連線工作階段，不開啟 Gateway
+            self.client = discord.Client(intents=discord.Intents.none())
+            await self.client.login(self.token)
+            logger.info(f"音訊節點已登入為 {self.client.user}")
+        self._server = await start_server(self._on_connection, self.address)
+        logger.info(
+            f"音訊節點監聽 {self.address}{'（替身模式）' if self.stand_in else ''}"
+        )
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        for guild_id in list(self.players):
+            await self._destroy(guild_id)
+        if self._server:
+            self._server.close()
+        if self.client:
+            await self.client.close()
+
+    async def _on_connection(self, reader, writer):
+        session = NodeSession(self, reader, writer)
+        logger.info("機器人已連線")
+        await session.run()
+        # 機器人離線：釋放它建立的所有播放器
+        for guild_id, player in list(self.players.items()):
+            if player.session is session:
+                await self._destroy(guild_id)
+        logger.info("機器人連線已關閉")
+
+    def _player(self, guild_id: int) -> NodePlayer:
+        player = self.players.get(guild_id)
+        if player is None:
+            raise AudioNodeError(f"伺服器 {guild_id} 沒有語音連線")
+        return player
+
+    def _create_voice(self, session: NodeSession, guild_id: int, channel_id: int):
+        if self.stand_in:
+            return StandInVoiceClient(asyncio.get_running_loop())
+        channel = _RemoteChannel(channel_id, _RemoteGuild(guild_id, session))
+        return discord.VoiceClient(self.client, channel)
+
+    async def _destroy(self, guild_id: int):
+        player = self.players.pop(guild_id, None)
+        if player is None:
+            return
+        player.generation += 1  # 不再送出事件
+        try:
+            await player.voice.disconnect(force=True)
+        except Exception as e:
+            logger.error(f"中斷語音連線時發生錯誤 (伺服器 ID: {guild_id}): {str(e)}")
+
+    async def op_connect(
+        self,
+        session,
+        *,
+        guild_id: int,
+        channel_id: int,
+        self_deaf: bool = False,
+        self_mute: bool = False,
+        reconnect: bool = True,
+        connect_timeout: float = 30.0,
+    ):
+        await self._destroy(guild_id)
+        voice = self._create_voice(session, guild_id, channel_id)
+        player = NodePlayer(self, session, guild_id, voice)
+        self.players[guild_id] = player
+        try:
+            await voice.connect(
+                reconnect=reconnect, timeout=connect_timeout, self_deaf=self_deaf, self_mute=self_mute
+            )
+        except BaseException:
+            self.players.pop(guild_id, None)
+            raise
+
+    async def op_voice_update(self, session, *, guild_id: int, kind: str, data: Dict[str, Any]):
+        player = self.players.get(guild_id)
+        if player is None:
+            return
+        if kind == "server":
+            await player.voice.on_voice_server_update(data)
+            return
+        await player.voice.on_voice_state_update(data)
+        if data.get("channel_id") is None:
+            # 機器人已離開頻道（被踢出或主動離開）
+            await self._destroy(guild_id)
+
+    async def op_play(self, session, *, guild_id: int, track: Dict[str, Any], track_id: int, position: float = 0.0):
+        self._player(guild_id).play(track, track_id, position)
+
+    async def op_stop(self, session, *, guild_id: int):
+        self._player(guild_id).stop("stopped")
+
+    async def op_skip(self, session, *, guild_id: int):
+        self._player(guild_id).stop("skipped")
+
+    async def op_seek(self, session, *, guild_id: int, position: float):
+        return {"position": self._player(guild_id).seek(position)}
+
+    async def op_destroy(self, session, *, guild_id: int):
+        await self._destroy(guild_id)
+
+    async def op_stats(self, session):
+        from cluster import current_rss_mb
+
+        players = list(self.players.values())
+        return {
+            "players": len(players),
+            "playing": sum(1 for p in players if p.track_id is not None),
+            "ffmpeg_processes": sum(1 for p in players if p.ffmpeg_running),
+            "threads": threading.active_count(),
+            "rss_mb": round(current_rss_mb(), 1),
+            "uptime_s": round(time.monotonic() - self.started_at),
+        }
+
+
+def main():
+    from config import AUDIO_NODE_ADDRESS, DISCORD_TOKEN, FFMPEG_PATH
+
+    parser = argparse.ArgumentParser(description="DC PartyBot 音訊節點")
+    parser.add_argument("--address", default=AUDIO_NODE_ADDRESS or "127.0.0.1:2334")
+    parser.add_argument("--stand-in", action="store_true", help="不連線到 Discord，封包只計數後丟棄")
+    parser.add_argument("--with-ffmpeg", action="store_true", help="替身模式下仍以 FFmpeg 讀取音訊")
+    parser.add_argument("--track-seconds", type=float, default=30.0, help="替身模式下未知長度音軌的秒數")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+    if not args.stand_in and not DISCORD_TOKEN:
+        parser.error("需要 DISCORD_TOKEN 才能建立語音連線（或使用 --stand-in）")
+
+    node = AudioNode(
+        args.address,
+        token=DISCORD_TOKEN,
+        stand_in=args.stand_in,
+        with_ffmpeg=args.with_ffmpeg,
+        track_seconds=args.track_seconds,
+        ffmpeg_path=FFMPEG_PATH,
+    )
+    try:
+        asyncio.run(node.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
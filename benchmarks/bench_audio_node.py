@@ -0,0 +1,234 @@
+"""
+基準測試：音訊節點（替身模式）與行程內播放的事件迴圈延遲
+
+不連線到 Discord：
+- 行程內：在機器人行程中以 StandInVoiceClient 播放（每個伺服器一條 AudioPlayer 執行緒）
+- 節點：啟動 `audio_node.py --stand-in` 子行程，機器人行程只透過 NodeVoiceClient 送出 RPC
+
+兩者都同時播放 N 個伺服器的音軌，期間量測機器人事件迴圈的延遲（每 10 ms
+睡眠的超時量）與機器人行程的 CPU 時間；節點模式另外回報 play 到 track_start、
+seek 的往返時間與節點統計。加上 --with-ffmpeg 時音訊源改由 FFmpeg 讀取 --media
+指定的檔案（需要系統已安裝 ffmpeg）。
+
+用法：
+    python benchmarks/bench_audio_node.py --guilds 50 --seconds 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_node import (  # noqa: E402
+    AudioNodeClient,
+    NodeTrack,
+    SilenceSource,
+    StandInVoiceClient,
+)
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+    def get_channel(self, channel_id):
+        return None
+
+    async def change_voice_state(self, *, channel, self_mute=False, self_deaf=False):
+        pass
+
+
+class FakeChannel:
+    def __init__(self, guild):
+        self.id = guild.id * 10
+        self.guild = guild
+
+    def _get_voice_client_key(self):
+        return self.guild.id, "guild_id"
+
+
+FAKE_CLIENT = SimpleNamespace(_connection=SimpleNamespace(_remove_voice_client=lambda key: None))
+
+
+class LagProbe:
+    """每 interval 秒睡眠一次，記錄實際醒來比預期晚多少"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - start - self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        self._task.cancel()
+
+    def summary(self):
+        ordered = sorted(self.samples) or [0.0]
+        return {
+            "p50": ordered[len(ordered) // 2] * 1000,
+            "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+            "max": ordered[-1] * 1000,
+        }
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+def make_source(args):
+    if args.with_ffmpeg:
+        return discord.FFmpegOpusAudio(args.media, codec="copy")
+    return SilenceSource(args.seconds)
+
+
+async def run_in_process(args):
+    loop = asyncio.get_running_loop()
+    finished = asyncio.Event()
+    remaining = args.guilds
+
+    def after(error):
+        nonlocal remaining
+        remaining -= 1
+        if remaining == 0:
+            loop.call_soon_threadsafe(finished.set)
+
+    probe = LagProbe()
+    probe.start()
+    cpu = time.process_time()
+    voices = []
+    for _ in range(args.guilds):
+        voice = StandInVoiceClient(loop)
+        await voice.connect()
+        voice.play(make_source(args), after=after)
+        voices.append(voice)
+    await asyncio.wait_for(finished.wait(), timeout=args.seconds * 3 + 30)
+    probe.stop()
+    return {
+        "cpu_s": time.process_time() - cpu,
+        "lag": probe.summary(),
+        "packets": sum(v.packets_sent for v in voices),
+    }
+
+
+async def run_node(args, address):
+    node_cmd = [
+        sys.executable, os.path.join(ROOT, "audio_node.py"),
+        "--address", address, "--stand-in", "--track-seconds", str(args.seconds),
+    ]
+    if args.with_ffmpeg:
+        node_cmd.append("--with-ffmpeg")
+    process = subprocess.Popen(node_cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    logging.getLogger("audio_node").setLevel(logging.ERROR)  # 節點啟動前的重新連線訊息
+    node = AudioNodeClient(address, reconnect_delay=0.1)
+    node.start()
+    try:
+        await node.wait_connected(timeout=15)
+        voices = []
+        for index in range(args.guilds):
+            voice = node.voice_client(FAKE_CLIENT, FakeChannel(FakeGuild(20_000 + index)))
+            await voice.connect(timeout=10, reconnect=False)
+            voices.append(voice)
+
+        finished = asyncio.Event()
+        remaining = args.guilds
+        start_latency, errors = [], []
+
+        def on_start(sent_at):
+            start_latency.append(time.perf_counter() - sent_at)
+
+        def after(error):
+            nonlocal remaining
+            if error:
+                errors.append(error)
+            remaining -= 1
+            if remaining == 0:
+                finished.set()
+
+        probe = LagProbe()
+        probe.start()
+        cpu = time.process_time()
+        for voice in voices:
+            source = args.media if args.with_ffmpeg else "stand-in"
+            track = NodeTrack(source, codec="copy", duration=args.seconds)
+            sent_at = time.perf_counter()
+            voice.play(track, after=after, on_start=lambda t=sent_at: on_start(t))
+
+        # 播放中途對每個伺服器 seek 一次
+        await asyncio.sleep(min(2.0, args.seconds / 2))
+        seek_rtt = []
+        for voice in voices:
+            sent_at = time.perf_counter()
+            await voice.seek(args.seconds / 2)
+            seek_rtt.append(time.perf_counter() - sent_at)
+
+        await asyncio.wait_for(finished.wait(), timeout=args.seconds * 3 + 30)
+        probe.stop()
+        cpu = time.process_time() - cpu
+        stats = await node.request("stats")
+        for voice in voices:
+            await voice.disconnect(force=True)
+        return {
+            "cpu_s": cpu,
+            "lag": probe.summary(),
+            "start_p50": percentile(start_latency, 50),
+            "start_p99": percentile(start_latency, 99),
+            "seek_p50": percentile(seek_rtt, 50),
+            "seek_p99": percentile(seek_rtt, 99),
+            "errors": len(errors),
+            "node": stats,
+        }
+    finally:
+        await node.close()
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def format_lag(lag):
+    return f"迴圈延遲 p50 {lag['p50']:5.2f} / p99 {lag['p99']:6.2f} / max {lag['max']:6.2f} ms"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0, help="每首音軌的長度")
+    parser.add_argument("--with-ffmpeg", action="store_true")
+    parser.add_argument("--media", help="--with-ffmpeg 時播放的 Ogg/Opus 檔案")
+    args = parser.parse_args()
+    if args.with_ffmpeg and not args.media:
+        parser.error("--with-ffmpeg 需要 --media")
+
+    print(f"{args.guilds} 個伺服器同時播放 {args.seconds:.0f} 秒")
+    local = await run_in_process(args)
+    print(f"  行程內  CPU {local['cpu_s']:6.2f} s | {format_lag(local['lag'])}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        remote = await run_node(args, os.path.join(directory, "node.sock"))
+    print(f"  節點    CPU {remote['cpu_s']:6.2f} s | {format_lag(remote['lag'])}")
+    print(
+        f"  play→track_start p50 {remote['start_p50']:.1f} / p99 {remote['start_p99']:.1f} ms | "
+        f"seek p50 {remote['seek_p50']:.1f} / p99 {remote['seek_p99']:.1f} ms | "
+        f"錯誤 {remote['errors']} | 節點 RSS {remote['node']['rss_mb']} MB"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,195 @@
+"""
+基準測試：單一伺服器大量解析時，其他伺服器「下一首」的等待時間（先進先出 vs 解析排程）
+
+不連線到 YouTube：解析以睡眠模擬（對數常態分布），同時只允許 --workers 個解析，
+與 ExtractorPool 的工作者數相同。情境：
+- 一個繁忙的伺服器：多位成員連續 /play，每次產生 SPECULATIVE_RESULTS 個搜尋結果
+  預先解析，佇列也不斷要求預先解析（例如剛匯入 200 首的歌單後連續跳過）
+- 其他伺服器：各自正常播放，每首歌結束時需要解析下一首
+- 先進先出：所有工作共用一個 asyncio.Semaphore（舊的解析池行為）
+- 解析排程：使用 ExtractionScheduler，伺服器各自排隊並加權輪替
+
+另外以 UserRateLimiter 模擬洗版的使用者，統計被擋下的 /play 次數。
+
+用法：
+    python benchmarks/bench_extraction_fairness.py --duration 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from extraction_scheduler import (  # noqa: E402
+    ExtractionScheduler,
+    UserRateLimiter,
+    NOW,
+    PREFETCH,
+    SPECULATIVE,
+)
+from extractor_pool import ExtractorQueueFull  # noqa: E402
+
+HEAVY = 1
+
+
+class FifoGate:
+    """舊行為：所有伺服器與優先順序共用同一個先進先出佇列"""
+
+    def __init__(self, workers):
+        self.semaphore = asyncio.Semaphore(workers)
+
+    async def run(self, guild_id, key, priority, factory):
+        async with self.semaphore:
+            return await factory()
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+class Simulation:
+    def __init__(self, args, gate, rng, limiter=None):
+        self.args = args
+        self.gate = gate
+        self.rng = rng
+        self.limiter = limiter
+        self.waits = defaultdict(list)  # (分類) -> 從提出到開始解析的秒數
+        self.rejected = 0
+        self.rate_limited = 0
+        self.plays = 0
+        self.stopping = False
+        self.tasks = set()
+
+    async def extract(self):
+        await asyncio.sleep(self.rng.lognormvariate(0, 0.4) * self.args.extract_ms / 1000)
+
+    async def job(self, guild_id, key, priority, label):
+        submitted = time.perf_counter()
+        started = None
+
+        async def factory():
+            nonlocal started
+            started = time.perf_counter()
+            await self.extract()
+
+        try:
+            await self.gate.run(guild_id, key, priority, factory)
+        except ExtractorQueueFull:
+            self.rejected += 1
+            return
+        except asyncio.CancelledError:
+            return
+        self.waits[label].append(started - submitted)
+
+    def spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def light_guild(self, guild_id):
+        """正常播放：每首歌結束時解析下一首，偶爾有人 /play"""
+        await asyncio.sleep(self.rng.uniform(0, self.args.track_s))
+        index = 0
+        while not self.stopping:
+            index += 1
+            await self.job(guild_id, f"g{guild_id}-{index}", NOW, "other_next")
+            if self.rng.random() < 0.2:
+                for i in range(self.args.speculative):
+                    self.spawn(
+                        self.job(guild_id, f"g{guild_id}-s{index}-{i}", SPECULATIVE, "other_spec")
+                    )
+            await asyncio.sleep(self.rng.lognormvariate(0, 0.3) * self.args.track_s)
+
+    async def heavy_guild(self):
+        """繁忙伺服器：成員連續 /play，佇列不斷更換前幾首"""
+        index = 0
+        user = 0
+        while not self.stopping:
+            index += 1
+            user = (user + 1) % self.args.heavy_users
+            if self.limiter and self.limiter.acquire(user) > 0:
+                self.rate_limited += 1
+            else:
+                self.plays += 1
+                for i in range(self.args.speculative):
+                    self.spawn(self.job(HEAVY, f"h-s{index}-{i}", SPECULATIVE, "heavy_spec"))
+                for i in range(2):
+                    self.spawn(self.job(HEAVY, f"h-p{index}-{i}", PREFETCH, "heavy_prefetch"))
+            if index % 10 == 0:
+                self.spawn(self.job(HEAVY, f"h-n{index}", NOW, "heavy_next"))
+            await asyncio.sleep(self.rng.expovariate(1 / (self.args.heavy_interval_ms / 1000)))
+
+    async def run(self):
+        runners = [asyncio.create_task(self.heavy_guild())]
+        runners += [
+            asyncio.create_task(self.light_guild(guild_id))
+            for guild_id in range(2, self.args.guilds + 2)
+        ]
+        await asyncio.sleep(self.args.duration)
+        self.stopping = True
+        for task in runners + list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*runners, *self.tasks, return_exceptions=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=20, help="每種設定模擬的秒數")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--guilds", type=int, default=20, help="正常播放的伺服器數")
+    parser.add_argument("--extract-ms", type=float, default=400, help="單次解析的中位數")
+    parser.add_argument("--track-s", type=float, default=6, help="其他伺服器每首歌的長度（縮短的時間軸）")
+    parser.add_argument("--speculative", type=int, default=2)
+    parser.add_argument("--heavy-users", type=int, default=3)
+    parser.add_argument("--heavy-interval-ms", type=float, default=300, help="繁忙伺服器 /play 的平均間隔")
+    parser.add_argument("--guild-max-queue", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(
+        f"{args.workers} 個解析工作者，解析 p50 {args.extract_ms:.0f} ms；"
+        f"{args.guilds} 個正常伺服器 + 1 個每 {args.heavy_interval_ms:.0f} ms /play 的繁忙伺服器，"
+        f"模擬 {args.duration:.0f} 秒"
+    )
+    setups = [
+        ("先進先出", lambda: FifoGate(args.workers), False),
+        (
+            "解析排程",
+            lambda: ExtractionScheduler(args.workers, max_queue_per_guild=args.guild_max_queue),
+            False,
+        ),
+        (
+            "排程+限速",
+            lambda: ExtractionScheduler(args.workers, max_queue_per_guild=args.guild_max_queue),
+            True,
+        ),
+    ]
+    for label, make_gate, limited in setups:
+        # 限速以縮短的時間軸換算：每分鐘 10 次、最多連續 4 次
+        limiter = UserRateLimiter(10 * 60 / args.duration, 4) if limited else None
+        sim = Simulation(args, make_gate(), random.Random(args.seed), limiter)
+        await sim.run()
+        other = sim.waits["other_next"]
+        heavy = sim.waits["heavy_next"]
+        print(
+            f"  {label}  其他伺服器下一首等待 p50 {percentile(other, 50):6.0f} ms | "
+            f"p95 {percentile(other, 95):6.0f} ms | p99 {percentile(other, 99):6.0f} ms（{len(other)} 首）"
+        )
+        print(
+            f"            繁忙伺服器下一首 p95 {percentile(heavy, 95):6.0f} ms | "
+            f"搜尋結果預先解析 完成 {len(sim.waits['heavy_spec']):4d} | "
+            f"拒絕 {sim.rejected:4d} | /play {sim.plays:4d}（限速擋下 {sim.rate_limited}）"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
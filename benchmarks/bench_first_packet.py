@@ -0,0 +1,120 @@
+"""
+基準測試：音訊源建立到第一個 Opus 封包的時間（有 / 無 ffprobe）
+
+以 FFmpeg 產生測試音檔（WebM/Opus 與 M4A/AAC），透過本機 HTTP 伺服器提供，
+伺服器可加上固定延遲以模擬遠端 googlevideo 網址。比較：
+- from_probe：舊實作，先執行 ffprobe 再啟動 FFmpeg
+- 直接建立：依 yt-dlp 格式資訊建立，Opus 直接複製串流
+
+需要系統已安裝 ffmpeg / ffprobe。
+
+用法：
+    python benchmarks/bench_first_packet.py --latency 0.1 --runs 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import discord
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music_cog import Music  # noqa: E402
+
+FORMATS = {
+    "webm/opus": (["-c:a", "libopus", "-b:a", "128k"], "webm", "opus"),
+    "m4a/aac": (["-c:a", "aac", "-b:a", "128k"], "m4a", "mp4a.40.2"),
+}
+
+
+def make_media(directory: str):
+    """產生 30 秒的測試音檔"""
+    for name, (codec_args, ext, _) in FORMATS.items():
+        path = os.path.join(directory, f"tone.{ext}")
+        subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-y", "-f", "lavfi",
+             "-i", "sine=frequency=440:duration=30", *codec_args, path],
+            check=True,
+        )
+
+
+def start_server(directory: str, latency: float) -> str:
+    """在獨立執行緒中啟動帶延遲的靜態檔案伺服器"""
+    ready = threading.Event()
+    result = {}
+
+    @web.middleware
+    async def delay(request, handler):
+        await asyncio.sleep(latency)
+        return await handler(request)
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        app = web.Application(middlewares=[delay])
+        app.router.add_static("/", directory)
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        result["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{result['port']}"
+
+
+async def first_packet_with_probe(url: str) -> float:
+    start = time.perf_counter()
+    source = await discord.FFmpegOpusAudio.from_probe(
+        url, before_options=Music.FFMPEG_BEFORE_OPTIONS, options="-vn"
+    )
+    await asyncio.to_thread(source.read)
+    elapsed = time.perf_counter() - start
+    source.cleanup()
+    return elapsed
+
+
+async def first_packet_direct(url: str, info: dict) -> float:
+    start = time.perf_counter()
+    source = Music.create_audio_source(info)
+    await asyncio.to_thread(source.read)
+    elapsed = time.perf_counter() - start
+    source.cleanup()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.1, help="每個 HTTP 請求的延遲（秒）")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        make_media(directory)
+        base_url = start_server(directory, args.latency)
+        print(f"HTTP 延遲 {args.latency * 1000:.0f} ms，每項 {args.runs} 次")
+
+        for name, (_, ext, acodec) in FORMATS.items():
+            url = f"{base_url}/tone.{ext}"
+            info = {"url": url, "acodec": acodec, "ext": ext, "abr": 128}
+            probed = [await first_packet_with_probe(url) for _ in range(args.runs)]
+            direct = [await first_packet_direct(url, info) for _ in range(args.runs)]
+            print(
+                f"  {name:<10} from_probe {statistics.median(probed) * 1000:7.1f} ms | "
+                f"直接建立 {statistics.median(direct) * 1000:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
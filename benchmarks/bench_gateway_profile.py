@@ -0,0 +1,281 @@
+"""
+基準測試：Gateway 設定檔（lean / full）的啟動時間與記憶體
+
+不連線到 Discord：以合成的 READY、GUILD_CREATE 與 GUILD_MEMBERS_CHUNK 事件
+餵給 discord.py 的 ConnectionState，模擬機器人在大量伺服器中啟動的過程。
+- full：Intents.all()，GUILD_CREATE 帶有成員與在線狀態，大型伺服器需要分塊載入成員
+- lean：main.build_gateway_profile("lean")，只會收到語音頻道中的成員
+
+每個設定檔在獨立子行程中執行，回報到 ready 為止的時間、RSS 增量與快取數量。
+
+用法：
+    python benchmarks/bench_gateway_profile.py --guilds 2000 --members 200 --large-every 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LARGE_THRESHOLD = 250
+CHUNK_SIZE = 1000  # Discord 每個 GUILD_MEMBERS_CHUNK 最多 1000 位成員
+BOT_ID = 1
+
+
+def user_payload(user_id):
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id}",
+        "global_name": f"User {user_id}",
+        "discriminator": "0",
+        "avatar": None,
+        "bot": user_id == BOT_ID,
+    }
+
+
+def member_payload(user_id):
+    return {
+        "user": user_payload(user_id),
+        "roles": [],
+        "joined_at": "2024-01-01T00:00:00+00:00",
+        "deaf": False,
+        "mute": False,
+        "flags": 0,
+    }
+
+
+def presence_payload(user_id):
+    return {
+        "user": {"id": str(user_id)},
+        "status": "online",
+        "activities": [{"name": "music", "type": 2}],
+        "client_status": {"desktop": "online"},
+    }
+
+
+class SyntheticGuild:
+    def __init__(self, index, member_count, voice_members):
+        self.id = 10_000 + index
+        self.voice_channel_id = self.id * 10 + 1
+        self.text_channel_id = self.id * 10 + 2
+        first_user = 1_000_000 + index * 100_000
+        self.user_ids = [BOT_ID] + list(range(first_user, first_user + member_count - 1))
+        self.voice_ids = self.user_ids[1 : 1 + voice_members]
+
+    @property
+    def large(self):
+        return len(self.user_ids) > LARGE_THRESHOLD
+
+    def create_payload(self, intents):
+        """依意圖產生 Discord 實際會送出的 GUILD_CREATE 內容"""
+        if intents.members and not self.large:
+            member_ids = self.user_ids
+        else:
+            # 沒有成員意圖或大型伺服器：只有自己與語音頻道中的成員
+            member_ids = [BOT_ID] + self.voice_ids
+
+        presences = []
+        if intents.presences:
+            online = self.user_ids if not self.large else self.user_ids[: LARGE_THRESHOLD]
+            presences = [presence_payload(u) for u in online[::3]]
+
+        voice_states = []
+        if intents.voice_states:
+            voice_states = [
+                {
+                    "user_id": str(u),
+                    "channel_id": str(self.voice_channel_id),
+                    "session_id": f"s{u}",
+                    "deaf": False,
+                    "mute": False,
+                    "self_deaf": False,
+                    "self_mute": False,
+                    "self_video": False,
+                    "suppress": False,
+                }
+                for u in self.voice_ids
+            ]
+
+        return {
+            "id": str(self.id),
+            "name": f"guild {self.id}",
+            "owner_id": str(self.user_ids[-1]),
+            "member_count": len(self.user_ids),
+            "large": self.large,
+            "unavailable": False,
+            "joined_at": "2024-01-01T00:00:00+00:00",
+            "features": [],
+            "emojis": [],
+            "stickers": [],
+            "threads": [],
+            "stage_instances": [],
+            "guild_scheduled_events": [],
+            "roles": [
+                {
+                    "id": str(self.id),
+                    "name": "@everyone",
+                    "permissions": "0",
+                    "position": 0,
+                    "color": 0,
+                    "hoist": False,
+                    "managed": False,
+                    "mentionable": False,
+                    "flags": 0,
+                }
+            ],
+            "channels": [
+                {"id": str(self.voice_channel_id), "type": 2, "name": "voice", "position": 0,
+                 "permission_overwrites": [], "bitrate": 64000, "user_limit": 0},
+                {"id": str(self.text_channel_id), "type": 0, "name": "general", "position": 1,
+                 "permission_overwrites": []},
+            ],
+            "members": [member_payload(u) for u in member_ids],
+            "presences": presences,
+            "voice_states": voice_states,
+        }
+
+
+def current_rss_mb():
+    from cluster import current_rss_mb as rss
+
+    return rss()
+
+
+async def run_profile(profile, args):
+    import discord
+
+    from main import build_gateway_profile
+
+    intents, member_cache_flags, chunk_guilds = build_gateway_profile(profile)
+    guilds = [
+        SyntheticGuild(
+            i,
+            args.large_members if args.large_every and i % args.large_every == 0 else args.members,
+            args.voice_members,
+        )
+        for i in range(args.guilds)
+    ]
+    by_id = {g.id: g for g in guilds}
+
+    client = discord.Client(
+        intents=intents,
+        member_cache_flags=member_cache_flags,
+        chunk_guilds_at_startup=chunk_guilds,
+    )
+    await client._async_setup_hook()
+    state = client._connection
+    state.guild_ready_timeout = 0.05
+    chunk_requests = 0
+
+    pending = set()
+
+    async def deliver_chunks(guild_id, presences, nonce):
+        guild = by_id[int(guild_id)]
+        pieces = [
+            guild.user_ids[i : i + CHUNK_SIZE] for i in range(0, len(guild.user_ids), CHUNK_SIZE)
+        ]
+        for index, piece in enumerate(pieces):
+            await asyncio.sleep(0)
+            state.parse_guild_members_chunk(
+                {
+                    "guild_id": str(guild_id),
+                    "members": [member_payload(u) for u in piece],
+                    "presences": [presence_payload(u) for u in piece[::3]] if presences else [],
+                    "chunk_index": index,
+                    "chunk_count": len(pieces),
+                    "nonce": nonce,
+                }
+            )
+
+    async def fake_chunker(guild_id, query="", limit=0, presences=False, *, shard_id=None, nonce=None):
+        """模擬 REQUEST_GUILD_MEMBERS：稍後分批回傳所有成員"""
+        nonlocal chunk_requests
+        chunk_requests += 1
+        task = asyncio.create_task(deliver_chunks(guild_id, presences, nonce))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    state.chunker = fake_chunker
+
+    # 先產生 GUILD_CREATE 內容，計時只包含 discord.py 處理事件的時間
+    payloads = [guild.create_payload(intents) for guild in reversed(guilds)]
+
+    baseline = current_rss_mb()
+    started = time.perf_counter()
+    state.parse_ready(
+        {
+            "v": 10,
+            "user": user_payload(BOT_ID),
+            "guilds": [{"id": str(g.id), "unavailable": True} for g in guilds],
+            "session_id": "bench",
+            "resume_gateway_url": "wss://gateway.discord.gg",
+            "shard": [0, 1],
+            "application": {"id": str(BOT_ID), "flags": 0},
+        }
+    )
+    while payloads:
+        state.parse_guild_create(payloads.pop())
+        await asyncio.sleep(0)
+
+    await asyncio.wait_for(client.wait_until_ready(), timeout=600)
+    # 扣除最後一個 GUILD_CREATE 之後的 guild_ready_timeout 等待
+    elapsed = time.perf_counter() - started - state.guild_ready_timeout
+
+    members = sum(len(g.members) for g in client.guilds)
+    return {
+        "profile": profile,
+        "intents": intents.value,
+        "ready_s": round(elapsed, 3),
+        "rss_delta_mb": round(current_rss_mb() - baseline, 1),
+        "guilds": len(client.guilds),
+        "cached_members": members,
+        "cached_users": len(state._users),
+        "chunk_requests": chunk_requests,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--guilds", type=int, default=2000)
+    parser.add_argument("--members", type=int, default=200, help="一般伺服器的成員數")
+    parser.add_argument("--large-every", type=int, default=20, help="每 N 個伺服器有一個大型伺服器")
+    parser.add_argument("--large-members", type=int, default=5000)
+    parser.add_argument("--voice-members", type=int, default=3, help="每個伺服器語音頻道中的成員數")
+    parser.add_argument("--profile", choices=("lean", "full"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        import logging
+
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(asyncio.run(run_profile(args.profile, args))))
+        return
+
+    print(
+        f"模擬 {args.guilds} 個伺服器（一般 {args.members} 人，"
+        f"每 {args.large_every} 個有一個 {args.large_members} 人的大型伺服器）"
+    )
+    for profile in ("full", "lean"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--profile", profile, *sys.argv[1:]],
+            check=True,
+            capture_output=True,
+            text=True,
+            cwd=ROOT,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"  {profile:<5} ready {result['ready_s']:7.2f} s | RSS +{result['rss_delta_mb']:7.1f} MB | "
+            f"成員快取 {result['cached_members']:>9,} | 使用者 {result['cached_users']:>9,} | "
+            f"分塊請求 {result['chunk_requests']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+驗證事件迴圈看門狗：製造已知的阻塞，確認看門狗找出正確的位置、cog 與指令
+
+不連線到 Discord：建立 commands.Bot 並載入真正的 watchdog_cog、emoji_cog 與 utils_cog，
+然後觸發目前仍在事件迴圈中同步讀寫檔案的程式碼：
+- on_message：Emoji.get_recommended_emojis 每則訊息都重新讀取 emoji_data.json
+  （以 --emoji-keywords 個關鍵字放大檔案）
+- /remind：Utils.save_reminders 同步寫入整個提醒事項檔
+  （以 --reminders 個提醒放大檔案），經由 CommandTree.interaction_check 標記指令
+- 沒有任務的回呼：loop.call_soon 中的 time.sleep，確認找不到任務時仍能定位
+
+最後印出延遲分布與看門狗彙整的阻塞位置，並檢查每個情境都被正確歸類。
+所有資料檔寫入暫存目錄，不會動到 data/。
+
+用法：
+    python benchmarks/bench_loop_watchdog.py --messages 10 --reminders 200000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 在匯入 config 之前設定：資料寫入暫存目錄（config 會載入目前目錄的 .env）
+WORKDIR = tempfile.mkdtemp(prefix="loop_watchdog_")
+os.chdir(WORKDIR)
+os.environ.setdefault("DATA_DIR", os.path.join(WORKDIR, "data"))
+os.environ.setdefault("LOOP_WATCHDOG_ENABLED", "true")
+os.makedirs(os.environ["DATA_DIR"], exist_ok=True)
+
+import discord  # noqa: E402
+from discord.ext import commands  # noqa: E402
+
+from config import EMOJI_DATA_PATH, REMINDERS_DATA_PATH  # noqa: E402
+
+
+def write_data(args):
+    """產生放大的表情符號資料與提醒事項檔"""
+    keywords = {f"關鍵字{i}": ["😊", "🎉", "🔥"] for i in range(args.emoji_keywords)}
+    keywords["開心"] = ["😊", "😄", "🎉"]
+    with open(EMOJI_DATA_PATH, "w", encoding="utf-8") as f:
+        json.dump({"keywords": keywords}, f, ensure_ascii=False)
+
+    start = datetime(2099, 1, 1)
+    reminders = {}
+    for i in range(args.reminders):
+        time_str = (start + timedelta(minutes=i // 10)).strftime("%Y-%m-%d %H:%M")
+        reminders.setdefault(time_str, []).append(
+            {
+                "id": f"{i}",
+                "user_id": i,
+                "channel_id": 1,
+                "message": "測試提醒",
+                "created_at": "2026-01-01 00:00:00",
+            }
+        )
+    with open(REMINDERS_DATA_PATH, "w", encoding="utf-8") as f:
+        json.dump(reminders, f, ensure_ascii=False)
+
+
+async def noop(*args, **kwargs):
+    pass
+
+
+def fake_message(index):
+    channel = object.__new__(discord.TextChannel)  # 只需要通過 isinstance 檢查
+    # bot=True：略過 commands.Bot 預設的前綴指令處理，只觸發 cog 的 on_message
+    return SimpleNamespace(
+        author=SimpleNamespace(id=1000 + index, bot=True),
+        content=f"今天好開心 第 {index} 則",
+        channel=channel,
+        add_reaction=noop,
+    )
+
+
+def fake_interaction(command, index):
+    return SimpleNamespace(
+        command=command,
+        user=SimpleNamespace(id=2000 + index),
+        channel_id=1,
+        response=SimpleNamespace(send_message=noop),
+    )
+
+
+async def invoke_remind(bot, utils, index):
+    """依 CommandTree 的順序在同一個任務中先 interaction_check 再執行指令"""
+    command = bot.tree.get_command("remind")
+    interaction = fake_interaction(command, index)
+    if await bot.tree.interaction_check(interaction):
+        await command.callback(utils, interaction, minutes=5, message="喝水")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10, help="觸發 on_message 的次數")
+    parser.add_argument("--remind", type=int, default=5, help="執行 /remind 的次數")
+    parser.add_argument("--sleeps", type=int, default=3, help="沒有任務的阻塞回呼次數")
+    parser.add_argument("--emoji-keywords", type=int, default=300000)
+    parser.add_argument("--reminders", type=int, default=200000)
+    parser.add_argument("--idle-seconds", type=float, default=2, help="量測閒置延遲的秒數")
+    parser.add_argument("--gap", type=float, default=0.3, help="每次觸發之間的間隔秒數")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    write_data(args)
+
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+    await bot._async_setup_hook()  # 不登入：只設定事件迴圈（dispatch 需要）
+    for extension in ("watchdog_cog", "emoji_cog", "utils_cog"):
+        await bot.load_extension(extension)
+    watchdog = bot.get_cog("Watchdog").watchdog
+    utils = bot.get_cog("Utils")
+
+    await asyncio.sleep(args.idle_seconds)
+    idle = watchdog.lag_stats.summary()
+
+    for index in range(args.messages):
+        bot.dispatch("message", fake_message(index))
+        await asyncio.sleep(args.gap)
+    for index in range(args.remind):
+        asyncio.create_task(invoke_remind(bot, utils, index), name="CommandTree-invoker")
+        await asyncio.sleep(args.gap)
+    loop = asyncio.get_running_loop()
+    for _ in range(args.sleeps):
+        loop.call_soon(time.sleep, 0.2)
+        await asyncio.sleep(args.gap)
+
+    lag = watchdog.lag_stats.summary()
+    print(
+        f"閒置延遲 p50/p99/max {idle['p50'] * 1000:.2f}/{idle['p99'] * 1000:.2f}/"
+        f"{idle['max'] * 1000:.2f} ms；整體 p50/p99/max {lag['p50'] * 1000:.1f}/"
+        f"{lag['p99'] * 1000:.1f}/{lag['max'] * 1000:.0f} ms，"
+        f"超過 {watchdog.threshold * 1000:.0f} ms 共 {watchdog.stalls} 次"
+    )
+    for offender in watchdog.worst(10):
+        print(
+            f"  {offender['location']:<50} {offender['count']:3d} 次 "
+            f"累計 {offender['total'] * 1000:6.0f} ms 最長 {offender['max'] * 1000:5.0f} ms | "
+            f"cog {offender['cog'] or '-'} | 指令 {offender['command'] or '-'} | "
+            f"協程 {offender['coroutine'] or '-'} | 任務 {offender['task'] or '-'}"
+        )
+
+    expected = [
+        ("on_message 讀取表情符號資料", "emoji_cog.py", "Emoji", None, args.messages),
+        ("/remind 寫入提醒事項", "utils_cog.py", "Utils", "remind", args.remind),
+        ("沒有任務的回呼", os.path.join("benchmarks", "bench_loop_watchdog.py"), None, None, args.sleeps),
+    ]
+    failed = False
+    for label, filename, cog, command, triggered in expected:
+        matches = [o for o in watchdog.offenders.values() if o["location"].startswith(filename)]
+        ok = bool(matches) and all(
+            o["cog"] == cog and (command is None or o["command"] == command) for o in matches
+        )
+        count = sum(o["count"] for o in matches)
+        failed |= not ok
+        print(f"{'✓' if ok else '✗'} {label}：記錄 {count}/{triggered} 次")
+
+    await bot.unload_extension("utils_cog")
+    await bot.unload_extension("watchdog_cog")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,514 @@
+"""
+負載模擬：多個伺服器同時使用音樂系統時的事件迴圈延遲、換歌空檔與資源用量
+
+不連線到 Discord 與 YouTube，直接建立真正的 Music cog 並呼叫 /play、/skip 的實作：
+- 假的伺服器、語音頻道與成員；語音客戶端繼承 audio_node.StandInVoiceClient，
+  由 discord.py 的 AudioPlayer 以每 20 ms 一個封包的即時速率讀取音訊源
+- 本機 stub YouTube 搜尋伺服器（另一個執行緒的事件迴圈），延遲與失敗率可設定
+- stub 解析器取代 yt-dlp 解析池：延遲為對數常態分布，可設定暫時失敗
+  （觸發重試）與無法播放的影片（寫入負面快取），並在工作執行緒中佔用 CPU
+  模擬 yt-dlp 在 GIL 下的負擔
+- 有 ffmpeg 時由 stub 媒體伺服器提供 WAV，Music 以真正的 FFmpegOpusAudio 轉碼播放；
+  沒有 ffmpeg（或 --source synthetic）時改用固定長度的靜音 Opus 音訊源
+
+依 --ramp 逐步增加伺服器數量（已加入的伺服器持續播放），每一階段回報
+事件迴圈延遲、換歌空檔、/play 到第一個封包的時間、CPU、RSS、FFmpeg 行程數與執行緒數。
+
+所有資料檔寫入暫存目錄，不會動到 data/。為縮短測試時間，歌曲長度預設為 20 秒左右。
+
+用法：
+    python benchmarks/bench_music_load.py --ramp 10,50,100,250,500 --step-seconds 30
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 在匯入 config 之前設定：資料寫入暫存目錄，關閉背景更新與音訊快取。
+# config 會以 override=True 載入目前目錄的 .env，因此先切換到暫存目錄。
+WORKDIR = tempfile.mkdtemp(prefix="music_load_")
+os.chdir(WORKDIR)
+for key, value in {
+    "DATA_DIR": os.path.join(WORKDIR, "data"),
+    "YOUTUBE_API_KEY": "loadtest",
+    "YTDLP_AUTO_UPDATE": "false",
+    "AUDIO_CACHE_ENABLED": "false",
+    "AUDIO_NODE_ADDRESS": "",
+    "PLAY_RATE_PER_MINUTE": "0",
+}.items():
+    os.environ.setdefault(key, value)
+os.makedirs(os.environ["DATA_DIR"], exist_ok=True)
+
+import discord  # noqa: E402
+import yt_dlp  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+from audio_node import SilenceSource, StandInVoiceClient  # noqa: E402
+from cluster import current_rss_mb  # noqa: E402
+from config import EXTRACTOR_WORKERS  # noqa: E402
+from music_cog import Music  # noqa: E402
+from music_metrics import RollingStats, StageMetrics  # noqa: E402
+from youtube_search import YouTubeSearchClient  # noqa: E402
+
+BOT_ID = 1
+SAMPLE_RATE = 48000
+
+
+def lognormal(rng, median, sigma):
+    return rng.lognormvariate(0, sigma) * median
+
+
+def video_id(song, index):
+    return f"ld{song:07d}{index:02d}"
+
+
+# ── stub 服務（在獨立執行緒的事件迴圈中執行，不佔用受測的事件迴圈） ──
+
+
+def wav_header(seconds):
+    frames = int(seconds * SAMPLE_RATE)
+    data_size = frames * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, 1,
+        SAMPLE_RATE, SAMPLE_RATE * 2, 2, 16, b"data", data_size,
+    ), data_size
+
+
+def make_stub_app(args):
+    """YouTube search 端點與 WAV 媒體端點"""
+    rng = random.Random(args.seed + 7)
+
+    async def search(request):
+        await asyncio.sleep(lognormal(rng, args.search_ms / 1000, 0.4))
+        if rng.random() < args.search_fail:
+            return web.json_response({"error": {"code": 500}}, status=500)
+        # 替代影片搜尋會在關鍵字後加上其他字，只取歌曲編號
+        match = re.search(r"\d+", request.query.get("q", ""))
+        song = int(match.group()) if match else 0
+        items = [
+            {
+                "id": {"kind": "youtube#video", "videoId": video_id(song, i)},
+                "snippet": {"title": f"Song {song} ({i})"},
+            }
+            for i in range(5)
+        ]
+        return web.json_response({"items": items})
+
+    async def media(request):
+        seconds = float(request.query.get("d", "20"))
+        header, remaining = wav_header(seconds)
+        response = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+        response.content_length = len(header) + remaining
+        await response.prepare(request)
+        await response.write(header)
+        chunk = bytes(64 * 1024)
+        while remaining > 0:
+            size = min(remaining, len(chunk))
+            await response.write(chunk[:size])
+            remaining -= size
+        return response
+
+    app = web.Application()
+    app.router.add_get("/youtube/v3/search", search)
+    app.router.add_get("/media", media)
+    return app
+
+
+def start_stub_server(args):
+    ready = threading.Event()
+    result = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(make_stub_app(args))
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        result["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, name="stub-server", daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{result['port']}"
+
+
+class StubExtractor:
+    """取代 ExtractorPool：與 extract() 相同的回傳格式，延遲與失敗依參數分布"""
+
+    def __init__(self, args, media_url):
+        self.args = args
+        self.media_url = media_url
+        self.rng = random.Random(args.seed + 11)
+        self.executor = ThreadPoolExecutor(EXTRACTOR_WORKERS, thread_name_prefix="stub-extract")
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+
+    def _burn(self, seconds):
+        """在工作執行緒中執行純 Python 迴圈，模擬 yt-dlp 解析時持有 GIL"""
+        deadline = time.perf_counter() + seconds
+        value = 0
+        while time.perf_counter() < deadline:
+            value = zlib.crc32(b"x" * 64, value)
+        return value
+
+    async def extract(self, url):
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(lognormal(self.rng, self.args.extract_ms / 1000, self.args.extract_sigma))
+            if self.args.extract_cpu_ms > 0:
+                await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self._burn, self.args.extract_cpu_ms / 1000
+                )
+        finally:
+            self.in_flight -= 1
+
+        vid = url.rsplit("=", 1)[-1]
+        if zlib.crc32(vid.encode()) % 1000 < self.args.unavailable * 1000:
+            self.failures += 1
+            raise yt_dlp.DownloadError("ERROR: [youtube] Video unavailable. This video is not available")
+        if self.rng.random() < self.args.extract_fail:
+            self.failures += 1
+            raise yt_dlp.DownloadError("ERROR: unable to download video data: HTTP Error 403: Forbidden")
+
+        duration = max(2.0, lognormal(self.rng, self.args.track_seconds, 0.3))
+        if self.args.source == "ffmpeg":
+            stream_url, acodec, ext = f"{self.media_url}/media?d={duration:.1f}&v={vid}", "pcm_s16le", "wav"
+        else:
+            stream_url, acodec, ext = f"synthetic://{vid}?d={duration:.1f}", "opus", "webm"
+        return {
+            "id": vid,
+            "url": stream_url,
+            "title": f"Track {vid}",
+            "acodec": acodec,
+            "ext": ext,
+            "abr": 128,
+            "duration": duration,
+        }
+
+    def stats(self):
+        return {"in_flight": self.in_flight, "queue_depth": 0}
+
+    def recycle(self):
+        pass
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ── 假的 Discord 物件 ──
+
+
+class LoadVoiceClient(StandInVoiceClient):
+    """由 AudioPlayer 以即時速率讀取封包的語音客戶端，屬於假的語音頻道"""
+
+    def __init__(self, loop, channel):
+        super().__init__(loop)
+        self.channel = channel
+        self.guild = channel.guild
+
+    async def disconnect(self, *, force: bool = False):
+        await super().disconnect(force=force)
+        if self.guild.voice_client is self:
+            self.guild.voice_client = None
+
+
+class FakeMember:
+    def __init__(self, user_id, guild, channel=None, *, bot=False):
+        self.id = user_id
+        self.bot = bot
+        self.name = self.display_name = f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.guild = guild
+        self.voice = SimpleNamespace(channel=channel) if channel else None
+        self.guild_permissions = discord.Permissions.all()
+
+
+class FakeVoiceChannel:
+    def __init__(self, guild, args, rng):
+        self.guild = guild
+        self.id = guild.id * 10
+        self.name = "music"
+        self.members = []
+        self.args = args
+        self.rng = rng
+
+    async def connect(self, *, cls=None, **kwargs):
+        await asyncio.sleep(lognormal(self.rng, self.args.connect_ms / 1000, 0.35))
+        voice = LoadVoiceClient(asyncio.get_running_loop(), self)
+        await voice.connect()
+        self.guild.voice_client = voice
+        return voice
+
+
+class FakeGuild:
+    def __init__(self, guild_id, args, rng):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+        self.voice_client = None
+        self.channel = FakeVoiceChannel(self, args, rng)
+        self.listener = FakeMember(guild_id * 100 + 1, self, self.channel)
+        self.channel.members = [FakeMember(BOT_ID, self, self.channel, bot=True), self.listener]
+
+
+class FakeMessage:
+    async def edit(self, **kwargs):
+        pass
+
+    async def delete(self):
+        pass
+
+
+class FakeContext:
+    """傳統前綴指令的 context：回覆透過 send()，模擬 Discord REST 的延遲"""
+
+    def __init__(self, guild, args):
+        self.guild = guild
+        self.author = guild.listener
+        self.channel = SimpleNamespace(send=self.send)
+        self.interaction = None
+        self.args = args
+
+    async def defer(self, **kwargs):
+        pass
+
+    async def send(self, content=None, **kwargs):
+        await asyncio.sleep(self.args.send_ms / 1000)
+        return FakeMessage()
+
+
+# ── 測量 ──
+
+
+def ffmpeg_processes():
+    """這個行程的 ffmpeg 子行程數（讀取 /proc）"""
+    me = os.getpid()
+    count = 0
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        comm = stat[stat.index("(") + 1 : stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2 :].split()[1])
+        if ppid == me and comm.startswith("ffmpeg"):
+            count += 1
+    return count
+
+
+class ErrorCounter(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+async def lag_probe(samples, stop, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+def pct(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000
+
+
+# ── 模擬 ──
+
+
+async def listener(cog, guild, args, rng, stop):
+    """一個伺服器的使用者：點歌、佇列快空時再點、偶爾 /skip"""
+    await asyncio.sleep(rng.uniform(0, args.join_spread))
+
+    def pick_song():
+        # 熱門歌曲較常被點（Zipf），搜尋快取與串流網址快取會有合理的命中率
+        return int(rng.paretovariate(1.1)) % args.catalog
+
+    while not stop.is_set():
+        queue = cog.get_queue(guild.id)
+        if len(queue.queue) < args.queue_target:
+            await cog.play.callback(cog, FakeContext(guild, args), query=f"song {pick_song()}")
+        elif rng.random() < args.skip_rate:
+            await cog.skip.callback(cog, FakeContext(guild, args))
+        await asyncio.sleep(rng.expovariate(1 / args.action_interval))
+
+
+def build_cog(args, base_url, loop, guilds):
+    bot = SimpleNamespace(
+        get_guild=guilds.get,
+        loop=loop,
+        user=SimpleNamespace(id=BOT_ID),
+        wait_until_ready=lambda: asyncio.sleep(0),
+    )
+    cog = Music(bot)
+    cog.youtube = YouTubeSearchClient("loadtest", base_url=f"{base_url}/youtube/v3")
+    cog.extractor.shutdown()
+    cog.extractor = StubExtractor(args, base_url)
+    if args.source == "synthetic":
+        # 沒有 ffmpeg：以相同長度的靜音 Opus 封包取代 FFmpegOpusAudio
+        def create_audio_source(audio_info, start=0.0):
+            return SilenceSource(max(0.0, audio_info["duration"] - start))
+
+        cog.create_audio_source = create_audio_source
+    return cog
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    base_url = start_stub_server(args)
+    guilds = {}
+    cog = build_cog(args, base_url, loop, guilds)
+    errors = ErrorCounter()
+    logging.getLogger("music_cog").addHandler(errors)
+
+    stop = asyncio.Event()
+    listeners = []
+    rng = random.Random(args.seed)
+
+    print(
+        f"音訊源：{args.source}｜解析 p50 {args.extract_ms:.0f} ms（CPU {args.extract_cpu_ms:.0f} ms，"
+        f"{EXTRACTOR_WORKERS} 個工作者）｜搜尋 p50 {args.search_ms:.0f} ms｜歌曲約 {args.track_seconds:.0f} 秒"
+    )
+    print(
+        f"{'伺服器':>6} | {'迴圈延遲 p50/p99/max (ms)':>24} | {'換歌空檔 p50/p95 (ms)':>20} | "
+        f"{'第一個封包 p95':>12} | {'開始播放':>6} | {'錯誤':>4} | {'CPU':>5} | {'RSS MB':>7} | "
+        f"{'FFmpeg':>6} | {'執行緒':>6}"
+    )
+    for target in args.ramp:
+        while len(guilds) < target:
+            guild = FakeGuild(10_000 + len(guilds), args, random.Random(rng.random()))
+            guilds[guild.id] = guild
+            await cog.instant_play.set(guild.id, True)
+            listeners.append(
+                asyncio.create_task(listener(cog, guild, args, random.Random(rng.random()), stop))
+            )
+        await asyncio.sleep(args.warmup)
+
+        # 每一階段重新計算統計
+        cog.track_gap_stats = RollingStats(100_000)
+        cog.play_stage_stats = StageMetrics()
+        cog.extraction.wait_stats = [RollingStats() for _ in cog.extraction.wait_stats]
+        packets_before = sum(g.voice_client.packets_sent for g in guilds.values() if g.voice_client)
+        errors.count = 0
+        samples, probe_stop = [], asyncio.Event()
+        probe = asyncio.create_task(lag_probe(samples, probe_stop))
+        cpu_before, wall_before = os.times(), time.perf_counter()
+        ffmpeg_peak = 0
+        deadline = time.perf_counter() + args.step_seconds
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(1)
+            ffmpeg_peak = max(ffmpeg_peak, ffmpeg_processes())
+        probe_stop.set()
+        await probe
+        cpu_after, wall = os.times(), time.perf_counter() - wall_before
+        cpu = (
+            cpu_after.user + cpu_after.system + cpu_after.children_user + cpu_after.children_system
+            - cpu_before.user - cpu_before.system - cpu_before.children_user - cpu_before.children_system
+        ) / wall
+
+        gaps = list(cog.track_gap_stats.samples)
+        first_packet = cog.play_stage_stats.total.summary()
+        packets = sum(g.voice_client.packets_sent for g in guilds.values() if g.voice_client)
+        print(
+            f"{target:>6} | {pct(samples, 50):7.1f} / {pct(samples, 99):6.1f} / {pct(samples, 100):6.0f} | "
+            f"{pct(gaps, 50):8.0f} / {pct(gaps, 95):7.0f} | "
+            f"{(first_packet['p95'] or float('nan')) * 1000:12.0f} | "
+            f"{len(gaps):8d} | {errors.count:6d} | {cpu:5.0%} | {current_rss_mb():7.0f} | "
+            f"{ffmpeg_peak:6d} | {threading.active_count():6d}"
+        )
+        expected = sum(1 for g in guilds.values() if g.voice_client and g.voice_client.is_playing())
+        if args.verbose:
+            print(
+                f"         封包 {packets - packets_before}（播放中 {expected} 個伺服器，"
+                f"理想值約 {expected * args.step_seconds / 0.02:.0f}）｜"
+                f"解析 {cog.extractor.calls} 次，失敗 {cog.extractor.failures}｜"
+                f"排程等待 p95 {(cog.extraction.stats()['wait']['next']['p95'] or 0) * 1000:.0f} ms"
+            )
+
+    stop.set()
+    for task in listeners:
+        task.cancel()
+    await asyncio.gather(*listeners, return_exceptions=True)
+    for guild_id in guilds:
+        await cog.stop_playback(guild_id)
+    cog.cog_unload()
+    await asyncio.sleep(0.5)
+    for guild in guilds.values():
+        if guild.voice_client:
+            guild.voice_client.stop()
+    logging.getLogger("music_cog").removeHandler(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ramp", type=lambda s: [int(x) for x in s.split(",")], default=[10, 50, 100, 250, 500])
+    parser.add_argument("--step-seconds", type=float, default=30, help="每一階段測量的秒數")
+    parser.add_argument("--warmup", type=float, default=20, help="加入伺服器後等待多久才開始測量")
+    parser.add_argument("--join-spread", type=float, default=20, help="新伺服器第一次 /play 的時間分散範圍")
+    parser.add_argument("--source", choices=("auto", "ffmpeg", "synthetic"), default="auto")
+    parser.add_argument("--track-seconds", type=float, default=20, help="歌曲長度的中位數")
+    parser.add_argument("--catalog", type=int, default=5000, help="可點的歌曲數")
+    parser.add_argument("--queue-target", type=int, default=2, help="佇列少於幾首時再點歌")
+    parser.add_argument("--action-interval", type=float, default=8, help="使用者動作之間的平均秒數")
+    parser.add_argument("--skip-rate", type=float, default=0.15, help="佇列足夠時按 /skip 的機率")
+    parser.add_argument("--search-ms", type=float, default=250, help="stub 搜尋延遲的中位數")
+    parser.add_argument("--search-fail", type=float, default=0.01, help="搜尋回傳 HTTP 500 的比例")
+    parser.add_argument("--extract-ms", type=float, default=800, help="stub 解析延遲的中位數（網路等待）")
+    parser.add_argument("--extract-sigma", type=float, default=0.5, help="解析延遲的對數常態 sigma")
+    parser.add_argument("--extract-cpu-ms", type=float, default=100, help="每次解析在工作執行緒中佔用的 CPU")
+    parser.add_argument("--extract-fail", type=float, default=0.03, help="暫時失敗（會重試）的比例")
+    parser.add_argument("--unavailable", type=float, default=0.01, help="無法播放影片的比例")
+    parser.add_argument("--connect-ms", type=float, default=600, help="語音握手的中位數")
+    parser.add_argument("--send-ms", type=float, default=80, help="送出 Discord 訊息的延遲")
+    parser.add_argument("--log-level", default="CRITICAL")
+    parser.add_argument("--verbose", action="store_true", help="額外顯示封包數與解析統計")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.source == "auto":
+        args.source = "ffmpeg" if shutil.which("ffmpeg") else "synthetic"
+    elif args.source == "ffmpeg" and not shutil.which("ffmpeg"):
+        parser.error("找不到 ffmpeg，請改用 --source synthetic")
+    level = getattr(logging, args.log_level.upper())
+    logging.basicConfig(level=level)
+    logging.getLogger().handlers[0].setLevel(level)
+    # 錯誤日誌一律計數，只在 --log-level 允許時輸出
+    logging.getLogger("music_cog").setLevel(min(level, logging.ERROR))
+
+    try:
+        asyncio.run(run(args))
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
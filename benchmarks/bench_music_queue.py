@@ -0,0 +1,108 @@
+"""
+基準測試：MusicQueue 在大型佇列（匯入播放清單）下的操作成本
+
+比較舊的 list 實作（pop(0) / insert(0, ...)）與 deque 實作。
+
+用法：
+    python benchmarks/bench_music_queue.py --sizes 10000 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from music_cog import MusicQueue  # noqa: E402
+
+
+class ListMusicQueue:
+    """舊版以 list 實作的佇列操作（僅保留基準測試需要的部分）"""
+
+    def __init__(self):
+        self.queue = []
+        self.last_updated = None
+
+    def add(self, item):
+        self.queue.append(item)
+        self.last_updated = datetime.now()
+
+    def get_next(self):
+        if not self.queue:
+            return None
+        item = self.queue.pop(0)
+        self.last_updated = datetime.now()
+        return item
+
+    def add_to_front(self, item):
+        self.queue.insert(0, item)
+        self.last_updated = datetime.now()
+
+    def remove(self, index):
+        item = self.queue.pop(index)
+        self.last_updated = datetime.now()
+        return item
+
+    def move(self, src, dst):
+        item = self.remove(src)
+        self.queue.insert(dst, item)
+        return item
+
+    def shuffle(self):
+        random.shuffle(self.queue)
+        self.last_updated = datetime.now()
+
+
+def make_songs(size):
+    return [
+        {"title": f"Track {i}", "url": f"https://www.youtube.com/watch?v={i:011d}"}
+        for i in range(size)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def run(queue_cls, size):
+    songs = make_songs(size)
+    results = {}
+
+    queue = queue_cls()
+    results["add"] = timed(lambda: [queue.add(s) for s in songs])
+    results["add_to_front x1000"] = timed(
+        lambda: [queue.add_to_front(songs[i]) for i in range(1000)]
+    )
+    results["remove 中段 x1000"] = timed(
+        lambda: [queue.remove(len(queue.queue) // 2) for _ in range(1000)]
+    )
+    results["move 尾→頭 x1000"] = timed(
+        lambda: [queue.move(len(queue.queue) - 1, 0) for _ in range(1000)]
+    )
+    results["shuffle"] = timed(queue.shuffle)
+    results["get_next 全部"] = timed(
+        lambda: [queue.get_next() for _ in range(len(queue.queue))]
+    )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        print(f"\n佇列大小 {size}")
+        old = run(ListMusicQueue, size)
+        new = run(MusicQueue, size)
+        for op in old:
+            print(f"  {op:<20} list {old[op]:9.2f} ms | deque {new[op]:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
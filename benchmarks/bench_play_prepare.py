@@ -0,0 +1,295 @@
+"""
+基準測試：/play 從延遲回應到顯示搜尋結果的延遲（依序 vs 並行）
+
+不連線到 Discord 與 YouTube：以可設定分布的睡眠模擬語音連線（含重試）、
+YouTube 搜尋（含快取命中）與送出搜尋結果訊息，並以 Music._prepare_play
+的實際程式碼執行並行版本：
+- 依序：先等語音連線完成再搜尋（舊流程）
+- 並行：語音連線與搜尋在同一個 TaskGroup 中進行
+
+接著模擬使用者在選擇畫面上考慮的時間，比較預先解析前 0／1／2 個結果時，
+按下選擇後還要等待多久才取得音訊 URL，以及被取消或浪費的解析次數。
+
+另外注入失敗情境，確認連線失敗時搜尋與預先解析會被取消、
+搜尋失敗時這次才加入的語音連線會被斷開。
+
+用法：
+    python benchmarks/bench_play_prepare.py --trials 500
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import music_cog  # noqa: E402
+from music_cog import Music  # noqa: E402
+from extraction_scheduler import ExtractionScheduler  # noqa: E402
+from youtube_search import extract_video_id  # noqa: E402
+
+
+class FakeVoiceClient:
+    def __init__(self, guild):
+        self.guild = guild
+        self.connected = False
+
+    async def disconnect(self, force=False):
+        self.guild.voice_client = None
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.voice_client = None
+
+
+class FakeContext:
+    def __init__(self, guild_id):
+        self.guild = FakeGuild(guild_id)
+        self.responses = []
+
+
+class NoUnplayable:
+    def __contains__(self, video_id):
+        return False
+
+    def filter(self, videos):
+        return videos
+
+
+class FakeCog:
+    """只借用 Music 中 /play 準備階段用到的方法，外部服務以睡眠模擬"""
+
+    _prepare_play = Music._prepare_play
+    _parse_search_results = Music._parse_search_results
+    _start_prefetch = Music._start_prefetch
+    _prefetch = Music._prefetch
+    start_speculative = Music.start_speculative
+    cancel_speculative = Music.cancel_speculative
+    resolve_audio = Music.resolve_audio
+
+    def __init__(self, args, rng):
+        self.args = args
+        self.rng = rng
+        self.logger = logging.getLogger("bench_play_prepare")
+        self.stream_cache = {}
+        self.unplayable = NoUnplayable()
+        self.audio_cache = None
+        self.prefetch_tasks = defaultdict(dict)
+        self.speculative_tasks = defaultdict(dict)
+        self.speculative_started = 0
+        self.speculative_cancelled = 0
+        self.extractions = 0
+        # 不限制名額：這裡只測量連線、搜尋與預先解析的重疊
+        self.extraction = ExtractionScheduler(10**6)
+
+    def connect_latency(self):
+        latency = self.rng.lognormvariate(0, 0.35) * self.args.connect_ms / 1000
+        if self.rng.random() < self.args.retry_rate:
+            # 第一次握手失敗：等待一秒後重試（ensure_voice_connected 的行為）
+            latency += 1.0 + self.rng.lognormvariate(0, 0.35) * self.args.connect_ms / 1000
+        return latency
+
+    def search_latency(self):
+        if self.rng.random() < self.args.cache_hit:
+            return 0.0
+        return self.rng.lognormvariate(0, 0.4) * self.args.search_ms / 1000
+
+    async def ensure_voice_connected(self, ctx, *, fail=False):
+        # discord.py 在握手前就註冊語音客戶端，取消時會留下未完成的連線
+        ctx.guild.voice_client = FakeVoiceClient(ctx.guild)
+        await asyncio.sleep(self.connect_latency())
+        if fail:
+            ctx.guild.voice_client = None
+            ctx.responses.append("無法連接到語音頻道，請稍後再試。")
+            return False
+        ctx.guild.voice_client.connected = True
+        return True
+
+    async def _search_youtube_with_retry(self, query, *, fail=False):
+        await asyncio.sleep(self.search_latency())
+        if fail:
+            return {"items": []}
+        return {
+            "items": [
+                {"id": {"videoId": f"{query}{i:04d}"}, "snippet": {"title": f"{query} #{i}"}}
+                for i in range(5)
+            ]
+        }
+
+    async def get_audio_url(self, url, **kwargs):
+        video_id = extract_video_id(url)
+        if video_id in self.stream_cache:
+            return self.stream_cache[video_id]
+        self.speculative_started += 1
+        try:
+            await asyncio.sleep(self.rng.lognormvariate(0, 0.3) * self.args.extract_ms / 1000)
+        except asyncio.CancelledError:
+            self.speculative_cancelled += 1
+            raise
+        self.extractions += 1
+        self.stream_cache[video_id] = {"url": url}
+        return self.stream_cache[video_id]
+
+    async def _send_response(self, ctx, content=None, **kwargs):
+        await asyncio.sleep(self.args.send_ms / 1000)
+        ctx.responses.append(content)
+
+
+async def sequential(cog, ctx, query):
+    """舊流程：語音連線完成後才搜尋"""
+    if not await cog.ensure_voice_connected(ctx):
+        return None
+    response = await cog._search_youtube_with_retry(query)
+    return cog._parse_search_results(response)
+
+
+async def run_trial(cog, index, concurrent):
+    ctx = FakeContext(index)
+    query = f"s{index:06d}"
+    started = time.perf_counter()
+    if concurrent:
+        videos = await Music._prepare_play(cog, ctx, query, _NullTrace())
+    else:
+        videos = await sequential(cog, ctx, query)
+    await cog._send_response(ctx, embed=videos)
+    return time.perf_counter() - started
+
+
+class _NullTrace:
+    def record(self, stage, seconds):
+        pass
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000
+
+
+async def selection_trial(cog, index):
+    """顯示搜尋結果後等待使用者選擇，回傳按下選擇到取得音訊 URL 的等待時間"""
+    ctx = FakeContext(index)
+    videos = await Music._prepare_play(cog, ctx, f"s{index:06d}", _NullTrace())
+    await asyncio.sleep(cog.rng.lognormvariate(0, 0.5) * cog.args.think_ms / 1000)
+    # 大多數人選第一個結果
+    choice = cog.rng.choices(range(len(videos)), weights=(60, 20, 10, 5, 5))[0]
+    selected = videos[choice]
+    cog.cancel_speculative(ctx.guild.id, videos, keep=selected["id"])
+    started = time.perf_counter()
+    await cog.resolve_audio(ctx.guild.id, selected["url"])
+    return time.perf_counter() - started
+
+
+async def failure_checks(args):
+    """連線失敗取消搜尋，搜尋失敗斷開新的語音連線"""
+    rng = random.Random(args.seed + 1)
+    cog = FakeCog(args, rng)
+    results = {}
+
+    # 連線失敗：搜尋已完成並開始預先解析，之後要被取消
+    cog.args = argparse.Namespace(**{**vars(args), "cache_hit": 1.0, "extract_ms": 60_000})
+    original_connect = cog.ensure_voice_connected
+
+    async def failing_connect(ctx):
+        return await original_connect(ctx, fail=True)
+
+    cog.ensure_voice_connected = failing_connect
+    ctx = FakeContext(1)
+    videos = await Music._prepare_play(cog, ctx, "fail-connect", _NullTrace())
+    await asyncio.sleep(0)
+    results["connect_fail"] = (
+        videos is None
+        and not cog.speculative_tasks.get(1)
+        and cog.speculative_cancelled == cog.speculative_started
+        and ctx.responses == ["無法連接到語音頻道，請稍後再試。"]
+    )
+
+    # 搜尋失敗：連線中途被取消並斷開
+    cog = FakeCog(args, rng)
+    original_search = cog._search_youtube_with_retry
+
+    async def failing_search(query):
+        return await original_search(query, fail=True)
+
+    cog._search_youtube_with_retry = failing_search
+    cog.args = argparse.Namespace(**{**vars(args), "cache_hit": 1.0})
+    ctx = FakeContext(2)
+    started = time.perf_counter()
+    videos = await Music._prepare_play(cog, ctx, "fail-search", _NullTrace())
+    abort_ms = (time.perf_counter() - started) * 1000 - args.send_ms
+    results["search_fail"] = (
+        videos is None
+        and ctx.guild.voice_client is None
+        and ctx.responses == ["找不到相關影片。"]
+    )
+    results["search_fail_abort_ms"] = abort_ms
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trials", type=int, default=500)
+    parser.add_argument("--connect-ms", type=float, default=700, help="語音握手的中位數")
+    parser.add_argument("--retry-rate", type=float, default=0.05, help="握手失敗需重試的比例")
+    parser.add_argument("--search-ms", type=float, default=350, help="YouTube API 搜尋的中位數")
+    parser.add_argument("--cache-hit", type=float, default=0.3, help="搜尋快取命中率")
+    parser.add_argument("--send-ms", type=float, default=120, help="送出搜尋結果訊息")
+    parser.add_argument("--extract-ms", type=float, default=1500, help="預先解析的時間")
+    parser.add_argument("--think-ms", type=float, default=4000, help="使用者選擇前考慮的中位數")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(
+        f"{args.trials} 次 /play：語音握手 p50 {args.connect_ms:.0f} ms（{args.retry_rate:.0%} 重試），"
+        f"搜尋 p50 {args.search_ms:.0f} ms（快取命中 {args.cache_hit:.0%}）"
+    )
+    timings = {}
+    for concurrent in (False, True):
+        cog = FakeCog(args, random.Random(args.seed))
+        durations = await asyncio.gather(
+            *(run_trial(cog, i, concurrent) for i in range(args.trials))
+        )
+        for tasks_for_guild in cog.speculative_tasks.values():
+            for task in tasks_for_guild.values():
+                task.cancel()
+        label = "並行" if concurrent else "依序"
+        timings[label] = durations
+        print(
+            f"  {label}  到顯示搜尋結果 p50 {percentile(durations, 50):6.0f} ms | "
+            f"p95 {percentile(durations, 95):6.0f} ms | p99 {percentile(durations, 99):6.0f} ms"
+        )
+    for pct in (50, 95):
+        before = percentile(timings["依序"], pct)
+        after = percentile(timings["並行"], pct)
+        print(f"  p{pct} 減少 {before - after:.0f} ms（{(before - after) / before:.0%}）")
+
+    print(f"選擇畫面：考慮時間 p50 {args.think_ms:.0f} ms，解析 p50 {args.extract_ms:.0f} ms")
+    for count in (0, 1, 2):
+        music_cog.SPECULATIVE_RESULTS = count
+        cog = FakeCog(args, random.Random(args.seed))
+        waits = await asyncio.gather(*(selection_trial(cog, i) for i in range(args.trials)))
+        wasted = cog.extractions - args.trials  # 解析完成卻沒被選中的結果
+        print(
+            f"  預先解析 {count} 個  選擇後等待 p50 {percentile(waits, 50):6.0f} ms | "
+            f"p95 {percentile(waits, 95):6.0f} ms | 取消 {cog.speculative_cancelled:4d} | "
+            f"多餘解析 {max(wasted, 0):4d}"
+        )
+
+    checks = await failure_checks(args)
+    print(
+        f"  連線失敗時取消搜尋與預先解析: {'通過' if checks['connect_fail'] else '失敗'} | "
+        f"搜尋失敗時斷開語音: {'通過' if checks['search_fail'] else '失敗'}"
+        f"（{checks['search_fail_abort_ms']:.0f} ms 內結束）"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,348 @@
+"""
+壓力測試：每個伺服器的播放控制任務（PlaybackActor）
+
+不連線到 Discord：以 audio_node.StandInVoiceClient（discord.py 的 AudioPlayer，
+每 20 ms 讀取一個封包後丟棄）當作語音客戶端，音訊源改為計數的假音訊源，
+並以 Music.start_next 的實際程式碼播放。每個伺服器同時送出大量的
+加入歌曲、/skip 與重複或過期的音軌結束事件，另外有一個伺服器的歌曲全部無法播放。
+
+- actor：事件交給 PlaybackActor（目前的做法）
+- legacy：模擬舊的進入點：加入歌曲時檢查 is_playing 後直接呼叫、after 回調以
+  run_coroutine_threadsafe 呼叫、/skip 只停止語音客戶端、失敗時立即再播放下一首
+
+回報兩首歌同時送出封包的次數、AlreadyPlaying 錯誤、兩個 start_next 同時
+播放而必須停止前一首的次數（舊的 play_next 沒有這個保護，會直接得到
+AlreadyPlaying）、連續失敗伺服器的嘗試次數與事件迴圈延遲。
+
+用法：
+    python benchmarks/bench_playback_actor.py --guilds 30 --seconds 10
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_node import OPUS_SILENCE, StandInVoiceClient  # noqa: E402
+from music_cog import MusicQueue, Music  # noqa: E402
+from playback_actor import FAILED  # noqa: E402
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.overlaps = 0  # 舊的音軌在新的音軌開始後仍送出封包
+        self.already_playing = 0
+        self.max_open = 0
+        self.tracks_started = 0
+        self.attempts = defaultdict(int)  # 每個伺服器嘗試播放的次數
+        self.max_depth = 0
+        self.collisions = 0  # start_next 發現語音客戶端已在播放別首歌
+
+
+class CollisionCounter(logging.Handler):
+    """計算 start_next 停止殘留音軌的警告"""
+
+    def __init__(self, stats):
+        super().__init__(logging.WARNING)
+        self.stats = stats
+
+    def emit(self, record):
+        if "停止殘留的音軌" in record.getMessage():
+            self.stats.collisions += 1
+
+
+class CountingSource(discord.AudioSource):
+    """固定長度的靜音音訊源，記錄同一伺服器是否有兩首歌同時被讀取"""
+
+    def __init__(self, guild, frames, stats):
+        self.guild = guild
+        self.remaining = frames
+        self.stats = stats
+        self.first_read = None
+        self.last_read = None
+        with stats.lock:
+            guild.open_sources.add(self)
+            stats.max_open = max(stats.max_open, len(guild.open_sources))
+
+    def read(self):
+        if self.remaining <= 0:
+            return b""
+        self.remaining -= 1
+        now = time.perf_counter()
+        with self.stats.lock:
+            if self.first_read is None:
+                self.first_read = now
+                self.stats.tracks_started += 1
+            for other in self.guild.open_sources:
+                if (
+                    other is not self
+                    and other.first_read is not None
+                    and other.first_read <= self.first_read
+                    and other.last_read is not None
+                    and other.last_read >= self.first_read
+                    and other.last_read > now - 0.005
+                ):
+                    self.stats.overlaps += 1
+            self.last_read = now
+        return OPUS_SILENCE
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        with self.stats.lock:
+            self.guild.open_sources.discard(self)
+
+
+class CheckedVoiceClient(StandInVoiceClient):
+    def __init__(self, loop, stats):
+        super().__init__(loop)
+        self.stats = stats
+
+    def play(self, source, *, after=None):
+        try:
+            super().play(source, after=after)
+        except discord.ClientException:
+            self.stats.already_playing += 1
+            raise
+
+
+class FakeGuild:
+    def __init__(self, guild_id, voice_client):
+        self.id = guild_id
+        self.voice_client = voice_client
+        self.open_sources = set()
+
+
+class FakeCog:
+    """借用 Music 中播放相關的方法，解析與回覆改為假的實作"""
+
+    start_next = Music.start_next
+    play_next = Music.play_next
+    playback = Music.playback
+    stop_playback = Music.stop_playback
+    stop_voice = Music.stop_voice
+    after_playing_callback = Music.after_playing_callback
+
+    def __init__(self, args, stats, guilds, loop):
+        self.args = args
+        self.stats = stats
+        self.rng = random.Random(args.seed)
+        self.loop = loop
+        self.guilds = {g.id: g for g in guilds}
+        self.bot = SimpleNamespace(get_guild=self.guilds.get, loop=loop)
+        self.logger = logging.getLogger("bench_playback_actor")
+        self.queues = {}
+        self.playback_actors = {}
+        self.idle_scheduler = SimpleNamespace(cancel=lambda guild_id: None)
+        self.stream_cache = SimpleNamespace(invalidate=lambda video_id: None)
+        self.failed_guilds = set()
+        self.gave_up = {}
+
+    def get_queue(self, guild_id):
+        queue = self.queues.get(guild_id)
+        if queue is None:
+            queue = self.queues[guild_id] = MusicQueue()
+        return queue
+
+    async def _open_track(self, guild_id, song, start=0.0, *, use_node=False, trace=None):
+        self.stats.attempts[guild_id] += 1
+        await asyncio.sleep(self.rng.uniform(0.005, 0.05))  # 解析與建立音訊源
+        if guild_id in self.failed_guilds or self.rng.random() < self.args.fail_rate:
+            raise Exception("無法獲取音訊 URL")
+        frames = int(self.rng.uniform(0.2, 1.0) / 0.02)
+        return CountingSource(self.guilds[guild_id], frames, self.stats), song["title"]
+
+    async def _send_response(self, ctx, content=None, **kwargs):
+        pass
+
+    def schedule_prefetch(self, guild_id):
+        pass
+
+    def refresh_idle(self, guild_id):
+        pass
+
+    def finish_trace(self, trace, outcome="played"):
+        pass
+
+    def _record_track_gap(self, guild_id, queue):
+        pass
+
+    async def playback_failed(self, guild_id, ctx, failures):
+        self.gave_up[guild_id] = failures
+        await Music.playback_failed(self, guild_id, ctx, failures)
+
+
+class LegacyCog(FakeCog):
+    """舊的進入點：沒有信箱，任何地方都可以直接開始播放下一首"""
+
+    def after_playing_callback(self, guild_id, token):
+        async def _after_playing():
+            queue = self.get_queue(guild_id)
+            if queue.voice_client and not queue.voice_client.is_playing():
+                await self.legacy_play_next(guild_id)
+
+        def wrapper(error=None):
+            asyncio.run_coroutine_threadsafe(_after_playing(), self.loop)
+
+        return wrapper
+
+    async def legacy_play_next(self, guild_id, ctx=None, depth=1):
+        self.stats.max_depth = max(self.stats.max_depth, depth)
+        outcome = await self.start_next(guild_id, ctx, None, 0)
+        if outcome == FAILED and depth < 200:
+            # 舊的錯誤處理：遞迴播放下一首
+            await self.legacy_play_next(guild_id, ctx, depth + 1)
+
+    async def play_next(self, guild_id, ctx=None, trace=None):
+        if not self.get_queue(guild_id).is_playing:
+            await self.legacy_play_next(guild_id, ctx)
+
+    async def skip(self, guild_id):
+        self.stop_voice(guild_id)
+
+
+async def storm(cog, guild_id, args, rng, deadline, legacy):
+    """對單一伺服器隨機送出加入、跳過與音軌結束事件"""
+    counter = 0
+    while time.perf_counter() < deadline:
+        action = rng.random()
+        queue = cog.get_queue(guild_id)
+        if action < args.add_rate:
+            # 同一時間多個人按下選擇按鈕，各自加入一首歌
+            clicks = rng.randint(1, 3)
+            for _ in range(clicks):
+                counter += 1
+                queue.add({"title": f"{guild_id}-{counter}", "url": f"https://youtu.be/{guild_id:05d}{counter:06d}"})
+            await asyncio.gather(*(cog.play_next(guild_id) for _ in range(clicks)))
+        elif action < args.add_rate + args.skip_rate:
+            if legacy:
+                await cog.skip(guild_id)
+            else:
+                await cog.playback(guild_id).skip()
+        elif not legacy:
+            # 重複或過期的結束事件（例如被跳過的音軌在之後才回報）
+            actor = cog.playback(guild_id)
+            live = (actor.token, actor._advance_token)
+            stale = [t for t in range(max(1, actor._next_token - 3), actor._next_token + 1) if t not in live]
+            if stale:
+                token = rng.choice(stale)
+                threading.Thread(target=actor.notify_track_end, args=(token,)).start()
+        await asyncio.sleep(rng.uniform(0, args.interval))
+
+
+async def lag_probe(samples, stop):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - started - 0.01)
+
+
+async def run(args, legacy):
+    loop = asyncio.get_running_loop()
+    stats = Stats()
+    guilds = []
+    for index in range(args.guilds):
+        voice = CheckedVoiceClient(loop, stats)
+        await voice.connect()
+        guilds.append(FakeGuild(30_000 + index, voice))
+
+    cog_cls = LegacyCog if legacy else FakeCog
+    cog = cog_cls(args, stats, guilds, loop)
+    counter = CollisionCounter(stats)
+    cog.logger.addHandler(counter)
+    for guild in guilds:
+        cog.get_queue(guild.id).voice_client = guild.voice_client
+    # 最後一個伺服器的歌曲全部無法播放
+    failing = guilds[-1].id
+    cog.failed_guilds.add(failing)
+    failing_queue = cog.get_queue(failing)
+    failing_queue.extend(
+        {"title": f"bad-{i}", "url": f"https://youtu.be/bad{i:08d}"} for i in range(100)
+    )
+    failing_task = asyncio.create_task(cog.play_next(failing))
+    if not legacy:
+        # 縮短退避，讓測試在幾秒內結束
+        for actor_guild in guilds:
+            actor = cog.playback(actor_guild.id)
+            actor.backoff_base = 0.05
+            actor.backoff_max = 0.4
+
+    samples, stop = [], asyncio.Event()
+    probe = asyncio.create_task(lag_probe(samples, stop))
+    deadline = time.perf_counter() + args.seconds
+    rng = random.Random(args.seed)
+    storms = [
+        storm(cog, guild.id, args, random.Random(rng.random()), deadline, legacy)
+        for guild in guilds[:-1]
+    ]
+    await asyncio.gather(*storms)
+    await failing_task
+    await asyncio.sleep(1.0)  # 讓最後的音軌結束事件送達
+    stop.set()
+    await probe
+
+    for guild in guilds:
+        if not legacy:
+            await cog.stop_playback(guild.id)
+        guild.voice_client.stop()
+    for actor in cog.playback_actors.values():
+        actor.close()
+    cog.logger.removeHandler(counter)
+
+    ordered = sorted(samples) or [0.0]
+    return {
+        "overlaps": stats.overlaps,
+        "already_playing": stats.already_playing,
+        "max_open": stats.max_open,
+        "collisions": stats.collisions,
+        "tracks": stats.tracks_started,
+        "failing_attempts": stats.attempts[failing],
+        "gave_up": cog.gave_up.get(failing),
+        "max_depth": stats.max_depth,
+        "lag_p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--guilds", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--interval", type=float, default=0.15, help="每個伺服器兩個事件之間的最大間隔")
+    parser.add_argument("--add-rate", type=float, default=0.35, help="事件中加入歌曲的比例")
+    parser.add_argument("--skip-rate", type=float, default=0.45, help="事件中 /skip 的比例（其餘為過期的結束事件）")
+    parser.add_argument("--fail-rate", type=float, default=0.1, help="一般歌曲無法播放的比例")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    logging.getLogger("bench_playback_actor").setLevel(logging.WARNING)
+    logging.getLogger("bench_playback_actor").propagate = False
+
+    print(f"{args.guilds} 個伺服器，{args.seconds:.0f} 秒的加入／跳過／結束事件")
+    for legacy in (True, False):
+        result = await run(args, legacy)
+        label = "legacy" if legacy else "actor "
+        print(
+            f"  {label} 重疊封包 {result['overlaps']:5d} | AlreadyPlaying {result['already_playing']:4d} | "
+            f"同時播放衝突 {result['collisions']:4d} | 同時開啟音訊源 {result['max_open']} | "
+            f"播放 {result['tracks']:5d} 首 | "
+            f"失敗伺服器嘗試 {result['failing_attempts']:3d} 次"
+            + (f"（遞迴深度 {result['max_depth']}）" if legacy else f"（第 {result['gave_up']} 次後停止）")
+            + f" | 迴圈延遲 p99 {result['lag_p99']:.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+"""
+基準測試：大量並行 YouTube 搜尋時的事件迴圈延遲
+
+比較舊的 googleapiclient `.execute()`（在事件迴圈上同步執行）
+與新的 aiohttp YouTubeSearchClient，搜尋目標為本機 stub HTTP 伺服器。
+
+用法：
+    python benchmarks/bench_search_loop_lag.py --searches 50 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from youtube_search import YouTubeSearchClient  # noqa: E402
+
+
+def make_stub_app(latency: float) -> web.Application:
+    """模擬 YouTube search 端點，固定延遲後回傳 5 筆結果"""
+
+    async def search(request):
+        await asyncio.sleep(latency)
+        query = request.query.get("q", "")
+        items = [
+            {
+                "id": {"kind": "youtube#video", "videoId": f"vid{i:08d}"},
+                "snippet": {"title": f"{query} #{i}"},
+            }
+            for i in range(5)
+        ]
+        return web.json_response({"items": items})
+
+    app = web.Application()
+    app.router.add_get("/youtube/v3/search", search)
+    return app
+
+
+def start_stub_server(latency: float) -> str:
+    """在獨立執行緒的事件迴圈中啟動 stub 伺服器
+
+    舊實作會阻塞受測的事件迴圈，stub 必須在另一個迴圈中才能回應。
+    """
+    ready = threading.Event()
+    result = {}
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        runner = web.AppRunner(make_stub_app(latency))
+        loop.run_until_complete(runner.setup())
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        loop.run_until_complete(site.start())
+        result["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return f"http://127.0.0.1:{result['port']}"
+
+
+async def measure_lag(stop: asyncio.Event, samples: list, interval: float = 0.005):
+    """以固定間隔 sleep，記錄實際喚醒時間與預期的差距"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - start - interval)
+
+
+async def run_blocking(base_url: str, searches: int):
+    """舊實作：googleapiclient 在事件迴圈上直接 .execute()"""
+    from googleapiclient.discovery import build
+
+    youtube = build(
+        "youtube",
+        "v3",
+        developerKey="bench",
+        cache_discovery=False,
+        client_options={"api_endpoint": base_url},
+    )
+
+    async def one(i):
+        # 與舊版 Music._search_youtube_with_retry 相同：協程中同步呼叫
+        return (
+            youtube.search()
+            .list(q=f"song {i}", part="id,snippet", maxResults=5, type="video")
+            .execute()
+        )
+
+    await asyncio.gather(*(one(i) for i in range(searches)))
+
+
+async def run_async(base_url: str, searches: int):
+    """新實作：aiohttp 共用連線池"""
+    client = YouTubeSearchClient("bench", base_url=f"{base_url}/youtube/v3")
+    try:
+        await asyncio.gather(*(client.search(f"song {i}") for i in range(searches)))
+    finally:
+        await client.close()
+
+
+async def bench(name: str, runner, base_url: str, searches: int):
+    samples: list = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_lag(stop, samples))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await runner(base_url, searches)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await lag_task
+
+    samples.sort()
+    p99 = samples[int(len(samples) * 0.99) - 1] if samples else 0.0
+    print(
+        f"{name:<22} 總耗時 {elapsed * 1000:8.1f} ms | "
+        f"迴圈延遲 平均 {statistics.mean(samples) * 1000:7.2f} ms  "
+        f"p99 {p99 * 1000:7.2f} ms  最大 {max(samples) * 1000:7.2f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--searches", type=int, default=50, help="並行搜尋數量")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub 回應延遲（秒）")
+    args = parser.parse_args()
+
+    base_url = start_stub_server(args.latency)
+
+    print(f"{args.searches} 個並行搜尋，stub 延遲 {args.latency * 1000:.0f} ms")
+    await bench("googleapiclient (舊)", run_blocking, base_url, args.searches)
+    await bench("aiohttp 客戶端 (新)", run_async, base_url, args.searches)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,393 @@
+"""
+叢集啟動器 - 將分片分配到多個行程執行
+
+- 啟動器向 Discord 查詢建議的分片數與 IDENTIFY 併發上限，
+  將分片依序切成 CLUSTER_COUNT 段，每段由一個 ShardedPartyBot 行程負責
+- 所有分片的 IDENTIFY 都先向啟動器申請，同一個 bucket（shard_id % max_concurrency）
+  每 5 秒只放行一次，多個行程同時啟動也不會超過限制
+- 叢集行程定期回報健康狀態，啟動器寫入 CLUSTER_HEALTH_PATH 並重新啟動異常結束的叢集
+- 收到 SIGINT/SIGTERM 時通知所有叢集關閉連線，逾時才強制結束
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+IDENTIFY_INTERVAL = 5.0  # Discord 每個 bucket 兩次 IDENTIFY 之間的最短間隔（秒）
+
+
+def current_rss_mb() -> float:
+    """目前行程的常駐記憶體（MB）"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        # 非 Linux 平台：改用峰值記憶體（macOS 單位為位元組，Linux 為 KB）
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def fetch_gateway_info(token: str) -> Dict[str, Any]:
+    """查詢建議的分片數與 session_start_limit"""
+    request = urllib.request.Request(
+        GATEWAY_BOT_URL,
+        headers={"Authorization": f"Bot {token}", "User-Agent": "DiscordBot (dc-partybot, 0.1)"},
+    )
+    with urllib.request.urlopen(request, timeout=15) as resp:
+        return json.load(resp)
+
+
+def split_shards(shard_count: int, cluster_count: int) -> List[List[int]]:
+    """將分片依序切成數量盡量平均的連續區段"""
+    cluster_count = max(1, min(cluster_count, shard_count))
+    base, extra = divmod(shard_count, cluster_count)
+    ranges, start = [], 0
+    for index in range(cluster_count):
+        size = base + (1 if index < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+class IdentifyGate:
+    """跨行程的 IDENTIFY 速率控制（由啟動器持有）"""
+
+    def __init__(self, max_concurrency: int = 1, interval: float = IDENTIFY_INTERVAL):
+        self.max_concurrency = max(1, max_concurrency)
+        self.interval = interval
+        self._pending: Dict[int, deque] = {}  # bucket -> deque[(cluster_id, shard_id)]
+        self._next_allowed: Dict[int, float] = {}
+
+    def request(self, cluster_id: int, shard_id: int):
+        bucket = shard_id % self.max_concurrency
+        self._pending.setdefault(bucket, deque()).append((cluster_id, shard_id))
+
+    def drop_cluster(self, cluster_id: int):
+        """叢集行程結束時移除它尚未放行的申請"""
+        for pending in self._pending.values():
+            for item in [i for i in pending if i[0] == cluster_id]:
+                pending.remove(item)
+
+    def grant_ready(self) -> List[tuple]:
+        """回傳現在可以放行的 (cluster_id, shard_id)"""
+        now = time.monotonic()
+        granted = []
+        for bucket, pending in self._pending.items():
+            if pending and self._next_allowed.get(bucket, 0.0) <= now:
+                granted.append(pending.popleft())
+                self._next_allowed[bucket] = now + self.interval
+        return granted
+
+
+class ClusterLink:
+    """叢集行程與啟動器之間的通道（在叢集行程中使用）"""
+
+    def __init__(self, cluster_id: int, inbox, outbox):
+        self.cluster_id = cluster_id
+        self.inbox = inbox
+        self.outbox = outbox
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[int, asyncio.Future] = {}
+        self._on_shutdown = None
+
+    def start(self, on_shutdown):
+        """啟動讀取執行緒；on_shutdown 會在事件迴圈上呼叫"""
+        self._loop = asyncio.get_running_loop()
+        self._on_shutdown = on_shutdown
+        threading.Thread(target=self._reader, name="cluster-link", daemon=True).start()
+
+    def _reader(self):
+        while True:
+            message = self.inbox.get()
+            if message is None:
+                return
+            kind = message[0]
+            if kind == "identify_ok":
+                self._loop.call_soon_threadsafe(self._release, message[1])
+            elif kind == "shutdown":
+                self._loop.call_soon_threadsafe(self._on_shutdown)
+                return
+
+    def _release(self, shard_id: int):
+        waiter = self._waiters.pop(shard_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(None)
+
+    async def acquire_identify(self, shard_id: int):
+        """等待啟動器放行這個分片的 IDENTIFY"""
+        waiter = self._loop.create_future()
+        self._waiters[shard_id] = waiter
+        self.outbox.put(("identify", self.cluster_id, shard_id))
+        await waiter
+
+    def report(self, payload: Dict[str, Any]):
+        self.outbox.put(("health", self.cluster_id, payload))
+
+
+def _health_payload(bot) -> Dict[str, Any]:
+    latencies = {
+        str(shard_id): round(latency * 1000, 1)
+        for shard_id, latency in bot.latencies
+        if latency == latency  # 尚未收到心跳時為 NaN
+    }
+    return {
+        "ready": bot.is_ready(),
+        "shards": latencies,
+        "guilds": len(bot.guilds),
+        "voice_clients": len(bot.voice_clients),
+        "rss_mb": round(current_rss_mb(), 1),
+    }
+
+
+async def _cluster_main(cluster_id, shard_ids, shard_count, token, inbox, outbox, health_interval):
+    from main import create_bot
+
+    link = ClusterLink(cluster_id, inbox, outbox)
+    bot = create_bot(
+        sharded=True,
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        cluster=link,
+        sync_commands=cluster_id == 0,  # 全域指令只需由一個叢集同步
+    )
+    link.start(lambda: asyncio.create_task(bot.close()))
+
+    async def report_health():
+        while True:
+            await asyncio.sleep(health_interval)
+            try:
+                link.report(_health_payload(bot))
+            except Exception as e:
+                logger.error(f"回報叢集健康狀態時發生錯誤: {str(e)}")
+
+    health_task = asyncio.create_task(report_health())
+    try:
+        await bot.start(token)
+    finally:
+        health_task.cancel()
+        if not bot.is_closed():
+            await bot.close()
+
+
+def run_cluster(cluster_id, shard_ids, shard_count, token, inbox, outbox, health_interval):
+    """叢集行程入口"""
+    # 由啟動器統一處理中斷信號
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    os.environ["CLUSTER_ID"] = str(cluster_id)
+    logger.info(f"叢集 {cluster_id} 啟動，分片 {shard_ids[0]}-{shard_ids[-1]} / {shard_count}")
+    try:
+        asyncio.run(
+            _cluster_main(cluster_id, shard_ids, shard_count, token, inbox, outbox, health_interval)
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+class ClusterLauncher:
+    """啟動並監督所有叢集行程"""
+
+    def __init__(
+        self,
+        token: str,
+        *,
+        cluster_count: int,
+        shard_count: int = 0,
+        health_interval: float = 30.0,
+        health_path: Optional[str] = None,
+        shutdown_timeout: float = 30.0,
+        restart_delay: float = 30.0,
+        max_restart_delay: float = 600.0,
+    ):
+        self.token = token
+        self.cluster_count = cluster_count
+        self.shard_count = shard_count
+        self.health_interval = health_interval
+        self.health_path = health_path
+        self.shutdown_timeout = shutdown_timeout
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.context = multiprocessing.get_context("spawn")
+        self.outbox = self.context.Queue()
+        self.clusters: Dict[int, Dict[str, Any]] = {}
+        self.health: Dict[int, Dict[str, Any]] = {}
+        self.gate: Optional[IdentifyGate] = None
+        self._stopping = False
+
+    def _start_cluster(self, cluster_id: int, shard_ids: List[int]):
+        inbox = self.context.Queue()
+        process = self.context.Process(
+            target=run_cluster,
+            name=f"cluster-{cluster_id}",
+            args=(
+                cluster_id,
+                shard_ids,
+                self.shard_count,
+                self.token,
+                inbox,
+                self.outbox,
+                self.health_interval,
+            ),
+        )
+        process.start()
+        previous = self.clusters.get(cluster_id, {})
+        self.clusters[cluster_id] = {
+            "process": process,
+            "inbox": inbox,
+            "shard_ids": shard_ids,
+            "started_at": time.time(),
+            "restarts": previous.get("restarts", -1) + 1,
+            "backoff": previous.get("backoff", 0.0),  # 下次快速結束時的重啟等待秒數
+            "next_restart_at": None,  # 已結束、等待重新啟動的時間
+        }
+        self.health.pop(cluster_id, None)
+
+    def _handle(self, message):
+        kind, cluster_id, payload = message
+        if kind == "identify":
+            self.gate.request(cluster_id, payload)
+        elif kind == "health":
+            self.health[cluster_id] = {**payload, "reported_at": time.time()}
+
+    def _supervise(self):
+        """重新啟動異常結束的叢集
+
+        啟動後 restart_delay 秒內就結束（例如設定錯誤）時以指數退避延後重啟，
+        不會不斷重啟，也不會放棄這個叢集的分片。
+        """
+        now = time.time()
+        for cluster_id, cluster in list(self.clusters.items()):
+            process = cluster["process"]
+            if process.exitcode is None:
+                continue  # 仍在執行（或尚未回收）
+
+            if cluster["next_restart_at"] is None:
+                # 第一次發現結束：釋放 IDENTIFY 名額並排定重啟時間
+                self.gate.drop_cluster(cluster_id)
+                if now - cluster["started_at"] < self.restart_delay:
+                    cluster["backoff"] = min(
+                        self.max_restart_delay,
+                        max(self.restart_delay, cluster["backoff"] * 2),
+                    )
+                else:
+                    cluster["backoff"] = 0.0
+                cluster["next_restart_at"] = now + cluster["backoff"]
+                logger.error(
+                    f"叢集 {cluster_id} 已結束 (exit code {process.exitcode})，"
+                    f"{cluster['backoff']:g} 秒後重新啟動"
+                )
+
+            if now >= cluster["next_restart_at"]:
+                logger.info(f"重新啟動叢集 {cluster_id}")
+                self._start_cluster(cluster_id, cluster["shard_ids"])
+
+    def _write_health(self):
+        now = time.time()
+        report = {}
+        for cluster_id, cluster in self.clusters.items():
+            health = self.health.get(cluster_id, {})
+            reported_at = health.get("reported_at")
+            stale = reported_at is None or now - reported_at > self.health_interval * 3
+            report[str(cluster_id)] = {
+                "pid": cluster["process"].pid,
+                "alive": cluster["process"].is_alive(),
+                "shards": f"{cluster['shard_ids'][0]}-{cluster['shard_ids'][-1]}",
+                "restarts": cluster["restarts"],
+                "healthy": cluster["process"].is_alive()
+                and not stale
+                and health.get("ready", False),
+                **health,
+            }
+            logger.info(
+                f"叢集 {cluster_id}: {'正常' if report[str(cluster_id)]['healthy'] else '異常'} | "
+                f"伺服器 {health.get('guilds', '?')} | 語音 {health.get('voice_clients', '?')} | "
+                f"RSS {health.get('rss_mb', '?')} MB | 延遲 {health.get('shards', {})}"
+            )
+
+        if self.health_path:
+            tmp_path = f"{self.health_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"updated": now, "clusters": report}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.health_path)
+
+    def _request_stop(self, signum, frame):
+        logger.info("收到關閉信號，正在關閉所有叢集...")
+        self._stopping = True
+
+    def _shutdown(self):
+        for cluster in self.clusters.values():
+            cluster["inbox"].put(("shutdown",))
+        deadline = time.monotonic() + self.shutdown_timeout
+        for cluster_id, cluster in self.clusters.items():
+            process = cluster["process"]
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"叢集 {cluster_id} 未在時限內結束，強制終止")
+                process.terminate()
+                process.join(5)
+
+    def run(self):
+        """啟動所有叢集並阻塞直到收到關閉信號"""
+        gateway = fetch_gateway_info(self.token)
+        if self.shard_count <= 0:
+            self.shard_count = gateway["shards"]
+        limit = gateway.get("session_start_limit", {})
+        self.gate = IdentifyGate(limit.get("max_concurrency", 1))
+
+        remaining = limit.get("remaining")
+        if remaining is not None and remaining < self.shard_count:
+            logger.warning(
+                f"今日剩餘的 IDENTIFY 次數 ({remaining}) 少於分片數 ({self.shard_count})"
+            )
+
+        ranges = split_shards(self.shard_count, self.cluster_count)
+        logger.info(
+            f"🚀 啟動 {len(ranges)} 個叢集，共 {self.shard_count} 個分片 "
+            f"(IDENTIFY 併發 {self.gate.max_concurrency})"
+        )
+
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGTERM, self._request_stop)
+
+        for cluster_id, shard_ids in enumerate(ranges):
+            self._start_cluster(cluster_id, shard_ids)
+
+        next_health = time.monotonic() + self.health_interval
+        try:
+            while not self._stopping:
+                try:
+                    self._handle(self.outbox.get(timeout=0.25))
+                except queue.Empty:
+                    pass
+
+                for cluster_id, shard_id in self.gate.grant_ready():
+                    cluster = self.clusters.get(cluster_id)
+                    if cluster:
+                        cluster["inbox"].put(("identify_ok", shard_id))
+
+                self._supervise()
+
+                if time.monotonic() >= next_health:
+                    next_health = time.monotonic() + self.health_interval
+                    try:
+                        self._write_health()
+                    except OSError as e:
+                        logger.error(f"寫入叢集健康狀態時發生錯誤: {str(e)}")
+        finally:
+            self._shutdown()
+            logger.info("👋 所有叢集已關閉")
@@ -24,8 +24,75 @@ for env_file in ENV_FILES:
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN", "")
 COMMAND_PREFIX = os.getenv("COMMAND_PREFIX", "!")
 
+# Gateway 設定檔（lean：依擴展需要的意圖；full：所有意圖與完整成員快取）
+GATEWAY_PROFILE = os.getenv("GATEWAY_PROFILE", "lean").lower()
+
+# 分片配置（SHARD_MODE: single、auto 或 cluster）
+# - auto：單一行程使用 AutoShardedBot
+# - cluster：由啟動器將分片分配到 CLUSTER_COUNT 個行程
+SHARD_MODE = os.getenv("SHARD_MODE", "single").lower()
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))  # 0 表示使用 Discord 建議的數量
+CLUSTER_COUNT = int(os.getenv("CLUSTER_COUNT", str(os.cpu_count() or 1)))
+CLUSTER_HEALTH_INTERVAL = float(os.getenv("CLUSTER_HEALTH_INTERVAL", "30"))
+# 叢集行程由啟動器設定，用於區分各行程自己的本機資料檔
+CLUSTER_ID = os.getenv("CLUSTER_ID")
+
 # YouTube API 配置
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY", "")
+YOUTUBE_SEARCH_TIMEOUT = float(os.getenv("YOUTUBE_SEARCH_TIMEOUT", "10"))
+YOUTUBE_SEARCH_POOL_SIZE = int(os.getenv("YOUTUBE_SEARCH_POOL_SIZE", "20"))
+
+# 音樂快取配置
+STREAM_CACHE_SIZE = int(os.getenv("STREAM_CACHE_SIZE", "512"))
+STREAM_CACHE_DEFAULT_TTL = float(os.getenv("STREAM_CACHE_DEFAULT_TTL", "1800"))
+# YouTube 搜尋結果快取（SEARCH_CACHE_PERSIST=true 時寫入 DATA_DIR）
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 3600)))
+SEARCH_CACHE_PERSIST = os.getenv("SEARCH_CACHE_PERSIST", "true").lower() == "true"
+# 播放時預先解析佇列前幾首歌曲的數量（0 表示停用）
+PREFETCH_COUNT = int(os.getenv("PREFETCH_COUNT", "2"))
+# 連續播放失敗時的退避（秒，每次加倍）與停止播放前的上限
+PLAYBACK_RETRY_DELAY = float(os.getenv("PLAYBACK_RETRY_DELAY", "1"))
+PLAYBACK_RETRY_MAX_DELAY = float(os.getenv("PLAYBACK_RETRY_MAX_DELAY", "30"))
+PLAYBACK_MAX_FAILURES = int(os.getenv("PLAYBACK_MAX_FAILURES", "5"))
+# 顯示搜尋結果時預先解析前幾個結果（0 表示停用）
+SPECULATIVE_RESULTS = int(os.getenv("SPECULATIVE_RESULTS", "2"))
+
+# 本機 Ogg/Opus 音訊快取（播放次數達 AUDIO_CACHE_MIN_PLAYS 時寫入；
+# AUDIO_CACHE_MAX_MB 為所有叢集合計的上限）
+AUDIO_CACHE_ENABLED = os.getenv("AUDIO_CACHE_ENABLED", "true").lower() == "true"
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "temp_audio")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "512")) * 1024 * 1024
+AUDIO_CACHE_MIN_PLAYS = int(os.getenv("AUDIO_CACHE_MIN_PLAYS", "2"))
+
+# yt-dlp 解析池配置（EXTRACTOR_MODE: thread 或 process）
+EXTRACTOR_MODE = os.getenv("EXTRACTOR_MODE", "thread").lower()
+EXTRACTOR_WORKERS = int(os.getenv("EXTRACTOR_WORKERS", "2"))
+EXTRACTOR_MAX_QUEUE = int(os.getenv("EXTRACTOR_MAX_QUEUE", "32"))
+
+# 解析排程：每個伺服器最多等待的解析工作數，以及依聽眾人數加權的上限
+EXTRACTION_GUILD_MAX_QUEUE = int(os.getenv("EXTRACTION_GUILD_MAX_QUEUE", "16"))
+EXTRACTION_MAX_WEIGHT = int(os.getenv("EXTRACTION_MAX_WEIGHT", "3"))
+
+# 每位使用者 /play 與載入播放清單的速率限制（每分鐘補充次數與可連續使用次數，0 表示不限制）
+PLAY_RATE_PER_MINUTE = float(os.getenv("PLAY_RATE_PER_MINUTE", "10"))
+PLAY_RATE_BURST = int(os.getenv("PLAY_RATE_BURST", "4"))
+
+# 語音閒置：停止播放超過 VOICE_IDLE_TIMEOUT 秒（可由 /idletimeout 依伺服器調整），
+# 或頻道中沒有其他成員超過 VOICE_EMPTY_TIMEOUT 秒時自動離開
+VOICE_IDLE_TIMEOUT = float(os.getenv("VOICE_IDLE_TIMEOUT", "300"))
+VOICE_EMPTY_TIMEOUT = float(os.getenv("VOICE_EMPTY_TIMEOUT", "5"))
+
+# yt-dlp 背景自動更新：process 模式下安裝新版本並重建工作行程；
+# thread 模式只檢查並回報可用的新版本（執行中覆蓋安裝會混用新舊模組）
+YTDLP_AUTO_UPDATE = os.getenv("YTDLP_AUTO_UPDATE", "true").lower() == "true"
+YTDLP_UPDATE_INTERVAL_HOURS = float(os.getenv("YTDLP_UPDATE_INTERVAL_HOURS", "24"))
+YTDLP_UPDATE_FAILURE_RATE = float(os.getenv("YTDLP_UPDATE_FAILURE_RATE", "0.5"))
+
+# 音訊節點（python audio_node.py）：設定位址（host:port 或 Unix socket 路徑）後
+# 語音連線與 FFmpeg 改由節點行程負責；留空則在機器人行程中直接播放
+AUDIO_NODE_ADDRESS = os.getenv("AUDIO_NODE_ADDRESS", "")
+AUDIO_NODE_REQUEST_TIMEOUT = float(os.getenv("AUDIO_NODE_REQUEST_TIMEOUT", "10"))
 
 
 # 獲取 FFMPEG 路徑
@@ -62,6 +129,22 @@ FFMPEG_PATH = get_ffmpeg_path()
 DATA_DIR = os.getenv("DATA_DIR", "data")
 os.makedirs(DATA_DIR, exist_ok=True)  # 確保資料目錄存在
 
+
+def cluster_local_path(path: str) -> str:
+    """叢集模式下只由單一行程讀寫的檔案加上叢集編號，避免行程互相覆寫"""
+    if CLUSTER_ID is None:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.cluster{CLUSTER_ID}{ext}"
+
+
+# 叢集模式下每個行程使用自己的音訊快取目錄（啟動時清除未完成的暫存檔、
+# 依容量淘汰檔案都只影響自己的目錄），總容量上限由所有叢集平分
+AUDIO_CACHE_DIR = cluster_local_path(AUDIO_CACHE_DIR)
+if CLUSTER_ID is not None:
+    AUDIO_CACHE_MAX_BYTES //= max(1, CLUSTER_COUNT)
+
+
 # 檔案路徑
 EMOJI_DATA_PATH = os.path.join(
     DATA_DIR, os.getenv("EMOJI_DATA_FILE", "emoji_data.json")
@@ -69,9 +152,46 @@ EMOJI_DATA_PATH = os.path.join(
 PLAYLIST_DATA_PATH = os.path.join(
     DATA_DIR, os.getenv("PLAYLIST_DATA_FILE", "playlists.json")
 )
-REMINDERS_DATA_PATH = os.path.join(
-    DATA_DIR, os.getenv("REMINDERS_DATA_FILE", "reminders.json")
+REMINDERS_DATA_PATH = cluster_local_path(
+    os.path.join(DATA_DIR, os.getenv("REMINDERS_DATA_FILE", "reminders.json"))
 )
+SEARCH_CACHE_PATH = cluster_local_path(
+    os.path.join(DATA_DIR, os.getenv("SEARCH_CACHE_FILE", "search_cache.json"))
+)
+UNPLAYABLE_CACHE_PATH = cluster_local_path(
+    os.path.join(
+        DATA_DIR, os.getenv("UNPLAYABLE_CACHE_FILE", "unplayable_videos.json")
+    )
+)
+CLUSTER_HEALTH_PATH = os.path.join(DATA_DIR, "cluster_health.json")
+PLAYLIST_DATA_DIR = os.path.join(
+    DATA_DIR, os.getenv("PLAYLIST_DATA_DIR", "playlists")
+)
+QUEUE_DATA_DIR = os.path.join(DATA_DIR, os.getenv("QUEUE_DATA_DIR", "queues"))
+VOICE_SETTINGS_PATH = os.path.join(
+    DATA_DIR, os.getenv("VOICE_SETTINGS_FILE", "voice_settings.json")
+)
+INSTANT_PLAY_SETTINGS_PATH = os.path.join(
+    DATA_DIR, os.getenv("INSTANT_PLAY_SETTINGS_FILE", "instant_play.json")
+)
+
+# 歌單配置
+PLAYLIST_MAX_TRACKS = int(os.getenv("PLAYLIST_MAX_TRACKS", "1000"))
+# 匯入 YouTube 播放清單網址時的上限與每批數量
+PLAYLIST_IMPORT_MAX_TRACKS = int(os.getenv("PLAYLIST_IMPORT_MAX_TRACKS", "500"))
+PLAYLIST_IMPORT_CHUNK_SIZE = int(os.getenv("PLAYLIST_IMPORT_CHUNK_SIZE", "25"))
+
+# 佇列持久化配置
+QUEUE_PERSIST = os.getenv("QUEUE_PERSIST", "true").lower() == "true"
+QUEUE_JOURNAL_FLUSH_INTERVAL = float(os.getenv("QUEUE_JOURNAL_FLUSH_INTERVAL", "1"))
+QUEUE_COMPACT_THRESHOLD = int(os.getenv("QUEUE_COMPACT_THRESHOLD", "500"))
+
+# 事件迴圈看門狗：每 LOOP_WATCHDOG_INTERVAL 秒檢查一次心跳，
+# 阻塞超過 LOOP_WATCHDOG_THRESHOLD 秒時擷取堆疊，每 LOOP_WATCHDOG_REPORT_MINUTES 分鐘彙整到日誌
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL", "0.05"))
+LOOP_WATCHDOG_THRESHOLD = float(os.getenv("LOOP_WATCHDOG_THRESHOLD", "0.1"))
+LOOP_WATCHDOG_REPORT_MINUTES = float(os.getenv("LOOP_WATCHDOG_REPORT_MINUTES", "30"))
 
 
 # 檢查必要的 API 密鑰
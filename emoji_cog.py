@@ -7,6 +7,9 @@ import os
 import logging
 from config import EMOJI_DATA_PATH
 
+# 此擴展需要的 Gateway 意圖（由 main.build_gateway_profile 彙整）
+REQUIRED_INTENTS = ("guilds", "guild_messages", "message_content")
+
 
 class Emoji(commands.Cog):
     def __init__(self, bot):
@@ -0,0 +1,257 @@
+"""
+解析排程 - 在 yt-dlp 解析池前依伺服器公平分配解析名額
+
+每個伺服器有自己的等待佇列，伺服器之間以加權輪替的方式取出工作；
+「下一首馬上要播放」的解析優先於佇列預先解析，再優先於搜尋結果的預先解析。
+同一時間只放行與解析池工作者數量相同的工作，解析池本身的先進先出佇列
+因此不會被單一伺服器塞滿。另外提供每位使用者的請求速率限制。
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from extractor_pool import ExtractorQueueFull
+from music_metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+# 優先順序（數字越小越優先）
+NOW = 0  # 下一首歌曲馬上要播放
+PREFETCH = 1  # 佇列前幾首的預先解析
+SPECULATIVE = 2  # 搜尋結果的預先解析
+
+PRIORITY_NAMES = {NOW: "next", PREFETCH: "prefetch", SPECULATIVE: "speculative"}
+
+
+class _Job:
+    __slots__ = ("guild_id", "key", "priority", "enqueued_at", "admitted")
+
+    def __init__(self, guild_id: int, key: Optional[str], priority: int, future: asyncio.Future):
+        self.guild_id = guild_id
+        self.key = key
+        self.priority = priority
+        self.enqueued_at = time.perf_counter()
+        self.admitted = future
+
+
+class ExtractionScheduler:
+    """依優先順序與伺服器加權輪替放行解析工作
+
+    weight(guild_id) 回傳伺服器在每一輪可連續取得的名額（至少 1）。
+    每個伺服器最多 max_queue_per_guild 個工作等待，超過時只拒絕該伺服器的工作：
+    先擠掉優先順序較低的工作，沒有可擠掉的工作時才拒絕新的工作。
+    """
+
+    def __init__(
+        self,
+        concurrency: int,
+        *,
+        max_queue_per_guild: int = 32,
+        weight: Optional[Callable[[int], int]] = None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.max_queue_per_guild = max(1, max_queue_per_guild)
+        self.weight = weight or (lambda guild_id: 1)
+        self.running = 0
+        # 每個優先順序一組 {guild_id: 等待中的工作}，依輪替順序排列
+        self._queues: List["OrderedDict[int, Deque[_Job]]"] = [
+            OrderedDict() for _ in PRIORITY_NAMES
+        ]
+        # 目前輪到的伺服器在這一輪已取得的名額
+        self._served: List[Dict[int, int]] = [{} for _ in PRIORITY_NAMES]
+        self._pending: Dict[int, int] = {}  # 每個伺服器等待中的工作數
+
+        # 統計資料
+        self.rejected = 0
+        self.promoted = 0
+        self.wait_stats = [RollingStats() for _ in PRIORITY_NAMES]
+        self.guild_wait: Dict[int, RollingStats] = {}
+
+    @property
+    def queued(self) -> int:
+        return sum(self._pending.values())
+
+    async def run(
+        self,
+        guild_id: int,
+        key: Optional[str],
+        priority: int,
+        factory: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """等待輪到這個工作後執行 factory()；key 用於 promote()"""
+        if self._pending.get(guild_id, 0) >= self.max_queue_per_guild:
+            # 佇列已滿：擠掉優先順序較低的工作，否則拒絕這個工作
+            self.rejected += 1
+            if not self._evict(guild_id, priority):
+                raise ExtractorQueueFull(
+                    f"伺服器 {guild_id} 的解析佇列已滿 ({self._pending[guild_id]} 個等待中)"
+                )
+
+        job = _Job(guild_id, key, priority, asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(guild_id, deque()).append(job)
+        self._pending[guild_id] = self._pending.get(guild_id, 0) + 1
+        self._dispatch()
+
+        try:
+            await job.admitted
+        except asyncio.CancelledError:
+            if job.admitted.done() and not job.admitted.cancelled():
+                # 已取得名額才被取消：歸還名額
+                self._release()
+            else:
+                self._discard(job)
+            raise
+
+        try:
+            return await factory()
+        finally:
+            self._release()
+
+    def promote(self, guild_id: int, key: str) -> bool:
+        """等待中的預先解析變成下一首要播放的歌曲：移到最高優先順序"""
+        for priority in (SPECULATIVE, PREFETCH):
+            jobs = self._queues[priority].get(guild_id)
+            if not jobs:
+                continue
+            for job in jobs:
+                if job.key == key and not job.admitted.done():
+                    jobs.remove(job)
+                    if not jobs:
+                        self._remove_guild(priority, guild_id)
+                    job.priority = NOW
+                    self._queues[NOW].setdefault(guild_id, deque()).append(job)
+                    self.promoted += 1
+                    self._dispatch()
+                    return True
+        return False
+
+    def _evict(self, guild_id: int, priority: int) -> bool:
+        """拒絕伺服器中優先順序低於 priority、等待最久的工作"""
+        for lower in range(len(self._queues) - 1, priority, -1):
+            jobs = self._queues[lower].get(guild_id)
+            while jobs:
+                job = jobs.popleft()
+                if not jobs:
+                    self._remove_guild(lower, guild_id)
+                self._decrement(guild_id)
+                if not job.admitted.done():
+                    job.admitted.set_exception(
+                        ExtractorQueueFull(f"伺服器 {guild_id} 的解析佇列已滿，被優先的工作取代")
+                    )
+                    return True
+        return False
+
+    def _discard(self, job: _Job):
+        """移除尚未放行就被取消的工作"""
+        jobs = self._queues[job.priority].get(job.guild_id)
+        if jobs and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                self._remove_guild(job.priority, job.guild_id)
+            self._decrement(job.guild_id)
+
+    def _decrement(self, guild_id: int):
+        remaining = self._pending.get(guild_id, 0) - 1
+        if remaining > 0:
+            self._pending[guild_id] = remaining
+        else:
+            self._pending.pop(guild_id, None)
+
+    def _remove_guild(self, priority: int, guild_id: int):
+        self._queues[priority].pop(guild_id, None)
+        self._served[priority].pop(guild_id, None)
+
+    def _release(self):
+        self.running -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.running < self.concurrency:
+            job = self._next_job()
+            if job is None:
+                return
+            self._decrement(job.guild_id)
+            if job.admitted.done():
+                continue  # 等待者已被取消，尚未從佇列移除
+            self.running += 1
+            wait = time.perf_counter() - job.enqueued_at
+            self.wait_stats[job.priority].add(wait)
+            self.guild_wait.setdefault(job.guild_id, RollingStats(200)).add(wait)
+            job.admitted.set_result(None)
+
+    def _next_job(self) -> Optional[_Job]:
+        """從最高的非空優先順序中，以加權輪替取出下一個工作"""
+        for priority, queues in enumerate(self._queues):
+            while queues:
+                guild_id, jobs = next(iter(queues.items()))
+                job = jobs.popleft()
+                served = self._served[priority].get(guild_id, 0) + 1
+                if not jobs:
+                    self._remove_guild(priority, guild_id)
+                elif served >= max(1, self.weight(guild_id)):
+                    # 這一輪的名額用完，換下一個伺服器
+                    queues.move_to_end(guild_id)
+                    self._served[priority].pop(guild_id, None)
+                else:
+                    self._served[priority][guild_id] = served
+                return job
+        return None
+
+    def stats(self, guild_id: Optional[int] = None, worst: int = 3) -> Dict[str, Any]:
+        """各優先順序的等待時間、指定伺服器的等待時間與等待最久的伺服器"""
+        ranked = sorted(
+            (
+                (gid, stats.summary())
+                for gid, stats in self.guild_wait.items()
+                if len(stats)
+            ),
+            key=lambda item: item[1]["p95"],
+            reverse=True,
+        )
+        guild = self.guild_wait.get(guild_id) if guild_id is not None else None
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "promoted": self.promoted,
+            "wait": {
+                PRIORITY_NAMES[p]: stats.summary() for p, stats in enumerate(self.wait_stats)
+            },
+            "guild": guild.summary() if guild and len(guild) else None,
+            "worst": ranked[:worst],
+        }
+
+
+class UserRateLimiter:
+    """每位使用者的權杖桶：每分鐘補充 rate 個，最多累積 burst 個"""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._buckets: Dict[int, List[float]] = {}  # user_id -> [權杖數, 上次更新時間]
+
+    def acquire(self, user_id: int) -> float:
+        """取得一個權杖；成功回傳 0，否則回傳需要等待的秒數"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[user_id] = [tokens - 1, now]
+            self._prune(now)
+            return 0.0
+        self._buckets[user_id] = [tokens, now]
+        return (1 - tokens) / self.rate
+
+    def _prune(self, now: float):
+        """移除已補滿的權杖桶，避免字典隨使用者數量無限增長"""
+        if len(self._buckets) < 1024:
+            return
+        full = self.burst / self.rate
+        for user_id, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full:
+                del self._buckets[user_id]
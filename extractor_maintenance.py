@@ -0,0 +1,204 @@
+"""
+yt-dlp 維護服務 - 在背景檢查並安裝 yt-dlp 更新
+
+- 定期檢查，或在解析失敗率升高時提前檢查
+- 以 PyPI JSON API 查詢最新版本，pip 以非同步子行程執行，不阻塞事件迴圈
+- 安裝完成後重建解析池的工作者；process 模式下新的工作行程會載入新版本
+- thread 模式的工作者與機器人共用已載入的 yt-dlp，yt-dlp 又是延遲匯入擷取器模組，
+  在執行中覆蓋安裝會混用新舊模組，因此只回報可用的新版本，不自動安裝
+"""
+
+import asyncio
+import importlib.metadata
+import logging
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+import aiohttp
+import yt_dlp
+
+from extractor_pool import ExtractorPool
+
+logger = logging.getLogger(__name__)
+
+PYPI_URL = "https://pypi.org/pypi/yt-dlp/json"
+
+
+def _version_key(version: str):
+    """yt-dlp 使用日期版本號（例如 2025.09.23 或 2025.09.23.1）"""
+    parts = []
+    for part in version.split("."):
+        try:
+            parts.append(int(part))
+        except ValueError:
+            parts.append(0)
+    return tuple(parts)
+
+
+def installed_version() -> Optional[str]:
+    """磁碟上已安裝的 yt-dlp 版本（可能比已載入的版本新）"""
+    try:
+        return importlib.metadata.version("yt-dlp")
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+class ExtractorMaintenance:
+    """yt-dlp 自動更新服務
+
+    record_result() 由解析流程呼叫；最近 window 次解析中失敗比例超過
+    failure_rate 時會在背景觸發一次檢查。兩次檢查之間至少間隔 cooldown 秒。
+    """
+
+    def __init__(
+        self,
+        pool: ExtractorPool,
+        *,
+        failure_rate: float = 0.5,
+        window: int = 20,
+        min_samples: int = 8,
+        cooldown: float = 1800.0,
+        install_timeout: float = 300.0,
+        pypi_url: str = PYPI_URL,
+    ):
+        self.pool = pool
+        self.failure_rate = failure_rate
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.install_timeout = install_timeout
+        self.pypi_url = pypi_url
+        self._results = deque(maxlen=window)
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.last_check: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.loaded_version = yt_dlp.version.__version__
+        self.available_version: Optional[str] = None  # 尚未安裝的新版本
+        self.updates_installed = 0
+
+    def record_result(self, success: bool):
+        """記錄一次解析結果（內容本身無法播放的情況不應計入）"""
+        self._results.append(success)
+        if success or len(self._results) < self.min_samples:
+            return
+        failures = self._results.count(False)
+        if failures / len(self._results) >= self.failure_rate:
+            self.request_check("failure_rate")
+
+    def request_check(self, reason: str):
+        """在背景排入一次檢查；已有檢查進行中或仍在冷卻時間內則忽略"""
+        if self._task and not self._task.done():
+            return
+        if self.last_check and time.monotonic() - self.last_check < self.cooldown:
+            return
+        self._task = asyncio.create_task(self.check_and_update(reason))
+
+    async def fetch_latest_version(self) -> str:
+        timeout = aiohttp.ClientTimeout(total=15)
+        connector = aiohttp.TCPConnector(ssl=False)  # 與機器人其他部分一致
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            async with session.get(self.pypi_url) as resp:
+                resp.raise_for_status()
+                data = await resp.json()
+        return data["info"]["version"]
+
+    async def _pip_install(self, version: str):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "pip",
+            "install",
+            "--quiet",
+            "--disable-pip-version-check",
+            f"yt-dlp=={version}",
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(), timeout=self.install_timeout
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(stderr.decode(errors="ignore")[-300:])
+
+    async def check_and_update(self, reason: str = "scheduled") -> bool:
+        """檢查並安裝新版本，回傳是否已切換到新版本"""
+        async with self._lock:
+            self.last_check = time.monotonic()
+            try:
+                latest = await self.fetch_latest_version()
+                current = await asyncio.to_thread(installed_version)
+                logger.info(
+                    f"yt-dlp 版本檢查 ({reason}): 已安裝 {current}, "
+                    f"已載入 {self.loaded_version}, 最新 {latest}"
+                )
+
+                if current is None or _version_key(latest) > _version_key(current):
+                    if not self.can_upgrade:
+                        # 執行中覆蓋安裝會讓延遲匯入的擷取器模組新舊混用
+                        self.available_version = latest
+                        logger.warning(
+                            f"yt-dlp {latest} 已發布（目前 {self.loaded_version}）；"
+                            "thread 模式不會自動安裝，請更新後重新啟動機器人，"
+                            "或設定 EXTRACTOR_MODE=process 在背景自動更新"
+                        )
+                        self.last_error = None
+                        return False
+                    logger.info(f"正在背景安裝 yt-dlp {latest}")
+                    await self._pip_install(latest)
+                    current = await asyncio.to_thread(installed_version)
+                    self.updates_installed += 1
+                self.available_version = None
+
+                self.last_error = None
+                # 套件中繼資料與模組的版本格式不同（2025.9.23 / 2025.09.23），比較數值
+                if current and _version_key(current) != _version_key(self.loaded_version):
+                    return self._activate(current)
+                return False
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {str(e)}"
+                logger.error(f"yt-dlp 更新失敗: {self.last_error}")
+                return False
+
+    @property
+    def can_upgrade(self) -> bool:
+        """只有 process 模式能以新的工作行程載入新版本"""
+        return self.pool.mode == "process"
+
+    def _activate(self, version: str) -> bool:
+        """重建解析池的工作者，讓之後的解析使用新版本"""
+        if not self.can_upgrade:
+            # 執行緒模式的工作者與機器人共用已載入的模組，需重新啟動才會生效
+            logger.warning(
+                f"yt-dlp {version} 已安裝，但 thread 模式需重新啟動機器人才會載入；"
+                "設定 EXTRACTOR_MODE=process 可在不重啟的情況下切換"
+            )
+            return False
+
+        self.pool.recycle()
+        self.loaded_version = version
+        self._results.clear()
+        logger.info(f"解析池已切換到 yt-dlp {version}")
+        return True
+
+    def cancel(self):
+        if self._task:
+            self._task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded_version": self.loaded_version,
+            "available_version": self.available_version,
+            "updates_installed": self.updates_installed,
+            "recent_failures": self._results.count(False),
+            "recent_samples": len(self._results),
+            "last_error": self.last_error,
+        }
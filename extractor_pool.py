@@ -0,0 +1,204 @@
+"""
+yt-dlp 解析工作池 - 專用且可重複使用 YoutubeDL 實例的解析執行器
+
+支援兩種模式：
+- thread：執行緒池，每個執行緒保留一個 YoutubeDL 實例
+- process：行程池，解析在獨立行程中執行，不與機器人爭奪 GIL
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import ssl
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import yt_dlp
+
+from music_metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+# 從 extract_info 結果中保留的欄位（行程模式需要可序列化且精簡的結果）
+INFO_FIELDS = (
+    "id",
+    "title",
+    "url",
+    "ext",
+    "acodec",
+    "vcodec",
+    "abr",
+    "asr",
+    "duration",
+    "webpage_url",
+)
+
+# 每個工作執行緒／行程的 YoutubeDL 實例
+_worker_state = threading.local()
+
+
+def _init_worker(ydl_opts: Dict[str, Any]):
+    """工作者初始化：設定 SSL 並建立長期存在的 YoutubeDL 實例"""
+    os.environ["PYTHONHTTPSVERIFY"] = "0"
+    ssl._create_default_https_context = ssl._create_unverified_context
+    _worker_state.ydl = yt_dlp.YoutubeDL(ydl_opts)
+
+
+def _extract(url: str) -> Optional[Dict[str, Any]]:
+    """在工作者中執行 extract_info，只回傳需要的欄位"""
+    ydl = getattr(_worker_state, "ydl", None)
+    if ydl is None:
+        raise RuntimeError("解析工作者尚未初始化")
+
+    try:
+        info = ydl.extract_info(url, download=False)
+    except yt_dlp.DownloadError as e:
+        # 重新建立只帶訊息的例外，確保可以跨行程傳遞
+        raise yt_dlp.DownloadError(str(e)) from None
+    except Exception as e:
+        # yt-dlp 內部例外不一定可序列化，統一轉為 RuntimeError
+        raise RuntimeError(f"{type(e).__name__}: {str(e)}") from None
+
+    if not info:
+        return None
+    return {key: info.get(key) for key in INFO_FIELDS}
+
+
+class ExtractorQueueFull(Exception):
+    """解析佇列已滿"""
+
+
+class ExtractorPool:
+    """有界佇列的 yt-dlp 解析池
+
+    最多 workers 個工作同時執行，另外最多 max_queue 個工作排隊等待；
+    超過時 extract() 會拋出 ExtractorQueueFull。
+    """
+
+    def __init__(
+        self,
+        ydl_opts: Dict[str, Any],
+        *,
+        mode: str = "thread",
+        workers: int = 2,
+        max_queue: int = 32,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"不支援的解析模式: {mode}")
+
+        self.ydl_opts = ydl_opts
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._executor = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # 統計資料
+        self.queued = 0  # 等待工作者的工作數
+        self.in_flight = 0  # 正在執行的工作數
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.generation = 0  # recycle() 的次數
+        self.wait_stats = RollingStats()  # 排隊等待時間（秒）
+        self.run_stats = RollingStats()  # 實際解析時間（秒）
+
+    def _get_executor(self):
+        """取得（必要時建立）執行器"""
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.ydl_opts,),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="yt-dlp",
+                    initializer=_init_worker,
+                    initargs=(self.ydl_opts,),
+                )
+            logger.info(f"已啟動 yt-dlp 解析池 (模式: {self.mode}, 工作者: {self.workers})")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queued
+
+    async def extract(self, url: str) -> Optional[Dict[str, Any]]:
+        """在解析池中執行 extract_info"""
+        if self.queued + self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise ExtractorQueueFull(
+                f"解析佇列已滿 (排隊 {self.queued}, 執行中 {self.in_flight})"
+            )
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        enqueued_at = time.perf_counter()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._get_executor(), _extract, url)
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+            finished_at = time.perf_counter()
+            wait = started_at - enqueued_at
+            run = finished_at - started_at
+            self.wait_stats.add(wait)
+            self.run_stats.add(run)
+            logger.info(
+                f"yt-dlp 解析完成: 排隊 {wait * 1000:.0f} ms, 解析 {run * 1000:.0f} ms "
+                f"(佇列深度 {self.queued}, 執行中 {self.in_flight})"
+            )
+
+    def recycle(self):
+        """以新的工作者取代現有工作者（例如 yt-dlp 更新後）
+
+        之後的工作交給新的執行器；舊執行器上執行中的工作會正常完成，
+        不會中斷正在解析的請求。process 模式下新的工作行程會重新載入 yt-dlp。
+        """
+        old, self._executor = self._executor, None
+        self.generation += 1
+        if old is not None:
+            old.shutdown(wait=False)
+        logger.info(f"已重建 yt-dlp 解析池 (第 {self.generation} 代)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "generation": self.generation,
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait": self.wait_stats.summary(),
+            "run": self.run_stats.summary(),
+        }
+
+    def shutdown(self):
+        """關閉執行器，取消尚未開始的工作"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,56 @@
+"""
+伺服器設定 - 每個伺服器一個值的 JSON 設定檔
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class GuildSettings:
+    """每個伺服器一個設定值，未設定時使用預設值"""
+
+    def __init__(self, path: str, default: Any):
+        self.path = path
+        self.default = default
+        self._lock = asyncio.Lock()
+        self._values: Dict[str, Any] = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.error(f"設定檔案格式錯誤：{self.path}")
+            return {}
+
+    def get(self, guild_id: int) -> Any:
+        return self._values.get(str(guild_id), self.default)
+
+    def _write(self, guild_id: int, value: Optional[Any]) -> Dict[str, Any]:
+        """以磁碟上最新的設定為基礎只更新這個伺服器（叢集模式下檔案由多個行程共用）"""
+        data = self._load()
+        if value is None:
+            data.pop(str(guild_id), None)
+        else:
+            data[str(guild_id)] = value
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        return data
+
+    async def set(self, guild_id: int, value: Optional[Any]):
+        """設定這個伺服器的值；value 為 None 時恢復預設值"""
+        async with self._lock:
+            if value is None:
+                self._values.pop(str(guild_id), None)
+            else:
+                self._values[str(guild_id)] = value
+            self._values = await asyncio.to_thread(self._write, guild_id, value)
@@ -0,0 +1,232 @@
+"""
+事件迴圈看門狗 - 持續量測事件迴圈延遲，並找出阻塞事件迴圈的程式碼
+
+事件迴圈中的任務每 interval 秒更新一次心跳；獨立執行緒發現心跳超過 threshold 秒
+沒有更新時，立即擷取事件迴圈執行緒當下的堆疊，記錄正在執行的任務、協程、
+所屬的 cog 與指令。阻塞結束後依阻塞位置（專案中最內層的呼叫）彙整次數與時間。
+"""
+
+import asyncio
+import inspect
+import linecache
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from music_metrics import RollingStats
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+STACK_LIMIT = 20  # 記錄的堆疊層數（由內而外）
+
+
+def _is_project_file(filename: str) -> bool:
+    """專案中的原始碼（排除放在專案目錄下的虛擬環境）"""
+    return filename.startswith(PROJECT_DIR) and "site-packages" not in filename
+
+
+class LoopWatchdog:
+    """事件迴圈延遲量測與阻塞位置擷取
+
+    cog_for_module(module_name) 回傳該模組所屬 cog 的名稱（找不到時回傳 None），
+    用於從堆疊判斷阻塞的程式碼屬於哪個 cog。
+    指令名稱由 label_task() 在指令開始前標記在執行指令的任務上。
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.05,
+        threshold: float = 0.1,
+        max_offenders: int = 50,
+        cog_for_module: Optional[Callable[[str], Optional[str]]] = None,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_offenders = max_offenders
+        self.cog_for_module = cog_for_module or (lambda module: None)
+
+        self.lag_stats = RollingStats(2000)
+        self.stalls = 0  # 超過門檻的次數
+        self.offenders: Dict[str, Dict[str, Any]] = {}  # 阻塞位置 -> 彙整資料
+        self._labels: "weakref.WeakKeyDictionary[asyncio.Task, Dict[str, str]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_tick: Optional[float] = None
+        self._pending: Optional[Dict[str, Any]] = None  # 已擷取、尚未結束的阻塞
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._tick_task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ── 啟動與停止 ──
+
+    def start(self):
+        """在事件迴圈中呼叫：啟動心跳任務與監看執行緒"""
+        if self._tick_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._tick_task = self._loop.create_task(self._tick(), name="loop-watchdog-tick")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._tick_task is not None:
+            self._tick_task.cancel()
+            self._tick_task = None
+        self._last_tick = None
+
+    def label_task(self, task: Optional[asyncio.Task], *, cog: Optional[str], command: str):
+        """標記任務正在執行的 cog 與指令"""
+        if task is not None:
+            self._labels[task] = {"cog": cog, "command": command}
+
+    # ── 量測 ──
+
+    async def _tick(self):
+        while True:
+            started = time.perf_counter()
+            self._last_tick = started
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.lag_stats.add(lag)
+            with self._lock:
+                stall, self._pending = self._pending, None
+            if stall is not None:
+                self._finish(stall, lag)
+
+    def _watch(self):
+        """監看執行緒：心跳停止超過門檻時擷取一次堆疊"""
+        captured_tick = None
+        while not self._stopped.wait(self.interval / 2):
+            tick = self._last_tick
+            if tick is None or tick == captured_tick:
+                continue
+            blocked = time.perf_counter() - tick - self.interval
+            if blocked < self.threshold:
+                continue
+            captured_tick = tick
+            try:
+                stall = self._capture(blocked)
+            except Exception as e:
+                logger.error(f"擷取事件迴圈堆疊時發生錯誤: {str(e)}")
+                continue
+            with self._lock:
+                self._pending = stall
+
+    def _capture(self, blocked: float) -> Optional[Dict[str, Any]]:
+        """在監看執行緒中擷取事件迴圈執行緒的堆疊與目前的任務"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+
+        frames = []  # 由內而外
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+
+        # 阻塞位置：專案中最內層的呼叫；整個堆疊都在函式庫中時使用最內層
+        blocking = next(
+            (f for f in frames if _is_project_file(f.f_code.co_filename)),
+            frames[0],
+        )
+        coroutine = next(
+            (f.f_code for f in frames if f.f_code.co_flags & inspect.CO_COROUTINE),
+            None,
+        )
+        cog = None
+        for f in frames:
+            cog = self.cog_for_module(f.f_globals.get("__name__", ""))
+            if cog:
+                break
+
+        task = asyncio.current_task(self._loop)
+        label = self._labels.get(task, {}) if task is not None else {}
+        limit = max(STACK_LIMIT, frames.index(blocking) + 3)
+        stack = traceback.StackSummary.extract(
+            ((f, f.f_lineno) for f in reversed(frames[:limit])), lookup_lines=True
+        )
+        return {
+            "location": (
+                f"{os.path.relpath(blocking.f_code.co_filename, PROJECT_DIR)}:"
+                f"{blocking.f_lineno} {blocking.f_code.co_qualname}"
+            ),
+            "blocked": blocked,
+            "code": linecache.getline(blocking.f_code.co_filename, blocking.f_lineno).strip(),
+            "stack": "".join(stack.format()),
+            "task": task.get_name() if task is not None else None,
+            "coroutine": coroutine.co_qualname if coroutine else None,
+            "cog": label.get("cog") or cog,
+            "command": label.get("command"),
+        }
+
+    def _finish(self, stall: Dict[str, Any], lag: float):
+        """阻塞結束：彙整到阻塞位置並寫入日誌"""
+        duration = max(lag, stall["blocked"])
+        self.stalls += 1
+        offender = self.offenders.get(stall["location"])
+        first = offender is None
+        if first:
+            if len(self.offenders) >= self.max_offenders:
+                # 移除累計時間最少的位置
+                least = min(self.offenders, key=lambda key: self.offenders[key]["total"])
+                del self.offenders[least]
+            offender = self.offenders[stall["location"]] = {
+                "location": stall["location"],
+                "count": 0,
+                "total": 0.0,
+                "max": 0.0,
+            }
+        offender["count"] += 1
+        offender["total"] += duration
+        offender["max"] = max(offender["max"], duration)
+        offender["last_seen"] = time.time()
+        for key in ("code", "stack", "task", "coroutine", "cog", "command"):
+            offender[key] = stall[key]
+
+        message = (
+            f"事件迴圈阻塞 {duration * 1000:.0f} ms：{stall['location']}"
+            f"（cog: {stall['cog'] or '-'}，指令: {stall['command'] or '-'}，"
+            f"協程: {stall['coroutine'] or '-'}，任務: {stall['task'] or '-'}）"
+        )
+        if first:
+            # 第一次出現的位置附上完整堆疊
+            message += f"\n{stall['stack']}"
+        logger.warning(message)
+
+    # ── 報告 ──
+
+    def worst(self, count: int = 5) -> List[Dict[str, Any]]:
+        """依累計阻塞時間排序的阻塞位置"""
+        return sorted(self.offenders.values(), key=lambda o: o["total"], reverse=True)[:count]
+
+    def log_summary(self, count: int = 5):
+        """將累計阻塞時間最長的位置寫入日誌"""
+        offenders = self.worst(count)
+        if not offenders:
+            return
+        lag = self.lag_stats.summary()
+        lines = [
+            f"事件迴圈延遲 p50/p99/max {lag['p50'] * 1000:.1f}/{lag['p99'] * 1000:.1f}/"
+            f"{lag['max'] * 1000:.0f} ms，超過 {self.threshold * 1000:.0f} ms 共 {self.stalls} 次；"
+            f"阻塞最久的位置："
+        ]
+        for index, offender in enumerate(offenders, 1):
+            lines.append(
+                f"  {index}. {offender['location']} - {offender['count']} 次，"
+                f"累計 {offender['total'] * 1000:.0f} ms，最長 {offender['max'] * 1000:.0f} ms"
+                f"（cog: {offender['cog'] or '-'}，指令: {offender['command'] or '-'}）"
+            )
+        logger.warning("\n".join(lines))
@@ -2,6 +2,7 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
+import importlib
 from dotenv import load_dotenv
 import os
 import logging
@@ -93,7 +94,50 @@ async def check_ffmpeg():
         return False
 
 
-class PartyBot(commands.Bot):
+# 需要載入的 Cogs (優先選擇 utils_cog，移除 utility_cog 避免重複)
+COGS = [
+    "watchdog_cog",  # 最先載入，其他擴展初始化時的阻塞也會被記錄
+    "music_cog",
+    "emoji_cog",
+    "utils_cog",  # 優先使用此 cog，功能更完整
+]
+
+
+def build_gateway_profile(profile: str = "lean", cogs=COGS):
+    """依設定檔建立 Gateway 意圖與成員快取設定
+
+    - full：所有意圖、完整成員快取，啟動時分塊載入每個伺服器的成員
+    - lean：只開啟各擴展在 REQUIRED_INTENTS 中宣告的意圖，
+      成員只快取語音頻道中的成員，啟動時不分塊載入
+
+    回傳 (intents, member_cache_flags, chunk_guilds_at_startup)
+    """
+    if profile == "full":
+        intents = discord.Intents.all()
+        return intents, discord.MemberCacheFlags.from_intents(intents), True
+
+    intents = discord.Intents.none()
+    intents.guilds = True  # discord.py 的頻道與伺服器快取依賴此意圖
+    for cog in cogs:
+        try:
+            required = importlib.import_module(cog).REQUIRED_INTENTS
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"⚠️ 無法取得 {cog} 需要的意圖，改用完整設定: {e}")
+            return build_gateway_profile("full")
+        for name in required:
+            setattr(intents, name, True)
+
+    member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+    enabled = [name for name, value in intents if value]
+    logger.info(f"Gateway 意圖 ({profile}): {', '.join(enabled)}")
+    return intents, member_cache_flags, False
+
+
+class PartyBotMixin:
+    """PartyBot 與 ShardedPartyBot 共用的事件處理"""
+
+    sync_commands = True  # 叢集模式下只有一個叢集需要同步全域指令
+
     async def setup_hook(self):
         """在機器人啟動前的初始化設置"""
         try:
@@ -101,19 +145,12 @@ class PartyBot(commands.Bot):
             if not await check_ffmpeg():
                 logger.error("FFMPEG 未正確安裝，音樂功能可能無法使用")
 
-            # 定義需要載入的 Cogs (優先選擇 utils_cog，移除 utility_cog 避免重複)
-            cog_list = [
-                "music_cog",
-                "emoji_cog",
-                "utils_cog",  # 優先使用此 cog，功能更完整
-            ]
-
             # 追蹤已載入命令和失敗的 cog
             loaded_commands = set()
             failed_cogs = []
 
             # 載入所有 cog
-            for cog in cog_list:
+            for cog in COGS:
                 try:
                     await self.load_extension(cog)
                     logger.info(f"✅ 已載入擴展: {cog}")
@@ -128,9 +165,10 @@ class PartyBot(commands.Bot):
                     failed_cogs.append(cog)
 
             # 同步指令到 Discord
-            logger.info("正在同步指令到 Discord...")
-            synced_commands = await self.tree.sync()
-            logger.info(f"✅ 成功同步 {len(synced_commands)} 個指令！")
+            if self.sync_commands:
+                logger.info("正在同步指令到 Discord...")
+                synced_commands = await self.tree.sync()
+                logger.info(f"✅ 成功同步 {len(synced_commands)} 個指令！")
 
             # 整理並檢查指令
             unique_commands = {}
@@ -203,25 +241,63 @@ class PartyBot(commands.Bot):
                 break
 
 
-async def main():
-    """主程式入口"""
-    # 載入 Token
-    token = load_token()
-    if not token:
-        logger.critical("❌ 無法載入 Discord Token，機器人無法啟動")
-        return
+class PartyBot(PartyBotMixin, commands.Bot):
+    """單一連線的機器人"""
+
+
+class ShardedPartyBot(PartyBotMixin, commands.AutoShardedBot):
+    """自動分片的機器人；在叢集模式下 IDENTIFY 由啟動器協調"""
+
+    def __init__(self, *args, cluster=None, sync_commands: bool = True, **kwargs):
+        self.cluster = cluster
+        self.sync_commands = sync_commands
+        if cluster is not None:
+            # 分片可能需要排隊等待其他叢集 IDENTIFY，不設連線逾時
+            kwargs.setdefault("shard_connect_timeout", None)
+        super().__init__(*args, **kwargs)
+
+    async def before_identify_hook(self, shard_id, *, initial=False):
+        if self.cluster is None:
+            await super().before_identify_hook(shard_id, initial=initial)
+            return
+        await self.cluster.acquire_identify(shard_id)
+
 
-    # 初始化機器人，設定完整意圖以取得所有必要的事件
-    intents = discord.Intents.all()
-    bot = PartyBot(
+def create_bot(sharded: bool = False, **kwargs):
+    """建立機器人實例；sharded=True 時使用 AutoShardedBot"""
+    from config import GATEWAY_PROFILE
+
+    intents, member_cache_flags, chunk_guilds = build_gateway_profile(GATEWAY_PROFILE)
+    bot_class = ShardedPartyBot if sharded else PartyBot
+    return bot_class(
         command_prefix="!",  # 保留前綴指令，但主要使用斜線指令
         intents=intents,
+        member_cache_flags=member_cache_flags,
+        chunk_guilds_at_startup=chunk_guilds,
         help_command=None,  # 移除默認幫助指令，改用自訂斜線指令
         activity=discord.Activity(
             type=discord.ActivityType.listening, name="載入中..."
         ),
+        **kwargs,
     )
 
+
+async def main():
+    """主程式入口"""
+    # 載入 Token
+    token = load_token()
+    if not token:
+        logger.critical("❌ 無法載入 Discord Token，機器人無法啟動")
+        return
+
+    from config import SHARD_MODE, SHARD_COUNT
+
+    # 初始化機器人（SHARD_MODE=auto 時在單一行程中自動分片）
+    if SHARD_MODE == "auto":
+        bot = create_bot(sharded=True, shard_count=SHARD_COUNT or None)
+    else:
+        bot = create_bot()
+
     # 設定重試參數
     max_retries = 3
     retry_delay = 60  # 秒
@@ -266,11 +342,40 @@ async def main():
                 logger.info("👋 機器人已關閉連接")
 
 
+def run_cluster_launcher():
+    """叢集模式：由啟動器將分片分配到多個行程"""
+    from cluster import ClusterLauncher
+    from config import (
+        SHARD_COUNT,
+        CLUSTER_COUNT,
+        CLUSTER_HEALTH_INTERVAL,
+        CLUSTER_HEALTH_PATH,
+    )
+
+    token = load_token()
+    if not token:
+        logger.critical("❌ 無法載入 Discord Token，機器人無法啟動")
+        return
+
+    ClusterLauncher(
+        token,
+        cluster_count=CLUSTER_COUNT,
+        shard_count=SHARD_COUNT,
+        health_interval=CLUSTER_HEALTH_INTERVAL,
+        health_path=CLUSTER_HEALTH_PATH,
+    ).run()
+
+
 def run_bot():
     """執行機器人"""
     try:
         logger.info("🏁 開始初始化機器人...")
-        asyncio.run(main())
+        from config import SHARD_MODE
+
+        if SHARD_MODE == "cluster":
+            run_cluster_launcher()
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("⚡ 收到中斷信號，正在關閉機器人...")
     except Exception as e:
@@ -294,8 +399,16 @@ async def help_command(interaction: discord.Interaction):
         value=(
             "`/play <歌曲>` - 播放音樂\n"
             "`/skip` - 跳過當前歌曲\n"
+            "`/seek <時間>` - 跳到目前歌曲的指定時間\n"
             "`/loop` - 切換循環播放\n"
-            "`/stop` - 停止播放並清空佇列"
+            "`/instantplay [開啟]` - 直接播放第一個搜尋結果\n"
+            "`/stop` - 停止播放並清空佇列\n"
+            "`/remove <位置>` - 從佇列移除歌曲\n"
+            "`/move <原位置> <新位置>` - 移動佇列中的歌曲\n"
+            "`/shuffle` - 隨機打亂佇列\n"
+            "`/playlist save|load|list|delete <名稱>` - 管理已儲存的歌單\n"
+            "`/idletimeout [分鐘]` - 設定閒置多久後離開語音頻道 (需管理權限)\n"
+            "`/musicstats` - 查看音樂系統延遲統計 (需管理權限)"
         ),
         inline=False,
     )
@@ -0,0 +1,383 @@
+"""
+音樂快取 - 以影片 ID 為鍵的串流網址快取、YouTube 搜尋結果快取、無法播放影片的負面快取
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+
+def parse_stream_expiry(stream_url: str) -> Optional[float]:
+    """從 googlevideo 串流網址中解析 expire= 參數（Unix 時間戳）"""
+    try:
+        parsed = urlparse(stream_url)
+        values = parse_qs(parsed.query).get("expire")
+        if values:
+            return float(values[0])
+
+        # 部分網址將參數放在路徑中：/expire/1700000000/...
+        parts = parsed.path.split("/")
+        if "expire" in parts:
+            return float(parts[parts.index("expire") + 1])
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+class StreamURLCache:
+    """已解析串流網址的 TTL + LRU 快取
+
+    每筆資料依串流網址內嵌的 expire= 參數決定過期時間，並提前
+    safety_margin 秒失效，避免 FFmpeg 拿到即將過期的網址。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 512,
+        default_ttl: float = 1800.0,
+        safety_margin: float = 300.0,
+    ):
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.safety_margin = safety_margin
+        self._entries: "OrderedDict[str, tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, video_id):
+        return self.get(video_id, count=False) is not None
+
+    def get(self, video_id: Optional[str], count: bool = True) -> Optional[Dict[str, Any]]:
+        """取得未過期的快取資料，並更新 LRU 順序"""
+        entry = self._entries.get(video_id) if video_id else None
+        if entry is not None:
+            expires_at, info = entry
+            if time.time() < expires_at:
+                self._entries.move_to_end(video_id)
+                if count:
+                    self.hits += 1
+                return dict(info)
+            del self._entries[video_id]
+
+        if count:
+            self.misses += 1
+        return None
+
+    def put(self, video_id: Optional[str], info: Dict[str, Any]):
+        """寫入快取，過期時間取自串流網址"""
+        if not video_id or not info or not info.get("url"):
+            return
+
+        now = time.time()
+        expiry = parse_stream_expiry(info["url"])
+        expires_at = (expiry if expiry else now + self.default_ttl) - self.safety_margin
+        if expires_at <= now:
+            return
+
+        self._entries[video_id] = (expires_at, dict(info))
+        self._entries.move_to_end(video_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, video_id: Optional[str]):
+        """移除指定影片的快取（例如串流網址已失效）"""
+        if video_id:
+            self._entries.pop(video_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """回傳命中率等統計資料"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# YouTube Data API search().list 每次呼叫消耗的配額單位
+SEARCH_QUOTA_COST = 100
+
+
+def normalize_query(query: str) -> str:
+    """正規化搜尋字串：全形轉半形、忽略大小寫、合併空白"""
+    normalized = unicodedata.normalize("NFKC", query or "")
+    normalized = normalized.casefold()
+    return re.sub(r"\s+", " ", normalized).strip()
+
+
+def _trim_search_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留需要的欄位，減少記憶體與磁碟用量"""
+    items = []
+    for item in response.get("items", []):
+        snippet = item.get("snippet", {})
+        items.append(
+            {
+                "id": item.get("id"),
+                "snippet": {
+                    "title": snippet.get("title"),
+                    "channelTitle": snippet.get("channelTitle"),
+                },
+            }
+        )
+    return {"items": items}
+
+
+class PersistentTTLCache:
+    """有過期時間的 LRU 快取的共用持久化邏輯
+
+    _entries 的每個值都是以過期時間（Unix 時間戳）開頭的 tuple，
+    以 {"entries": {鍵: [過期時間, ...]}} 的格式寫入 path。
+    子類別以 DESCRIPTION 設定日誌中的名稱。
+    """
+
+    DESCRIPTION = "快取"
+
+    def __init__(self, path: Optional[str], max_size: int):
+        self.path = path
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.dirty = False
+
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _trim(self):
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def load(self):
+        """從磁碟載入未過期的紀錄；檔案損毀時略過整個檔案，格式錯誤的紀錄逐筆略過"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entries = data.get("entries", {})
+        except FileNotFoundError:
+            return
+        except (json.JSONDecodeError, OSError, AttributeError) as e:
+            logger.error(f"載入{self.DESCRIPTION}時發生錯誤：{str(e)}")
+            return
+
+        now = time.time()
+        skipped = 0
+        for key, value in entries.items():
+            try:
+                if value[0] > now:
+                    self._entries[key] = tuple(value)
+            except (TypeError, IndexError, KeyError):
+                skipped += 1
+        self._trim()
+        if skipped:
+            logger.warning(f"{self.DESCRIPTION}中有 {skipped} 筆格式錯誤的紀錄已略過")
+        logger.info(f"已載入 {len(self._entries)} 筆{self.DESCRIPTION}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """取得可序列化的內容（在事件迴圈上呼叫，之後交給 save 寫入）"""
+        self.dirty = False
+        return {"entries": {k: list(v) for k, v in self._entries.items()}}
+
+    def save(self, snapshot: Dict[str, Any]):
+        """以原子方式寫入磁碟（可在執行緒中執行）"""
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class SearchCache(PersistentTTLCache):
+    """YouTube 搜尋結果的 TTL + LRU 快取，可選擇持久化到磁碟
+
+    以正規化後的查詢字串為鍵；每次命中代表省下一次 search().list 呼叫。
+    _entries：查詢 -> (過期時間, 搜尋結果)
+    """
+
+    DESCRIPTION = "搜尋快取"
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        ttl: float = 6 * 3600,
+        path: Optional[str] = None,
+    ):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        super().__init__(path, max_size)
+
+    @property
+    def quota_saved(self) -> int:
+        """因快取命中而省下的 API 配額單位"""
+        return self.hits * SEARCH_QUOTA_COST
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, response = entry
+            if time.time() < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+            del self._entries[key]
+            self.dirty = True
+
+        self.misses += 1
+        return None
+
+    def put(self, query: str, response: Dict[str, Any]):
+        key = normalize_query(query)
+        if not key or not response or not response.get("items"):
+            return
+
+        self._entries[key] = (time.time() + self.ttl, _trim_search_response(response))
+        self._entries.move_to_end(key)
+        self._trim()
+        self.dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "quota_saved": self.quota_saved,
+        }
+
+
+# 各種無法播放原因的快取時間（秒）：刪除與 DRM 幾乎不會恢復，
+# 地區限制與其他原因較可能只是暫時性的
+UNPLAYABLE_TTLS = {
+    "DRM_PROTECTED": 30 * 86400,
+    "VIDEO_DELETED": 30 * 86400,
+    "PRIVATE_VIDEO": 7 * 86400,
+    "REGION_BLOCKED": 86400,
+    "VIDEO_UNAVAILABLE": 6 * 3600,
+}
+
+
+class VideoUnplayableError(Exception):
+    """影片無法播放；訊息以失敗類別開頭，例如 "DRM_PROTECTED: ..." """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(f"{reason}: {message}")
+        self.reason = reason
+        self.detail = message
+
+
+# yt-dlp 錯誤訊息中代表影片本身無法播放的片段（不區分大小寫）；
+# 其他錯誤（例如 "Requested format is not available"）可能是暫時性的
+# 或在更新 yt-dlp 後就能解決，交給重試流程處理，不寫入負面快取
+UNPLAYABLE_PATTERNS = [
+    ("DRM_PROTECTED", "此影片受到 DRM 保護，無法播放", re.compile(r"DRM protected", re.I)),
+    (
+        "REGION_BLOCKED",
+        "此影片在您的地區不可用",
+        re.compile(
+            r"not available (?:in your country|from your location)"
+            r"|not made this video available in your country"
+            r"|geo[- ]?restrict"
+            r"|blocked it (?:in your country|on copyright grounds)",
+            re.I,
+        ),
+    ),
+    ("PRIVATE_VIDEO", "此影片為私人影片，無法播放", re.compile(r"private video", re.I)),
+    (
+        "VIDEO_DELETED",
+        "此影片已被刪除",
+        re.compile(
+            r"video has been removed"
+            r"|account associated with this video has been terminated"
+            r"|video (?:has been|was) deleted",
+            re.I,
+        ),
+    ),
+]
+
+
+def classify_unplayable(error_msg: str) -> Optional[VideoUnplayableError]:
+    """依 yt-dlp 的錯誤訊息判斷影片是否無法播放；無法確定時回傳 None"""
+    for reason, message, pattern in UNPLAYABLE_PATTERNS:
+        if pattern.search(error_msg):
+            return VideoUnplayableError(reason, message)
+    return None
+
+
+class UnplayableCache(PersistentTTLCache):
+    """無法播放影片的負面快取，以影片 ID 為鍵並依失敗類別設定過期時間
+
+    搜尋結果、替代影片與預先解析都先經過這裡過濾，避免對已知無法
+    播放的影片重複執行 extract_info。
+    _entries：影片 ID -> (過期時間, 失敗類別, 訊息)
+    """
+
+    DESCRIPTION = "無法播放影片紀錄"
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        max_size: int = 10000,
+    ):
+        self.ttls = dict(UNPLAYABLE_TTLS, **(ttls or {}))
+        self.hits = 0
+        super().__init__(path, max_size)
+
+    def __contains__(self, video_id):
+        return self.get(video_id, count=False) is not None
+
+    def get(self, video_id: Optional[str], count: bool = True) -> Optional[tuple]:
+        """回傳 (reason, message)，不在快取中或已過期時回傳 None"""
+        if not video_id:
+            return None
+        entry = self._entries.get(video_id)
+        if entry is None:
+            return None
+        expires_at, reason, message = entry
+        if time.time() >= expires_at:
+            del self._entries[video_id]
+            self.dirty = True
+            return None
+        if count:
+            self.hits += 1
+        return reason, message
+
+    def put(self, video_id: Optional[str], reason: str, message: str = ""):
+        if not video_id:
+            return
+        ttl = self.ttls.get(reason, self.ttls["VIDEO_UNAVAILABLE"])
+        self._entries[video_id] = (time.time() + ttl, reason, message)
+        self._entries.move_to_end(video_id)
+        self._trim()
+        self.dirty = True
+        logger.info(f"已標記無法播放的影片: {video_id} ({reason})")
+
+    def filter(self, videos, key: str = "id"):
+        """移除已知無法播放的影片，回傳剩下的清單"""
+        return [video for video in videos if video.get(key) not in self]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "hits": self.hits}
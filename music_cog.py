@@ -4,27 +4,135 @@ import asyncio
 import discord
 from discord.ext import commands, tasks
 import os
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, List
-from collections import defaultdict
-from googleapiclient.discovery import build
-import ssl
+import json
+import random
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Literal
+from collections import defaultdict, deque
+from itertools import islice
 import certifi
+from config import (
+    YOUTUBE_SEARCH_TIMEOUT,
+    YOUTUBE_SEARCH_POOL_SIZE,
+    STREAM_CACHE_SIZE,
+    STREAM_CACHE_DEFAULT_TTL,
+    PREFETCH_COUNT,
+    PLAYBACK_MAX_FAILURES,
+    PLAYBACK_RETRY_DELAY,
+    PLAYBACK_RETRY_MAX_DELAY,
+    SPECULATIVE_RESULTS,
+    EXTRACTOR_MODE,
+    EXTRACTOR_WORKERS,
+    EXTRACTOR_MAX_QUEUE,
+    EXTRACTION_GUILD_MAX_QUEUE,
+    EXTRACTION_MAX_WEIGHT,
+    PLAY_RATE_PER_MINUTE,
+    PLAY_RATE_BURST,
+    VOICE_IDLE_TIMEOUT,
+    VOICE_EMPTY_TIMEOUT,
+    VOICE_SETTINGS_PATH,
+    INSTANT_PLAY_SETTINGS_PATH,
+    YTDLP_AUTO_UPDATE,
+    YTDLP_UPDATE_INTERVAL_HOURS,
+    YTDLP_UPDATE_FAILURE_RATE,
+    SEARCH_CACHE_SIZE,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_PERSIST,
+    SEARCH_CACHE_PATH,
+    UNPLAYABLE_CACHE_PATH,
+    QUEUE_PERSIST,
+    QUEUE_DATA_DIR,
+    QUEUE_JOURNAL_FLUSH_INTERVAL,
+    QUEUE_COMPACT_THRESHOLD,
+    PLAYLIST_DATA_PATH,
+    PLAYLIST_DATA_DIR,
+    PLAYLIST_MAX_TRACKS,
+    PLAYLIST_IMPORT_MAX_TRACKS,
+    PLAYLIST_IMPORT_CHUNK_SIZE,
+    FFMPEG_PATH,
+    AUDIO_CACHE_ENABLED,
+    AUDIO_CACHE_DIR,
+    AUDIO_CACHE_MAX_BYTES,
+    AUDIO_CACHE_MIN_PLAYS,
+    AUDIO_NODE_ADDRESS,
+    AUDIO_NODE_REQUEST_TIMEOUT,
+)
+from youtube_search import YouTubeSearchClient, extract_video_id
+from music_cache import (
+    StreamURLCache,
+    SearchCache,
+    UnplayableCache,
+    VideoUnplayableError,
+    classify_unplayable,
+)
+from music_metrics import RollingStats, PlayTrace, StageMetrics
+from extractor_pool import ExtractorPool, ExtractorQueueFull
+from extraction_scheduler import (
+    ExtractionScheduler,
+    UserRateLimiter,
+    NOW,
+    PREFETCH,
+    SPECULATIVE,
+)
+from extractor_maintenance import ExtractorMaintenance
+from queue_store import QueueStore
+from playlist_store import PlaylistStore, owner_key
+from playlist_import import is_playlist_url, iter_playlist_chunks
+from audio_cache import AudioFileCache
+from voice_idle import IdleScheduler, IdleTimeoutSettings
+from guild_settings import GuildSettings
+from audio_node import AudioNodeClient, AudioNodeError, NodeTrack, NodeVoiceClient
+from playback_actor import PlaybackActor, PLAYING, FINISHED, FAILED, NO_VOICE
+
+# 此擴展需要的 Gateway 意圖：語音狀態，以及前綴形式的混合指令
+REQUIRED_INTENTS = ("guilds", "voice_states", "guild_messages", "message_content")
+
+
+def format_timestamp(seconds: float) -> str:
+    """秒數轉為 m:ss 或 h:mm:ss"""
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def parse_timestamp(text: str) -> Optional[float]:
+    """解析 90、1:30 或 1:02:03 格式的時間，無法解析時回傳 None"""
+    try:
+        parts = [float(p) for p in text.strip().split(":")]
+    except ValueError:
+        return None
+    if not 1 <= len(parts) <= 3 or any(p < 0 for p in parts):
+        return None
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
 
 
 class MusicQueue:
     """音樂佇列類 - 管理每個伺服器的音樂播放佇列
 
-    優化版本增加了佇列診斷和管理功能
+    優化版本增加了佇列診斷和管理功能。佇列以 deque 儲存，
+    從前端取出／插入為 O(1)，適合匯入上萬首的播放清單。
     """
 
     def __init__(self):
-        self.queue = []  # 歌曲佇列
+        self.queue = deque()  # 歌曲佇列
         self.current = None  # 當前播放的歌曲
         self.voice_client = None  # 語音客戶端連接
         self.is_playing = False  # 是否正在播放
-        self.loop = False  # 循環播放模式
+        self._loop = False  # 循環播放模式
         self.last_updated = None  # 最後更新時間
+        self.track_ended_at = None  # 上一首歌曲結束的時間（用於計算換歌空檔）
+        self.journal = None  # 佇列變動的紀錄回調（用於持久化）
+        # 播放位置：目前這段播放從 position_offset 秒開始，第一個封包送出時記下 position_started
+        self.position_offset = 0.0
+        self.position_started = None
+        self.current_duration = None  # 目前歌曲長度（秒），未知時為 None
 
     def __str__(self):
         """返回佇列的字符串表示以便診斷"""
@@ -33,31 +141,189 @@ class MusicQueue:
         current = self.current["title"] if self.current else "無"
         return f"佇列狀態: {status} | 循環模式: {loop} | 佇列長度: {len(self.queue)} | 當前歌曲: {current}"
 
+    def _record(self, op, **data):
+        """記錄佇列變動"""
+        self.last_updated = datetime.now()
+        if self.journal:
+            self.journal({"op": op, **data})
+
+    @property
+    def loop(self):
+        return self._loop
+
+    @loop.setter
+    def loop(self, value):
+        self._loop = bool(value)
+        self._record("loop", value=self._loop)
+
     def add(self, item):
         """新增歌曲到佇列"""
         self.queue.append(item)
-        self.last_updated = datetime.now()
+        self._record("add", item=item)
         return len(self.queue)  # 返回佇列長度方便提示
 
+    def extend(self, items):
+        """一次新增多首歌曲到佇列（只產生一筆日誌紀錄）"""
+        items = list(items)
+        self.queue.extend(items)
+        self._record("extend", items=items)
+        return len(self.queue)
+
     def get_next(self):
         """獲取佇列中的下一首歌曲"""
         if not self.queue:
             return None
-        self.current = self.queue.pop(0)
-        self.last_updated = datetime.now()
+        self.current = self.queue.popleft()
+        self.reset_position()
+        if "start_at" in self.current:
+            # 從中斷的位置繼續；複製一份，不修改日誌中的項目
+            self.current = dict(self.current)
+            self.position_offset = float(self.current.pop("start_at") or 0)
+        self._record("next")
         return self.current
 
     def clear(self):
         """清空佇列"""
-        self.queue = []
+        self.queue.clear()
         self.current = None
         self.is_playing = False
-        self.last_updated = datetime.now()
+        self.reset_position()
+        self._record("clear")
+
+    def elapsed(self) -> float:
+        """目前歌曲已播放的秒數"""
+        if self.position_started is None:
+            return self.position_offset
+        return self.position_offset + time.monotonic() - self.position_started
+
+    def mark_started(self, offset: float = 0.0):
+        """音訊源送出第一個封包：從 offset 秒開始計時"""
+        self.position_offset = offset
+        self.position_started = time.monotonic()
+
+    def reset_position(self):
+        self.position_offset = 0.0
+        self.position_started = None
+        self.current_duration = None
+
+    def save_position(self):
+        """將目前的播放位置寫入日誌，重新啟動後從這裡繼續"""
+        if self.current:
+            self._record("position", value=round(self.elapsed(), 1))
+
+    def interrupt(self):
+        """目前的歌曲被中斷（離開頻道、被中斷連線）
+
+        記下播放位置並放回佇列最前面，下次播放時從中斷的位置繼續。
+        """
+        if self.current:
+            position = round(self.elapsed(), 1)
+            item = dict(self.current)
+            item.pop("start_at", None)
+            if position >= 1:
+                item["start_at"] = position
+            self.current = None
+            self.add_to_front(item)
+        self.is_playing = False
+        self.reset_position()
 
     def add_to_front(self, item):
         """將歌曲添加到佇列的最前面（下一首播放）"""
-        self.queue.insert(0, item)
-        self.last_updated = datetime.now()
+        self.queue.appendleft(item)
+        self._record("add_front", item=item)
+
+    def peek(self, count: int = 1):
+        """查看佇列前 count 首歌曲（不複製整個佇列）"""
+        return list(islice(self.queue, count))
+
+    def _pop_at(self, index: int):
+        if not 0 <= index < len(self.queue):
+            raise IndexError(f"佇列位置超出範圍: {index}")
+        item = self.queue[index]
+        del self.queue[index]  # deque 會從較近的一端旋轉，最多 O(n/2)
+        return item
+
+    def remove(self, index: int):
+        """移除指定位置（從 0 開始）的歌曲並返回該歌曲"""
+        item = self._pop_at(index)
+        self._record("remove", index=index)
+        return item
+
+    def move(self, src: int, dst: int):
+        """將歌曲從位置 src 移到位置 dst（皆從 0 開始）"""
+        if not 0 <= dst < len(self.queue):
+            raise IndexError(f"佇列位置超出範圍: {dst}")
+        item = self._pop_at(src)
+        self.queue.insert(dst, item)
+        self._record("move", src=src, dst=dst)
+        return item
+
+    def shuffle(self, seed=None):
+        """隨機打亂佇列
+
+        deque 的隨機存取為 O(n)，直接 random.shuffle 會退化為 O(n²)；
+        因此只複製歌曲參照到暫存 list 打亂後寫回同一個 deque（O(n)）。
+        使用記錄下來的 seed，重播日誌時可得到相同的順序。
+        """
+        if seed is None:
+            seed = random.getrandbits(32)
+        items = list(self.queue)
+        random.Random(seed).shuffle(items)
+        self.queue.clear()
+        self.queue.extend(items)
+        self._record("shuffle", seed=seed)
+
+    def snapshot_state(self):
+        """取得可寫入快照的佇列狀態"""
+        return {
+            "queue": list(self.queue),
+            "current": self.current,
+            "loop": self._loop,
+            "position": round(self.elapsed(), 1) if self.current else 0.0,
+        }
+
+    def restore(self, snapshot, records):
+        """從快照與日誌重建佇列（重建期間不產生新的日誌）"""
+        journal, self.journal = self.journal, None
+        try:
+            if snapshot:
+                self.queue = deque(snapshot.get("queue", []))
+                self.current = snapshot.get("current")
+                self._loop = snapshot.get("loop", False)
+                self.position_offset = snapshot.get("position", 0.0)
+
+            for record in records:
+                op = record.get("op")
+                try:
+                    if op == "add":
+                        self.add(record["item"])
+                    elif op == "extend":
+                        self.extend(record["items"])
+                    elif op == "add_front":
+                        self.add_to_front(record["item"])
+                    elif op == "next":
+                        self.get_next()
+                    elif op == "clear":
+                        self.clear()
+                    elif op == "remove":
+                        self.remove(record["index"])
+                    elif op == "move":
+                        self.move(record["src"], record["dst"])
+                    elif op == "shuffle":
+                        self.shuffle(record["seed"])
+                    elif op == "loop":
+                        self.loop = record["value"]
+                    elif op == "position":
+                        self.position_offset = record["value"]
+                except (KeyError, IndexError) as e:
+                    logging.getLogger(__name__).warning(
+                        f"略過無法套用的佇列日誌紀錄 {record}: {str(e)}"
+                    )
+
+            # 重新啟動前正在播放的歌曲被中斷，放回佇列最前面並從中斷的位置繼續
+            self.interrupt()
+        finally:
+            self.journal = journal
 
     def get_queue_info(self):
         """獲取佇列資訊，用於顯示給用戶"""
@@ -68,19 +334,67 @@ class MusicQueue:
             info.append("\n📋 即將播放:")
             for i, song in enumerate(self.queue, 1):
                 if i <= 10:  # 只顯示前10首
-                    info.append(f"{i}. {song['title']}")
+                    resume = (
+                        f"（從 {format_timestamp(song['start_at'])} 繼續）"
+                        if song.get("start_at")
+                        else ""
+                    )
+                    info.append(f"{i}. {song['title']}{resume}")
                 else:
                     info.append(f"...以及更多 {len(self.queue) - 10} 首歌曲")
                     break
         return "\n".join(info) if info else "佇列為空"
 
 
+class PlayAborted(Exception):
+    """/play 的準備步驟失敗，並行中的其他步驟應一併取消
+
+    message 為要回覆給使用者的訊息；None 表示已經回覆過。
+    """
+
+    def __init__(self, message: Optional[str] = None):
+        super().__init__(message or "")
+        self.message = message
+
+
+class FirstPacketSource(discord.AudioSource):
+    """包裝音訊源，在語音客戶端讀取第一個封包時通知事件迴圈
+
+    read() 在語音客戶端的播放執行緒中呼叫，因此以 call_soon_threadsafe 回報。
+    """
+
+    def __init__(self, source: discord.AudioSource, loop, callback):
+        self.source = source
+        self._loop = loop
+        self._callback = callback
+
+    def read(self) -> bytes:
+        data = self.source.read()
+        if self._callback is not None:
+            callback, self._callback = self._callback, None
+            self._loop.call_soon_threadsafe(callback)
+        return data
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.source.cleanup()
+
+
 class SongSelectView(discord.ui.View):
-    def __init__(self, videos: List[Dict], cog, ctx: commands.Context):
+    def __init__(
+        self,
+        videos: List[Dict],
+        cog,
+        ctx: commands.Context,
+        trace: Optional[PlayTrace] = None,
+    ):
         super().__init__(timeout=30.0)
         self.videos = videos
         self.cog = cog
         self.ctx = ctx
+        self.trace = trace  # /play 的階段計時
         self.selected_song = None
         self.logger = logging.getLogger(__name__)
         self.message = None  # 用於存儲消息引用
@@ -95,6 +409,10 @@ class SongSelectView(discord.ui.View):
 
     async def on_timeout(self):
         """處理超時情況"""
+        # 沒有人選擇：取消這次搜尋結果的預先解析
+        self.cog.cancel_speculative(self.ctx.guild.id, self.videos)
+        if self.trace:
+            self.cog.finish_trace(self.trace, "timeout")
         try:
             # 禁用所有按鈕
             for item in self.children:
@@ -134,6 +452,12 @@ class SongSelectView(discord.ui.View):
                 # 選擇歌曲並停止 View
                 self.selected_song = self.videos[index]
                 self.stop()
+                # 只保留被選中歌曲的預先解析
+                self.cog.cancel_speculative(
+                    interaction.guild.id, self.videos, keep=self.selected_song["id"]
+                )
+                if self.trace:
+                    self.trace.mark("select")
 
                 # 禁用所有按鈕
                 for item in self.children:
@@ -157,14 +481,10 @@ class SongSelectView(discord.ui.View):
                     except Exception as e:
                         self.logger.error(f"直接編輯消息時發生錯誤: {str(e)}")
 
-                # 獲取佇列並添加歌曲
-                queue = self.cog.get_queue(interaction.guild.id)
-                queue.add(self.selected_song)
-
-                # 如果沒有正在播放，則開始播放
-                if not queue.is_playing:
-                    await self.cog.play_next(interaction.guild.id, self.ctx)
-                else:
+                # 加入佇列；沒有正在播放時直接開始播放
+                if not await self.cog.enqueue_song(
+                    interaction.guild.id, self.ctx, self.selected_song, trace=self.trace
+                ):
                     # 如果已經在播放，則發送已加入佇列的消息
                     embed = discord.Embed(
                         title="🎵 已加入播放佇列",
@@ -208,7 +528,7 @@ class SongSelectView(discord.ui.View):
 class Music(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.queues = defaultdict(MusicQueue)
+        self.queues = {}  # {guild_id: MusicQueue}，第一次使用時才從磁碟載入
         self.logger = logging.getLogger(__name__)
 
         # 設置 SSL 憑證處理
@@ -217,12 +537,82 @@ class Music(commands.Cog):
         # 初始化 YouTube API 客戶端，帶有重試機制
         self.youtube = self._initialize_youtube_api()
 
-        # 啟動自動檢查語音頻道的任務
-        self.check_voice_activity.start()
+        # 已解析串流網址的快取（以影片 ID 為鍵）
+        self.stream_cache = StreamURLCache(
+            max_size=STREAM_CACHE_SIZE, default_ttl=STREAM_CACHE_DEFAULT_TTL
+        )
+
+        # 佇列持久化：變動寫入日誌，由背景批次寫入磁碟
+        self.queue_store = None
+        if QUEUE_PERSIST:
+            self.queue_store = QueueStore(
+                QUEUE_DATA_DIR, compact_threshold=QUEUE_COMPACT_THRESHOLD
+            )
+            self.flush_queue_journal.change_interval(
+                seconds=QUEUE_JOURNAL_FLUSH_INTERVAL
+            )
+            self.flush_queue_journal.start()
+
+        # 已儲存的歌單
+        self.playlists = PlaylistStore(PLAYLIST_DATA_PATH, PLAYLIST_DATA_DIR)
+
+        # 搜尋結果快取，節省 YouTube API 配額
+        self.search_cache = SearchCache(
+            max_size=SEARCH_CACHE_SIZE,
+            ttl=SEARCH_CACHE_TTL,
+            path=SEARCH_CACHE_PATH if SEARCH_CACHE_PERSIST else None,
+        )
+        if SEARCH_CACHE_PERSIST:
+            self.flush_search_cache.start()
+
+        # 已知無法播放的影片（DRM、已刪除、地區限制等），避免重複解析
+        self.unplayable = UnplayableCache(UNPLAYABLE_CACHE_PATH)
+        self.flush_unplayable_cache.start()
+
+        # 熱門歌曲的本機 Ogg/Opus 快取
+        self.audio_cache = None
+        if AUDIO_CACHE_ENABLED:
+            self.audio_cache = AudioFileCache(
+                AUDIO_CACHE_DIR,
+                AUDIO_CACHE_MAX_BYTES,
+                ffmpeg_path=FFMPEG_PATH,
+                min_plays=AUDIO_CACHE_MIN_PLAYS,
+            )
+
+        # 每個伺服器進行中的播放清單匯入任務
+        self.import_tasks = {}
+
+        # 每個伺服器的播放控制任務，依序處理加入、跳過、停止與音軌結束
+        self.playback_actors: Dict[int, PlaybackActor] = {}
+
+        # 每個伺服器的預先解析任務 {guild_id: {video_id: Task}}
+        self.prefetch_tasks = defaultdict(dict)
+        # 搜尋結果的預先解析任務 {guild_id: {video_id: Task}}
+        self.speculative_tasks = defaultdict(dict)
+        # 開啟「立即播放」的伺服器直接播放第一個搜尋結果
+        self.instant_play = GuildSettings(INSTANT_PLAY_SETTINGS_PATH, False)
+        # 歌曲之間的空檔時間（秒）
+        self.track_gap_stats = RollingStats()
+        # /play 到第一個音訊封包的各階段延遲
+        self.play_stage_stats = StageMetrics()
+
+        # 閒置／空頻道自動離開：由語音狀態事件排入期限，不再輪詢所有伺服器
+        self.idle_settings = IdleTimeoutSettings(VOICE_SETTINGS_PATH, VOICE_IDLE_TIMEOUT)
+        self.idle_scheduler = IdleScheduler(self._on_idle_deadline)
+        self.idle_scheduler.start()
+
+        # 選用的音訊節點：語音連線與 FFmpeg 改在獨立行程中執行
+        self.audio_node = None
+        if AUDIO_NODE_ADDRESS:
+            self.audio_node = AudioNodeClient(
+                AUDIO_NODE_ADDRESS, request_timeout=AUDIO_NODE_REQUEST_TIMEOUT
+            )
+            self.audio_node.start()
 
         # 設置 yt-dlp 選項 - 優化音訊提取和錯誤處理
         self.ydl_opts = {
-            "format": "bestaudio[ext=m4a]/bestaudio[ext=webm]/bestaudio/best[height<=720]",
+            # 優先選擇 Opus 音軌，播放時可直接複製串流而不需轉碼
+            "format": "bestaudio[acodec=opus]/bestaudio[ext=webm]/bestaudio[ext=m4a]/bestaudio/best[height<=720]",
             "quiet": True,
             "no_warnings": True,
             "extract_flat": False,
@@ -260,6 +650,31 @@ class Music(commands.Cog):
             "cookiefile": None,
         }
 
+        # 專用的 yt-dlp 解析池，不與預設執行器共用
+        self.extractor = ExtractorPool(
+            self.ydl_opts,
+            mode=EXTRACTOR_MODE,
+            workers=EXTRACTOR_WORKERS,
+            max_queue=EXTRACTOR_MAX_QUEUE,
+        )
+        # 依伺服器公平分配解析名額：同時放行的工作數與解析池工作者相同
+        self.extraction = ExtractionScheduler(
+            EXTRACTOR_WORKERS,
+            max_queue_per_guild=EXTRACTION_GUILD_MAX_QUEUE,
+            weight=self._extraction_weight,
+        )
+        # 每位使用者 /play 與載入播放清單的速率限制
+        self.play_limiter = UserRateLimiter(PLAY_RATE_PER_MINUTE, PLAY_RATE_BURST)
+
+        # 背景檢查並安裝 yt-dlp 更新，不在解析重試中執行 pip
+        self.extractor_maintenance = None
+        if YTDLP_AUTO_UPDATE:
+            self.extractor_maintenance = ExtractorMaintenance(
+                self.extractor, failure_rate=YTDLP_UPDATE_FAILURE_RATE
+            )
+            self.maintain_extractor.change_interval(hours=YTDLP_UPDATE_INTERVAL_HOURS)
+            self.maintain_extractor.start()
+
     def _setup_ssl(self):
         """設置 SSL 憑證驗證，解決憑證問題"""
         try:
@@ -288,72 +703,35 @@ class Music(commands.Cog):
             self.logger.error(f"設置 SSL 憑證時發生錯誤: {str(e)}")
 
     def _initialize_youtube_api(self):
-        """初始化 YouTube API 客戶端，帶有 SSL 錯誤處理"""
-        try:
-            import httplib2
-            from googleapiclient.discovery import build
-
-            # 檢查 API 金鑰
-            api_key = os.getenv("YOUTUBE_API_KEY")
-            if not api_key:
-                self.logger.error("YOUTUBE_API_KEY 環境變數未設定")
-                return None
-            else:
-                self.logger.info(f"YouTube API 金鑰已載入 (長度: {len(api_key)})")
-
-            # 創建自定義的 HTTP 對象，禁用 SSL 驗證
-            http = httplib2.Http(disable_ssl_certificate_validation=True)
+        """初始化非同步 YouTube 搜尋客戶端"""
+        api_key = os.getenv("YOUTUBE_API_KEY")
+        if not api_key:
+            self.logger.error("YOUTUBE_API_KEY 環境變數未設定")
+        else:
+            self.logger.info(f"YouTube API 金鑰已載入 (長度: {len(api_key)})")
 
-            # 設置額外的 SSL 環境
-            os.environ["PYTHONHTTPSVERIFY"] = "0"
+        return YouTubeSearchClient(
+            api_key or "",
+            timeout=YOUTUBE_SEARCH_TIMEOUT,
+            pool_size=YOUTUBE_SEARCH_POOL_SIZE,
+        )
 
-            youtube_client = build(
-                "youtube", "v3", developerKey=api_key, http=http, cache_discovery=False
+    async def _search_youtube_with_retry(self, query: str, max_retries=3):
+        """使用重試機制搜尋 YouTube（非阻塞，不會卡住事件迴圈）"""
+        cached = self.search_cache.get(query)
+        if cached:
+            self.logger.info(
+                f"搜尋快取命中: {query} (累計節省 {self.search_cache.quota_saved} 配額單位)"
             )
+            return cached
 
-            self.logger.info("YouTube API 客戶端初始化成功")
-            return youtube_client
-
-        except Exception as e:
-            self.logger.error(f"初始化 YouTube API 時發生錯誤: {str(e)}")
-            # 如果自定義初始化失敗，嘗試標準初始化
-            try:
-                api_key = os.getenv("YOUTUBE_API_KEY")
-                if api_key:
-                    youtube_client = build(
-                        "youtube", "v3", developerKey=api_key, cache_discovery=False
-                    )
-                    self.logger.info("使用標準方法初始化 YouTube API 客戶端成功")
-                    return youtube_client
-            except Exception as e2:
-                self.logger.error(f"標準 YouTube API 初始化也失敗: {str(e2)}")
-
-            return None
-
-    async def _search_youtube_with_retry(self, query: str, max_retries=3):
-        """使用重試機制搜尋 YouTube，處理 SSL 錯誤"""
         for attempt in range(max_retries):
             try:
                 self.logger.info(
                     f"使用 YouTube API 搜尋: {query} (嘗試 {attempt + 1}/{max_retries})"
                 )
-
-                # 確保 SSL 設定
-                ssl._create_default_https_context = ssl._create_unverified_context
-                os.environ["PYTHONHTTPSVERIFY"] = "0"
-
-                # 如果 YouTube API 客戶端無效，嘗試重新初始化
-                if not self.youtube:
-                    self.youtube = self._initialize_youtube_api()
-                    if not self.youtube:
-                        raise Exception("無法初始化 YouTube API 客戶端")
-
-                search_response = (
-                    self.youtube.search()
-                    .list(q=query, part="id,snippet", maxResults=5, type="video")
-                    .execute()
-                )
-
+                search_response = await self.youtube.search(query, max_results=5)
+                self.search_cache.put(query, search_response)
                 return search_response
 
             except Exception as e:
@@ -361,18 +739,303 @@ class Music(commands.Cog):
                     f"YouTube API 搜尋錯誤 (嘗試 {attempt + 1}/{max_retries}): {str(e)}"
                 )
                 if attempt < max_retries - 1:
-                    # 等待後重試，並嘗試重新初始化 API 客戶端
                     await asyncio.sleep(1 + attempt)
-                    self.youtube = self._initialize_youtube_api()
                     continue
                 else:
                     raise e
 
         return None
 
+    def _parse_search_results(self, search_response) -> List[Dict[str, str]]:
+        """將 YouTube API 回應轉換為 {id, title, url} 列表"""
+        videos = []
+        for item in (search_response or {}).get("items", []):
+            try:
+                # 檢查 item["id"] 是否包含 videoId
+                if isinstance(item["id"], dict) and "videoId" in item["id"]:
+                    video_id = item["id"]["videoId"]
+                elif isinstance(item["id"], str):
+                    video_id = item["id"]
+                else:
+                    self.logger.warning(f"無法獲取 videoId: {item}")
+                    continue
+
+                videos.append(
+                    {
+                        "id": video_id,
+                        "title": item["snippet"]["title"],
+                        "url": f"https://www.youtube.com/watch?v={video_id}",
+                    }
+                )
+            except KeyError as e:
+                self.logger.error(f"解析搜尋結果時發生錯誤: {e}, item: {item}")
+                continue
+
+        # 過濾已知無法播放的影片，不必等到解析時才失敗
+        playable = self.unplayable.filter(videos)
+        if len(playable) < len(videos):
+            self.logger.info(f"已略過 {len(videos) - len(playable)} 個已知無法播放的影片")
+        return playable
+
     def get_queue(self, guild_id: int) -> MusicQueue:
-        """獲取或創建伺服器的音樂佇列"""
-        return self.queues[guild_id]
+        """獲取或創建伺服器的音樂佇列
+
+        第一次使用某伺服器的佇列時才從快照與日誌重建，
+        啟動時間不會隨所有伺服器的佇列總長增加。
+        """
+        queue = self.queues.get(guild_id)
+        if queue is not None:
+            return queue
+
+        queue = MusicQueue()
+        if self.queue_store:
+            snapshot, records = self.queue_store.load(guild_id)
+            if snapshot or records:
+                queue.restore(snapshot, records)
+                self.logger.info(
+                    f"已還原佇列 (伺服器 ID: {guild_id}): {len(queue.queue)} 首歌曲"
+                )
+                # 將還原後的狀態壓縮為新快照
+                self.queue_store.schedule_snapshot(guild_id, queue.snapshot_state())
+            queue.journal = lambda record: self._journal_queue(guild_id, record)
+
+        self.queues[guild_id] = queue
+        return queue
+
+    def _journal_queue(self, guild_id: int, record: Dict[str, Any]):
+        """記錄佇列變動；日誌過長時排入快照壓縮"""
+        self.queue_store.append(guild_id, record)
+        if self.queue_store.needs_compaction(guild_id):
+            queue = self.queues.get(guild_id)
+            if queue:
+                self.queue_store.schedule_snapshot(guild_id, queue.snapshot_state())
+
+    def schedule_prefetch(self, guild_id: int):
+        """在背景預先解析佇列前 PREFETCH_COUNT 首歌曲的音訊 URL
+
+        佇列變動後呼叫：不再位於佇列前端的歌曲會取消解析，
+        已有快取或正在解析的歌曲不會重複解析。
+        """
+        if PREFETCH_COUNT <= 0:
+            return
+
+        queue = self.get_queue(guild_id)
+        tasks_for_guild = self.prefetch_tasks[guild_id]
+
+        wanted = {}
+        for song in queue.peek(PREFETCH_COUNT):
+            video_id = extract_video_id(song["url"])
+            if video_id:
+                wanted[video_id] = song["url"]
+
+        # 佇列已重新排序或歌曲已移除：取消不再需要的解析
+        for video_id in list(tasks_for_guild):
+            if video_id not in wanted:
+                tasks_for_guild.pop(video_id).cancel()
+
+        for video_id, url in wanted.items():
+            if video_id in self.speculative_tasks.get(guild_id, {}):
+                continue  # 搜尋結果已在預先解析
+            self._start_prefetch(self.prefetch_tasks, guild_id, video_id, url)
+
+    def _start_prefetch(self, registry, guild_id: int, video_id: str, url: str):
+        """在 registry[guild_id] 中建立單首歌曲的背景解析任務（已有快取時略過）"""
+        tasks_for_guild = registry[guild_id]
+        if video_id in tasks_for_guild or video_id in self.stream_cache:
+            return
+        if video_id in self.unplayable:
+            return  # 播放時會直接跳過
+        if self.audio_cache and video_id in self.audio_cache:
+            return  # 已有本機檔案，不需解析串流網址
+        task = asyncio.create_task(self._prefetch(guild_id, video_id, url, registry))
+        # 失敗的預先解析可能無人等待，避免 "exception was never retrieved"
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        tasks_for_guild[video_id] = task
+
+    async def _prefetch(
+        self, guild_id: int, video_id: str, url: str, registry=None
+    ) -> Optional[Dict[str, Any]]:
+        """背景解析單首歌曲，結果寫入串流網址快取並回傳給等待中的 resolve_audio"""
+        registry = self.prefetch_tasks if registry is None else registry
+        priority = SPECULATIVE if registry is self.speculative_tasks else PREFETCH
+        try:
+            audio_info = await self.get_audio_url(url, guild_id=guild_id, priority=priority)
+            self.logger.info(f"已預先解析音訊 URL: {video_id} (伺服器 ID: {guild_id})")
+            return audio_info
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning(f"預先解析音訊 URL 失敗: {video_id}: {str(e)}")
+            raise
+        finally:
+            tasks_for_guild = registry.get(guild_id, {})
+            if tasks_for_guild.get(video_id) is asyncio.current_task():
+                del tasks_for_guild[video_id]
+
+    def start_speculative(self, guild_id: int, videos: List[Dict[str, str]]):
+        """搜尋結果一出來就在背景解析，使用者按下選擇時音訊 URL 多半已在快取中"""
+        for video in videos:
+            self._start_prefetch(self.speculative_tasks, guild_id, video["id"], video["url"])
+
+    def cancel_speculative(
+        self,
+        guild_id: int,
+        videos: Optional[List[Dict[str, str]]] = None,
+        keep: Optional[str] = None,
+    ):
+        """取消搜尋結果的預先解析
+
+        videos 為 None 時取消伺服器所有的預先解析；否則只取消這些結果
+        （同一伺服器可能同時有其他人的搜尋結果等待選擇）。keep 為被選中的影片 ID。
+        """
+        tasks_for_guild = self.speculative_tasks.get(guild_id)
+        if not tasks_for_guild:
+            return
+        video_ids = list(tasks_for_guild) if videos is None else [v["id"] for v in videos]
+        for video_id in video_ids:
+            if video_id == keep:
+                continue
+            task = tasks_for_guild.pop(video_id, None)
+            if task:
+                task.cancel()
+        if not tasks_for_guild:
+            del self.speculative_tasks[guild_id]
+
+    def cancel_prefetch(self, guild_id: int):
+        """取消伺服器所有進行中的預先解析"""
+        for task in self.prefetch_tasks.pop(guild_id, {}).values():
+            task.cancel()
+
+    async def resolve_audio(self, guild_id: int, url: str) -> Optional[Dict[str, Any]]:
+        """取得音訊 URL；若該歌曲正在預先解析則直接等待其結果"""
+        video_id = extract_video_id(url)
+        task = self.prefetch_tasks.get(guild_id, {}).get(video_id)
+        if task is None:
+            task = self.speculative_tasks.get(guild_id, {}).get(video_id)
+        if task and not task.done():
+            self.logger.info(f"等待進行中的預先解析: {video_id}")
+            # 還在排隊的預先解析現在是下一首要播放的歌曲
+            self.extraction.promote(guild_id, video_id)
+            try:
+                return await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                # 預先解析被取消（例如佇列已變動），改為直接解析
+        return await self.get_audio_url(url, guild_id=guild_id, priority=NOW)
+
+    def _record_track_gap(self, guild_id: int, queue: MusicQueue):
+        """記錄上一首結束到這一首開始播放之間的空檔"""
+        if queue.track_ended_at is None:
+            return
+        gap = time.monotonic() - queue.track_ended_at
+        queue.track_ended_at = None
+        self.track_gap_stats.add(gap)
+        summary = self.track_gap_stats.summary()
+        self.logger.info(
+            f"換歌空檔 {gap * 1000:.0f} ms (伺服器 ID: {guild_id}) | "
+            f"p50={summary['p50'] * 1000:.0f} ms p95={summary['p95'] * 1000:.0f} ms"
+        )
+
+    def finish_trace(self, trace: PlayTrace, outcome: str = "played"):
+        """結束一次 /play 的計時並寫入結構化紀錄
+
+        只有實際播放出第一個封包的請求會計入各階段的延遲統計。
+        """
+        if trace.finished:
+            return
+        trace.tag(outcome=outcome)
+        self.play_stage_stats.count(outcome)
+        if outcome == "played":
+            self.play_stage_stats.record(trace)
+        else:
+            trace.finished = True
+        self.logger.info(
+            f"play_trace {json.dumps(trace.to_record(), ensure_ascii=False)}"
+        )
+
+    def _on_first_packet(self, trace: PlayTrace):
+        trace.mark("first_packet")
+        self.finish_trace(trace)
+
+    def refresh_idle(self, guild_id: int):
+        """依目前的語音與播放狀態更新伺服器的離開期限
+
+        頻道中沒有其他成員時排入短期限；有人但沒有播放時排入閒置期限；
+        正在播放則取消期限。只檢查機器人所在的頻道。
+        """
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if not voice_client or not voice_client.is_connected():
+            self.idle_scheduler.cancel(guild_id)
+            return
+
+        if not any(not m.bot for m in voice_client.channel.members):
+            self.idle_scheduler.schedule(guild_id, VOICE_EMPTY_TIMEOUT, "empty")
+        elif voice_client.is_playing() or self.get_queue(guild_id).is_playing:
+            self.idle_scheduler.cancel(guild_id)
+        else:
+            self.idle_scheduler.schedule(
+                guild_id, self.idle_settings.get(guild_id), "idle"
+            )
+
+    async def _on_idle_deadline(self, guild_id: int, reason: str):
+        """期限到期：再次確認狀態後停止播放、離開頻道並釋放資源"""
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        if not voice_client:
+            return
+
+        if voice_client.is_connected():
+            humans = any(not m.bot for m in voice_client.channel.members)
+            if humans and (reason == "empty" or voice_client.is_playing()):
+                # 期間有人回來或重新開始播放
+                self.refresh_idle(guild_id)
+                return
+
+        self.logger.info(
+            f"{'語音頻道已無成員' if reason == 'empty' else '閒置超時'}，自動離開 (伺服器: {guild_id})"
+        )
+        queue = self.get_queue(guild_id)
+        # 記下播放位置（頻道沒人時可能仍在播放），之後重新加入時繼續
+        queue.interrupt()
+        queue.voice_client = None
+        await self.stop_playback(guild_id)
+        try:
+            # 停止播放會結束 FFmpeg 子行程
+            if voice_client.is_playing():
+                voice_client.stop()
+            await voice_client.disconnect(force=True)
+        except Exception as e:
+            self.logger.error(f"自動離開語音頻道時發生錯誤: {str(e)}")
+        finally:
+            self.cancel_import(guild_id)
+            self.cancel_prefetch(guild_id)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        """成員進出機器人所在的頻道時更新離開期限"""
+        guild = member.guild
+        voice_client = guild.voice_client
+        if member.id == self.bot.user.id:
+            if after.channel is None:
+                # 機器人被中斷連線或踢出：記下播放位置，重新加入時繼續
+                self.idle_scheduler.cancel(guild.id)
+                queue = self.queues.get(guild.id)
+                if queue:
+                    if queue.voice_client:
+                        queue.interrupt()
+                    queue.is_playing = False
+                    queue.voice_client = None
+                await self.stop_playback(guild.id)
+                return
+            self.refresh_idle(guild.id)
+            return
+
+        if not voice_client or before.channel == after.channel:
+            return
+        if voice_client.channel in (before.channel, after.channel):
+            self.refresh_idle(guild.id)
 
     async def _send_response(self, ctx, content=None, *, embed=None, view=None, ephemeral=False):
         """統一的回應方法，處理不同類型的 context"""
@@ -425,8 +1088,14 @@ class Music(commands.Cog):
 
                     # 連接到語音頻道
                     try:
-                        voice_client = await ctx.author.voice.channel.connect()
+                        if self.audio_node:
+                            await ctx.author.voice.channel.connect(
+                                cls=self.audio_node.voice_client
+                            )
+                        else:
+                            await ctx.author.voice.channel.connect()
                         self.logger.info("語音連接成功建立")
+                        self.refresh_idle(ctx.guild.id)
                         return True
                     except Exception as e:
                         self.logger.error(f"連接語音頻道時發生錯誤: {str(e)}")
@@ -459,84 +1128,181 @@ class Music(commands.Cog):
 
         return False
 
-    def after_playing_callback(self, guild_id, error=None):
-        """建立一個當歌曲播放完畢時的回調函數
+    def after_playing_callback(self, guild_id: int, token: int):
+        """建立歌曲播放完畢時的回調函數
 
-        這個函數解決了舊版本的回調無法正確處理特定伺服器的問題
+        回調在語音播放執行緒中執行，只把結束事件交給伺服器的播放控制任務。
         """
+        actor = self.playback(guild_id)
 
-        async def _after_playing():
-            if error:
-                self.logger.error(
-                    f"播放時發生錯誤 (伺服器 ID: {guild_id}): {str(error)}"
-                )
+        def wrapper(error=None):
+            self.get_queue(guild_id).track_ended_at = time.monotonic()
+            actor.notify_track_end(token, error)
+
+        return wrapper
+
+    def playback(self, guild_id: int) -> PlaybackActor:
+        """獲取或建立伺服器的播放控制任務"""
+        actor = self.playback_actors.get(guild_id)
+        if actor is None:
+            actor = PlaybackActor(
+                guild_id,
+                self,
+                max_failures=PLAYBACK_MAX_FAILURES,
+                backoff_base=PLAYBACK_RETRY_DELAY,
+                backoff_max=PLAYBACK_RETRY_MAX_DELAY,
+            )
+            self.playback_actors[guild_id] = actor
+        return actor
+
+    async def stop_playback(self, guild_id: int):
+        """讓播放控制任務忘記目前的歌曲，之後停止語音客戶端不會接著播放下一首"""
+        actor = self.playback_actors.get(guild_id)
+        if actor:
+            await actor.stop()
+
+    def stop_voice(self, guild_id: int):
+        """停止目前的音軌（跳過時由播放控制任務呼叫）"""
+        voice_client = self.get_queue(guild_id).voice_client
+        if not voice_client:
+            return
+        if isinstance(voice_client, NodeVoiceClient):
+            voice_client.skip()
+        else:
+            voice_client.stop()
 
-            # 確保是非同步環境
+    async def playback_failed(self, guild_id: int, ctx, failures: int):
+        """連續多首無法播放：停止播放，等待使用者處理"""
+        self.logger.error(f"連續 {failures} 首歌曲無法播放，停止播放 (伺服器 ID: {guild_id})")
+        queue = self.get_queue(guild_id)
+        queue.is_playing = False
+        self.refresh_idle(guild_id)
+        if ctx:
             try:
-                # 獲取特定伺服器的佇列
-                queue = self.get_queue(guild_id)
+                await self._send_response(
+                    ctx, f"❌ 連續 {failures} 首歌曲無法播放，已暫停播放。使用 `/skip` 或 `/play` 繼續。", ephemeral=True
+                )
+            except Exception:
+                pass
 
-                # 檢查佇列是否存在且語音客戶端有效
-                if queue and queue.voice_client:
-                    self.logger.info(f"歌曲播放完畢，檢查佇列 (伺服器 ID: {guild_id})")
+    FFMPEG_BEFORE_OPTIONS = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
 
-                    # 如果不再播放，則嘗試播放下一首
-                    if not queue.voice_client.is_playing():
-                        await self.play_next(guild_id)
-                else:
-                    self.logger.warning(f"佇列或語音客戶端無效 (伺服器 ID: {guild_id})")
-            except Exception as e:
-                self.logger.error(f"在處理播放完畢回調時發生錯誤: {str(e)}")
+    @staticmethod
+    def is_opus_stream(audio_info: Dict[str, Any]) -> bool:
+        """yt-dlp 回報的音軌是否已是 Opus（可直接複製串流）"""
+        acodec = (audio_info.get("acodec") or "").lower()
+        return acodec == "opus" or (acodec in ("", "none") and audio_info.get("ext") == "webm")
 
-        # 返回一個同步回調函數，建立任務執行非同步處理
-        def wrapper(error=None):
-            asyncio.run_coroutine_threadsafe(_after_playing(), self.bot.loop)
+    @classmethod
+    def ffmpeg_options(cls, audio_info: Dict[str, Any], start: float = 0.0) -> Dict[str, Any]:
+        """依 yt-dlp 的格式資訊決定 FFmpeg 參數，不再執行 ffprobe
 
-        return wrapper
+        Opus/WebM 音軌直接複製串流，其他格式轉碼為 Opus。
+        start 放在輸入端（-i 之前），FFmpeg 會以 Range 請求跳到該位置。
+        """
+        if cls.is_opus_stream(audio_info):
+            codec = "copy"
+            bitrate = 128
+        else:
+            codec = None  # FFmpegOpusAudio 預設為 libopus
+            bitrate = min(int(audio_info.get("abr") or 128), 128)
+
+        before_options = cls.FFMPEG_BEFORE_OPTIONS
+        if start > 0:
+            before_options = f"{before_options} -ss {start:.3f}"
+        return {
+            "bitrate": bitrate,
+            "codec": codec,
+            "before_options": before_options,
+            "options": "-vn",
+        }
+
+    @classmethod
+    def create_audio_source(
+        cls, audio_info: Dict[str, Any], start: float = 0.0
+    ) -> discord.FFmpegOpusAudio:
+        """依 yt-dlp 的格式資訊直接建立音訊源"""
+        return discord.FFmpegOpusAudio(
+            audio_info["url"], **cls.ffmpeg_options(audio_info, start)
+        )
+
+    @classmethod
+    def create_node_track(cls, audio_info: Dict[str, Any], start: float = 0.0) -> NodeTrack:
+        """建立交給音訊節點播放的音軌，參數與 create_audio_source 相同
+
+        起始位置由節點加上 -ss，因此不放進 before_options。
+        """
+        return NodeTrack(
+            audio_info["url"],
+            duration=audio_info.get("duration"),
+            position=start,
+            **cls.ffmpeg_options(audio_info),
+        )
+
+    def _record_extraction(self, success: bool):
+        """回報解析結果給 yt-dlp 維護服務"""
+        if self.extractor_maintenance:
+            self.extractor_maintenance.record_result(success)
+
+    def _extraction_weight(self, guild_id: int) -> int:
+        """解析排程的伺服器權重：語音頻道中的聽眾越多，每輪可取得的名額越多"""
+        guild = self.bot.get_guild(guild_id)
+        voice_client = guild.voice_client if guild else None
+        channel = getattr(voice_client, "channel", None)
+        if channel is None:
+            return 1
+        listeners = sum(1 for member in channel.members if not member.bot)
+        return max(1, min(EXTRACTION_MAX_WEIGHT, listeners))
+
+    async def get_audio_url(
+        self, url: str, *, guild_id: int = 0, priority: int = NOW
+    ) -> Optional[Dict[str, Any]]:
+        """使用 yt-dlp 獲取音訊 URL，帶有增強的錯誤處理
+
+        解析工作先經過解析排程，依 guild_id 的佇列與 priority 取得名額。
+        """
+        # 先查詢快取，避免重複執行 extract_info
+        video_id = extract_video_id(url)
+        cached = self.stream_cache.get(video_id)
+        if cached:
+            self.logger.info(f"串流網址快取命中: {video_id}")
+            return cached
+
+        # 已知無法播放的影片不再解析
+        unplayable = self.unplayable.get(video_id)
+        if unplayable:
+            reason, message = unplayable
+            self.logger.info(f"略過已知無法播放的影片: {video_id} ({reason})")
+            raise VideoUnplayableError(reason, message)
 
-    async def get_audio_url(self, url: str) -> Optional[Dict[str, str]]:
-        """使用 yt-dlp 獲取音訊 URL，帶有增強的錯誤處理"""
         retry_count = 0
         max_retries = 3
 
         while retry_count < max_retries:
             try:
-                # 確保每次都設置不驗證 SSL
-                import ssl
-                import os
-
-                ssl._create_default_https_context = ssl._create_unverified_context
-
-                # 設置環境變數
-                os.environ["PYTHONHTTPSVERIFY"] = "0"
-
-                # 動態調整 yt-dlp 選項
-                current_opts = self.ydl_opts.copy()
-
-                # 如果是 YouTube URL，嘗試不同的提取器設定
-                if "youtube.com" in url or "youtu.be" in url:
-                    current_opts.update(
-                        {
-                            "extractor_args": {
-                                "youtube": {
-                                    "skip": ["dash", "hls"],
-                                    "player_skip": ["js"],
-                                    "player_client": ["android", "web"],
-                                }
-                            },
-                            "force_generic_extractor": False,
-                        }
-                    )
-
-                with yt_dlp.YoutubeDL(current_opts) as ydl:
-                    info = await asyncio.get_event_loop().run_in_executor(
-                        None, lambda: ydl.extract_info(url, download=False)
-                    )
-                    if not info:
-                        self.logger.warning(f"無法獲取 URL {url} 的資訊")
-                        return None
-
-                    return {"url": info["url"], "title": info["title"]}
+                # 在專用解析池中執行（YoutubeDL 實例由工作者重複使用）
+                info = await self.extraction.run(
+                    guild_id, video_id, priority, lambda: self.extractor.extract(url)
+                )
+                if not info:
+                    self.logger.warning(f"無法獲取 URL {url} 的資訊")
+                    return None
+
+                # 保留格式資訊，播放時可省去 ffprobe
+                audio_info = {
+                    "url": info["url"],
+                    "title": info["title"],
+                    "acodec": info.get("acodec"),
+                    "ext": info.get("ext"),
+                    "abr": info.get("abr"),
+                    "duration": info.get("duration"),
+                }
+                self.stream_cache.put(video_id or info.get("id"), audio_info)
+                self._record_extraction(True)
+                return audio_info
+            except ExtractorQueueFull:
+                # 解析池已滿時直接回報，不佔用重試
+                raise
             except yt_dlp.DownloadError as e:
                 error_msg = str(e)
                 self.logger.error(
@@ -544,34 +1310,16 @@ class Music(commands.Cog):
                 )
                 
                 # 檢查是否為不可重試的錯誤（DRM 保護、地區限制等）
-                if any(keyword in error_msg for keyword in ["DRM protected", "not available", "blocked", "private video", "deleted"]):
-                    if "DRM protected" in error_msg:
-                        # 對於 DRM 保護的影片，標記為需要跳過
-                        raise Exception(f"DRM_PROTECTED: 此影片受到 DRM 保護，無法播放")
-                    elif "not available" in error_msg.lower() or "blocked" in error_msg.lower():
-                        raise Exception(f"REGION_BLOCKED: 此影片在您的地區不可用")
-                    elif "private video" in error_msg.lower():
-                        raise Exception(f"PRIVATE_VIDEO: 此影片為私人影片，無法播放")
-                    elif "deleted" in error_msg.lower():
-                        raise Exception(f"VIDEO_DELETED: 此影片已被刪除")
-                    else:
-                        raise Exception(f"VIDEO_UNAVAILABLE: 影片無法播放: {error_msg}")
-                
-                # 對於其他錯誤，進行重試
+                error = classify_unplayable(error_msg)
+                if error:
+                    # 記錄到負面快取，之後的搜尋結果與替代影片會直接略過
+                    self.unplayable.put(video_id, error.reason, error.detail)
+                    raise error
+
+                # 對於其他錯誤，進行重試；失敗率升高時由維護服務在背景更新 yt-dlp
+                self._record_extraction(False)
                 retry_count += 1
                 if retry_count < max_retries:
-                    # 只在第一次重試時嘗試更新 yt-dlp
-                    if retry_count == 1:
-                        try:
-                            import subprocess
-                            subprocess.run(
-                                ["pip", "install", "--upgrade", "yt-dlp"],
-                                capture_output=True,
-                                text=True,
-                            )
-                            self.logger.info("已嘗試更新 yt-dlp")
-                        except:
-                            pass
                     await asyncio.sleep(2)  # 等待後重試
                     continue
                 else:
@@ -579,15 +1327,18 @@ class Music(commands.Cog):
             except Exception as e:
                 error_msg = str(e)
                 # 如果已經是我們自定義的異常（DRM 等），直接重新拋出
-                if any(keyword in error_msg for keyword in ["DRM_PROTECTED", "REGION_BLOCKED", "PRIVATE_VIDEO", "VIDEO_DELETED", "VIDEO_UNAVAILABLE"]):
-                    raise e
-                # 也檢查原始的 DRM 錯誤訊息
-                elif "DRM protected" in error_msg:
-                    raise Exception("DRM_PROTECTED: 此影片受到 DRM 保護，無法播放")
+                if isinstance(e, VideoUnplayableError):
+                    raise
+                # 也檢查原始的錯誤訊息（與 DownloadError 使用相同的分類）
+                error = classify_unplayable(error_msg)
+                if error:
+                    self.unplayable.put(video_id, error.reason, error.detail)
+                    raise error
                 
                 self.logger.error(
                     f"獲取音訊 URL 時發生未預期錯誤 (嘗試 {retry_count + 1}/{max_retries}): {error_msg}"
                 )
+                self._record_extraction(False)
                 retry_count += 1
                 if retry_count < max_retries:
                     await asyncio.sleep(2)  # 增加等待時間
@@ -597,16 +1348,101 @@ class Music(commands.Cog):
 
         return None
 
-    async def play_next(self, guild_id: int, ctx=None):
-        """播放下一首歌曲
+    async def _open_track(
+        self,
+        guild_id: int,
+        song: Dict[str, Any],
+        start: float = 0.0,
+        *,
+        use_node: bool = False,
+        trace: Optional[PlayTrace] = None,
+    ):
+        """建立歌曲的音訊源，回傳 (音訊源, 標題)
+
+        start 大於 0 時以輸入端的 -ss 開始，FFmpeg 透過 HTTP Range 請求
+        直接從該位置讀取，不必重新下載前段。使用音訊節點時回傳 NodeTrack。
+        """
+        queue = self.get_queue(guild_id)
+        video_id = extract_video_id(song["url"])
+        cached_path = self.audio_cache.lookup(video_id) if self.audio_cache else None
+
+        if cached_path:
+            # 本機快取命中：已是 Ogg/Opus，直接複製串流不需轉碼
+            self.logger.info(f"音訊快取命中: {video_id}")
+            if trace:
+                trace.mark("extract")
+                trace.tag(audio_cache=True)
+            cached_info = self.stream_cache.get(video_id, count=False) or {}
+            queue.current_duration = cached_info.get("duration")
+            if use_node:
+                # 節點行程的工作目錄可能不同，傳送絕對路徑
+                source = NodeTrack(
+                    os.path.abspath(cached_path),
+                    codec="copy",
+                    duration=queue.current_duration,
+                    position=start,
+                )
+            else:
+                source = discord.FFmpegOpusAudio(
+                    cached_path,
+                    codec="copy",
+                    before_options=f"-ss {start:.3f}" if start else None,
+                )
+            return source, song["title"]
+
+        if trace:
+            trace.tag(
+                audio_cache=False,
+                stream_cache=video_id in self.stream_cache,
+                prefetched=video_id in self.prefetch_tasks.get(guild_id, {})
+                or video_id in self.speculative_tasks.get(guild_id, {}),
+            )
+        # 獲取音訊 URL（優先使用預先解析的結果）
+        audio_info = await self.resolve_audio(guild_id, song["url"])
+        if trace:
+            trace.mark("extract")
+        if not audio_info:
+            raise Exception("無法獲取音訊 URL")
 
-        優化的版本增加了更多診斷和錯誤處理
+        self.logger.info(
+            f"成功獲取音訊 URL (格式: {audio_info.get('acodec')}/{audio_info.get('ext')})"
+        )
+        queue.current_duration = audio_info.get("duration")
+
+        # 播放音訊（依格式資訊直接建立，不經過 ffprobe）
+        if use_node:
+            source = self.create_node_track(audio_info, start)
+        else:
+            source = self.create_audio_source(audio_info, start)
+
+        # 熱門歌曲在背景寫入本機快取（只計入從頭開始的播放）
+        if self.audio_cache and not start:
+            self.audio_cache.record_play(
+                video_id,
+                audio_info["url"],
+                copy=self.is_opus_stream(audio_info),
+            )
+        return source, audio_info["title"]
+
+    async def play_next(
+        self, guild_id: int, ctx=None, trace: Optional[PlayTrace] = None
+    ) -> bool:
+        """佇列加入歌曲後呼叫：沒有在播放時開始播放下一首並回傳 True
+
+        實際的播放由伺服器的播放控制任務執行，同時多次呼叫也只會播放一次。
+        trace 為 /play 的階段計時，會一路記錄到第一個音訊封包送出為止。
+        """
+        return await self.playback(guild_id).enqueue(ctx, trace)
+
+    async def start_next(
+        self, guild_id: int, ctx, trace: Optional[PlayTrace], token: int
+    ) -> str:
+        """播放下一首歌曲（只由播放控制任務呼叫），回傳 playback_actor 的結果
+
+        失敗時不再遞迴：回傳 FAILED，由播放控制任務退避後再播放下一首。
         """
         # 獲取伺服器的佇列
         queue = self.get_queue(guild_id)
-        if not queue:
-            self.logger.error(f"找不到 guild_id {guild_id} 的佇列")
-            return
 
         # 輸出佇列狀態
         self.logger.info(
@@ -620,7 +1456,7 @@ class Music(commands.Cog):
         guild = self.bot.get_guild(guild_id)
         if not guild:
             self.logger.error(f"找不到伺服器 ID: {guild_id}")
-            return
+            return NO_VOICE
 
         # 檢查並嘗試恢復語音客戶端
         if not queue.voice_client:
@@ -641,62 +1477,94 @@ class Music(commands.Cog):
                         await self._send_response(ctx, "與語音頻道的連接已丟失，請重新加入並使用 `/play` 指令。", ephemeral=True)
                     except:
                         pass
-                return
+                if trace:
+                    self.finish_trace(trace, "no_voice")
+                return NO_VOICE
+
 
         next_song = queue.get_next()
+        if not next_song and queue.loop and queue.current:
+            # 循環播放：佇列播完後重新加入目前的歌曲
+            self.logger.info("佇列為空，但已開啟循環播放")
+            queue.add(queue.current)
+            next_song = queue.get_next()
+
         if next_song:
+            use_node = isinstance(queue.voice_client, NodeVoiceClient)
             try:
                 self.logger.info(f"準備播放: {next_song['title']} ({next_song['url']})")
 
-                # 獲取音訊 URL
-                audio_info = await self.get_audio_url(next_song["url"])
-                if not audio_info:
-                    raise Exception("無法獲取音訊 URL")
-
-                self.logger.info("成功獲取音訊 URL")
-
-                # 播放音訊
-                FFMPEG_OPTIONS = {
-                    "before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
-                    "options": "-vn",
-                }
-
-                source = await discord.FFmpegOpusAudio.from_probe(
-                    audio_info["url"], **FFMPEG_OPTIONS
+                # 從中斷的位置繼續（離開頻道、斷線或重新啟動前記下的位置）
+                start_at = queue.position_offset
+                source, title = await self._open_track(
+                    guild_id, next_song, start_at, use_node=use_node, trace=trace
                 )
-
                 self.logger.info("成功創建音訊源")
 
-                # 使用改進的回調函數，確保能夠識別特定的伺服器
-                queue.voice_client.play(
-                    source, after=self.after_playing_callback(guild_id)
-                )
+                if trace:
+                    trace.mark("source")
+
+                def on_first_packet():
+                    queue.mark_started(start_at)
+                    if trace:
+                        self._on_first_packet(trace)
+
+                if queue.voice_client.is_playing():
+                    # 不屬於任何播放編號的殘留音軌（例如準備中被取消的歌曲）
+                    self.logger.warning(f"停止殘留的音軌 (伺服器 ID: {guild_id})")
+                    self.stop_voice(guild_id)
+
+                # 回調帶有這首歌的編號，跳過或停止後才送達的結束事件會被忽略
+                after = self.after_playing_callback(guild_id, token)
+                if use_node:
+                    # 節點送出第一個封包時回報 track_start
+                    queue.voice_client.play(
+                        source,
+                        after=after,
+                        on_start=on_first_packet,
+                    )
+                else:
+                    source = FirstPacketSource(
+                        source, asyncio.get_running_loop(), on_first_packet
+                    )
+                    queue.voice_client.play(source, after=after)
                 queue.is_playing = True
+                self.idle_scheduler.cancel(guild_id)
+                self._record_track_gap(guild_id, queue)
 
                 self.logger.info(f"開始播放音訊 (伺服器 ID: {guild_id})")
 
+                # 趁目前歌曲播放時預先解析接下來的歌曲
+                self.schedule_prefetch(guild_id)
+
                 if ctx:
                     embed = discord.Embed(
                         title="🎵 正在播放",
-                        description=audio_info["title"],
+                        description=title,
                         color=discord.Color.green(),
                     )
                     try:
                         await self._send_response(ctx, embed=embed)
                     except:
                         pass
+                return PLAYING
 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 error_msg = str(e)
                 self.logger.error(
                     f"處理下一首歌曲時發生錯誤: {type(e).__name__}: {error_msg}"
                 )
+                if trace:
+                    trace.tag(error=type(e).__name__)
+                    self.finish_trace(trace, "error")
+                # 快取的串流網址可能已失效，下次重新解析
+                self.stream_cache.invalidate(extract_video_id(next_song["url"]))
                 
-                # 檢查是否是不可播放的影片（DRM 保護、地區限制等）
-                if any(keyword in error_msg for keyword in [
-                    "DRM_PROTECTED", "REGION_BLOCKED", "PRIVATE_VIDEO", "VIDEO_DELETED", "VIDEO_UNAVAILABLE",
-                    "DRM protected", "not available", "private video", "deleted"
-                ]):
+                # 檢查是否是不可播放的影片（DRM 保護、地區限制等）；
+                # 其他錯誤（例如暫時找不到格式）不搜尋替代影片，以免換掉使用者選的歌曲
+                if isinstance(e, VideoUnplayableError) or classify_unplayable(error_msg):
                     self.logger.info(f"影片無法播放，嘗試搜尋替代選項: {next_song['title']}")
                     if ctx:
                         try:
@@ -713,7 +1581,8 @@ class Music(commands.Cog):
                             search_terms = search_terms.replace(remove_term, '').strip()
                         
                         # 搜尋替代影片
-                        search_results = await self._search_youtube_with_retry(f"{search_terms} audio")
+                        search_response = await self._search_youtube_with_retry(f"{search_terms} audio")
+                        search_results = self._parse_search_results(search_response)
                         if search_results:
                             # 找到替代影片，加入到佇列前面
                             alternative_found = False
@@ -726,7 +1595,7 @@ class Music(commands.Cog):
                                         'requester': '系統自動搜尋'
                                     }
                                     # 將替代影片插入佇列最前面
-                                    queue.queue.insert(0, video_info)
+                                    queue.add_to_front(video_info)
                                     self.logger.info(f"找到替代影片: {video['title']}")
                                     if ctx:
                                         try:
@@ -756,36 +1625,45 @@ class Music(commands.Cog):
                             except:
                                 pass
                     
-                    # 繼續播放下一首（可能是新找到的替代影片）
-                    await asyncio.sleep(1)  # 短暫延遲
-                    await self.play_next(guild_id, ctx)
                 else:
                     if ctx:
                         try:
                             await self._send_response(ctx, f"播放時發生錯誤：{type(e).__name__}: {error_msg}", ephemeral=True)
                         except:
                             pass
-                    # 如果出錯，嘗試播放下一首
-                    await self.play_next(guild_id, ctx)
-        else:
-            if queue.loop:
-                self.logger.info("佇列為空，但已開啟循環播放")
-                # 如果開啟了循環播放，重新將當前歌曲加入佇列
-                if queue.current:
-                    queue.add(queue.current)
-                    await self.play_next(guild_id, ctx)
-            else:
-                self.logger.info("佇列為空且未開啟循環播放")
-                queue.is_playing = False
-                if ctx:
-                    try:
-                        await self._send_response(ctx, "播放完畢！", ephemeral=True)
-                    except:
-                        pass
+                # 由播放控制任務退避後播放下一首（可能是新找到的替代影片）
+                return FAILED
+
+        self.logger.info("佇列為空且未開啟循環播放")
+        queue.is_playing = False
+        self.refresh_idle(guild_id)
+        if trace:
+            self.finish_trace(trace, "empty")
+        if ctx:
+            try:
+                await self._send_response(ctx, "播放完畢！", ephemeral=True)
+            except:
+                pass
+        return FINISHED
+
+    async def _check_play_rate(self, ctx: commands.Context) -> bool:
+        """套用每位使用者的速率限制；超過時回覆並回傳 False"""
+        retry_after = self.play_limiter.acquire(ctx.author.id)
+        if retry_after <= 0:
+            return True
+        self.logger.info(
+            f"使用者 {ctx.author.id} 請求過於頻繁，{retry_after:.0f} 秒後可再使用 (伺服器 ID: {ctx.guild.id})"
+        )
+        await self._send_response(
+            ctx, f"⏳ 點歌太頻繁了，請在 {max(1, round(retry_after))} 秒後再試。", ephemeral=True
+        )
+        return False
 
     @commands.hybrid_command(name="play", description="播放音樂")
     async def play(self, ctx: commands.Context, *, query: str):
         """播放音樂"""
+        trace = PlayTrace(ctx.guild.id, query)
+
         # 延遲回應，給更多時間處理
         try:
             await ctx.defer()
@@ -793,45 +1671,30 @@ class Music(commands.Cog):
             # 如果互動已過期，嘗試直接回覆
             self.logger.warning("Discord 互動已過期，嘗試直接回覆")
             return
+        trace.mark("defer")
 
-        # 檢查是否已經連接到語音頻道
-        if not await self.ensure_voice_connected(ctx):
+        if not await self._check_play_rate(ctx):
             return
 
-        try:
-            # 使用帶重試機制的 YouTube API 搜尋
-            search_response = await self._search_youtube_with_retry(query)
-
-            if not search_response or not search_response.get("items"):
-                await self._send_response(ctx, "找不到相關影片。", ephemeral=True)
+        # 播放清單／合輯網址：逐批匯入佇列，不經過關鍵字搜尋
+        if is_playlist_url(query):
+            if not await self.ensure_voice_connected(ctx):
                 return
+            trace.mark("voice_connect")
+            await self._start_playlist_import(ctx, query)
+            # 匯入在背景進行，第一首的播放不經過這次請求的計時
+            trace.mark("import")
+            self.finish_trace(trace, "import")
+            return
 
-            self.logger.info(
-                f"使用 YouTube API 搜尋到 {len(search_response['items'])} 個影片"
-            )
-
-            # 創建搜尋結果列表
-            videos = []
-            for item in search_response["items"]:
-                try:
-                    # 檢查 item["id"] 是否包含 videoId
-                    if isinstance(item["id"], dict) and "videoId" in item["id"]:
-                        video_id = item["id"]["videoId"]
-                    elif isinstance(item["id"], str):
-                        video_id = item["id"]
-                    else:
-                        self.logger.warning(f"無法獲取 videoId: {item}")
-                        continue
-                    
-                    video_title = item["snippet"]["title"]
-                    video_url = f"https://www.youtube.com/watch?v={video_id}"
-                    videos.append({"title": video_title, "url": video_url})
-                except KeyError as e:
-                    self.logger.error(f"解析搜尋結果時發生錯誤: {e}, item: {item}")
-                    continue
+        try:
+            # 語音連線與搜尋同時進行，任一方失敗時另一方會被取消
+            videos = await self._prepare_play(ctx, query, trace)
+            if videos is None:
+                return
 
-            if not videos:
-                await self._send_response(ctx, "找不到可播放的影片。", ephemeral=True)
+            if self.instant_play.get(ctx.guild.id):
+                await self._play_instantly(ctx, videos, trace)
                 return
 
             # 創建嵌入式消息顯示搜索結果
@@ -849,9 +1712,10 @@ class Music(commands.Cog):
                 )
 
             # 創建並發送選擇視圖
-            view = SongSelectView(videos, self, ctx)
+            view = SongSelectView(videos, self, ctx, trace=trace)
             message = await self._send_response(ctx, embed=embed, view=view)
             view.message = message  # 保存消息引用以便稍後更新
+            trace.mark("results")  # 從延遲回應到搜尋結果顯示
 
         except discord.errors.NotFound:
             self.logger.error("Discord 互動已過期，無法回應")
@@ -862,18 +1726,275 @@ class Music(commands.Cog):
             except discord.errors.NotFound:
                 self.logger.error("無法發送錯誤回應，互動已過期")
 
+    async def _play_instantly(
+        self, ctx: commands.Context, videos: List[Dict[str, str]], trace: PlayTrace
+    ):
+        """立即播放模式：不顯示選擇畫面，直接加入第一個搜尋結果"""
+        song = videos[0]
+        self.cancel_speculative(ctx.guild.id, videos, keep=song["id"])
+        trace.mark("results")
+        trace.tag(instant_play=True)
+        if not await self.enqueue_song(ctx.guild.id, ctx, song, trace=trace):
+            embed = discord.Embed(
+                title="🎵 已加入播放佇列",
+                description=song["title"],
+                color=discord.Color.green(),
+            )
+            await self._send_response(ctx, embed=embed)
+
+    async def enqueue_song(
+        self,
+        guild_id: int,
+        ctx: commands.Context,
+        song: Dict[str, str],
+        trace: Optional[PlayTrace] = None,
+    ) -> bool:
+        """將選好的歌曲加入佇列；沒有正在播放時開始播放並回傳 True"""
+        self.get_queue(guild_id).add(song)
+        self.schedule_prefetch(guild_id)
+        return await self.play_next(guild_id, ctx, trace=trace)
+
+    async def _prepare_play(
+        self, ctx: commands.Context, query: str, trace: PlayTrace
+    ) -> Optional[List[Dict[str, str]]]:
+        """同時連線語音頻道與搜尋，回傳搜尋結果
+
+        兩者放在同一個 TaskGroup 中：連線失敗會取消搜尋與搜尋結果的預先解析，
+        搜尋失敗則取消連線，並離開這次才加入的語音頻道。
+        失敗時已回覆使用者並回傳 None；非預期的錯誤會重新拋出。
+        """
+        guild = ctx.guild
+        was_connected = guild.voice_client is not None
+
+        async def connect():
+            started = time.perf_counter()
+            connected = await self.ensure_voice_connected(ctx)
+            trace.record("voice_connect", time.perf_counter() - started)
+            if not connected:
+                raise PlayAborted()  # ensure_voice_connected 已回覆錯誤訊息
+
+        speculated: List[Dict[str, str]] = []  # 這次搜尋開始預先解析的結果
+
+        async def search():
+            started = time.perf_counter()
+            search_response = await self._search_youtube_with_retry(query)
+            if not search_response or not search_response.get("items"):
+                raise PlayAborted("找不到相關影片。")
+            self.logger.info(
+                f"使用 YouTube API 搜尋到 {len(search_response['items'])} 個影片"
+            )
+            videos = self._parse_search_results(search_response)
+            if not videos:
+                raise PlayAborted("找不到可播放的影片。")
+            trace.record("search", time.perf_counter() - started)
+            # 語音連線可能還在進行，先解析最可能被選中的前幾個結果
+            speculated.extend(videos[: max(SPECULATIVE_RESULTS, 0)])
+            self.start_speculative(guild.id, speculated)
+            return videos
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                group.create_task(connect())
+                search_task = group.create_task(search())
+            return search_task.result()
+        except* Exception as failed:
+            # 兩者都失敗時優先回報已知原因
+            error = next(
+                (e for e in failed.exceptions if isinstance(e, PlayAborted)),
+                failed.exceptions[0],
+            )
+
+        # 任一方失敗：清除另一方已完成的部分（只取消這次搜尋的預先解析，
+        # 同一伺服器其他人的搜尋結果可能還在等待選擇）
+        if speculated:
+            self.cancel_speculative(guild.id, speculated)
+        voice_client = guild.voice_client
+        if not was_connected and voice_client is not None:
+            try:
+                await voice_client.disconnect(force=True)
+            except Exception as e:
+                self.logger.error(f"取消語音連接時發生錯誤: {str(e)}")
+        if isinstance(error, PlayAborted):
+            if error.message:
+                await self._send_response(ctx, error.message, ephemeral=True)
+            return None
+        raise error
+
+    async def _start_playlist_import(self, ctx: commands.Context, url: str):
+        """開始匯入播放清單（同一伺服器同時只進行一個匯入）"""
+        guild_id = ctx.guild.id
+        previous = self.import_tasks.get(guild_id)
+        if previous and not previous.done():
+            await self._send_response(
+                ctx, "正在匯入另一個播放清單，請稍後再試。", ephemeral=True
+            )
+            return
+
+        embed = discord.Embed(
+            title="📥 正在匯入播放清單",
+            description="正在讀取播放清單內容...",
+            color=discord.Color.blue(),
+        )
+        message = await self._send_response(ctx, embed=embed)
+        task = asyncio.create_task(self._import_playlist(ctx, url, message))
+        self.import_tasks[guild_id] = task
+
+    async def _import_playlist(self, ctx: commands.Context, url: str, message):
+        """逐批將播放清單加入佇列，並在同一則訊息上更新進度"""
+        guild_id = ctx.guild.id
+        queue = self.get_queue(guild_id)
+        title = "播放清單"
+        imported = 0
+        last_edit = 0.0
+
+        async def update_progress(description, color, final=False):
+            nonlocal last_edit
+            # 限制編輯頻率，避免觸發 Discord 速率限制
+            if not final and time.monotonic() - last_edit < 2:
+                return
+            last_edit = time.monotonic()
+            try:
+                await message.edit(
+                    embed=discord.Embed(
+                        title=f"📥 {title}", description=description, color=color
+                    )
+                )
+            except Exception as e:
+                self.logger.warning(f"更新匯入進度時發生錯誤: {str(e)}")
+
+        try:
+            async for event in iter_playlist_chunks(
+                url,
+                chunk_size=PLAYLIST_IMPORT_CHUNK_SIZE,
+                max_entries=PLAYLIST_IMPORT_MAX_TRACKS,
+            ):
+                if event["type"] == "info":
+                    title = event["title"]
+                    continue
+
+                for song in event["songs"]:
+                    song["requester"] = ctx.author.display_name
+                queue.extend(event["songs"])
+                imported += len(event["songs"])
+                self.schedule_prefetch(guild_id)
+
+                # 第一批加入後立即開始播放，不等待列舉完成（正在播放時不會重複開始）
+                await self.play_next(guild_id, ctx)
+
+                await update_progress(
+                    f"已匯入 {imported} 首歌曲，繼續讀取中...", discord.Color.blue()
+                )
+
+            if not imported:
+                self.logger.warning(f"播放清單沒有可匯入的歌曲: {url} (伺服器 ID: {guild_id})")
+                await update_progress(
+                    "❌ 匯入失敗：找不到播放清單中的歌曲，請確認網址是否正確。",
+                    discord.Color.red(),
+                    final=True,
+                )
+                return
+            await update_progress(
+                f"✅ 已匯入 {imported} 首歌曲", discord.Color.green(), final=True
+            )
+            self.logger.info(f"播放清單匯入完成: {title} ({imported} 首, 伺服器 ID: {guild_id})")
+        except asyncio.CancelledError:
+            await update_progress(
+                f"⏹️ 已取消匯入（已加入 {imported} 首）", discord.Color.orange(), final=True
+            )
+            raise
+        except Exception as e:
+            self.logger.error(f"匯入播放清單時發生錯誤: {str(e)}")
+            await update_progress(
+                f"❌ 匯入失敗（已加入 {imported} 首）：{str(e)[:200]}",
+                discord.Color.red(),
+                final=True,
+            )
+        finally:
+            if self.import_tasks.get(guild_id) is asyncio.current_task():
+                del self.import_tasks[guild_id]
+
+    def cancel_import(self, guild_id: int):
+        """取消伺服器進行中的播放清單匯入"""
+        task = self.import_tasks.pop(guild_id, None)
+        if task:
+            task.cancel()
+
     @commands.hybrid_command(name="skip", description="跳過當前歌曲")
     async def skip(self, ctx: commands.Context):
         """跳過當前歌曲"""
         await ctx.defer()
 
         queue = self.get_queue(ctx.guild.id)
-        if queue.voice_client and queue.voice_client.is_playing():
-            queue.voice_client.stop()
+        if queue.voice_client and await self.playback(ctx.guild.id).skip():
             await self._send_response(ctx, "已跳過當前歌曲！", ephemeral=True)
         else:
             await self._send_response(ctx, "目前沒有正在播放的歌曲。", ephemeral=True)
 
+    async def seek_current(self, guild_id: int, position: float) -> float:
+        """從指定位置重新開啟目前的歌曲（不觸發播放完畢的回調），回傳實際位置"""
+        queue = self.get_queue(guild_id)
+        voice_client = queue.voice_client
+        if isinstance(voice_client, NodeVoiceClient):
+            position = await voice_client.seek(position)
+            queue.mark_started(position)
+            return position
+
+        song = queue.current
+        source, _ = await self._open_track(guild_id, song, position)
+        if queue.current is not song or not voice_client.is_playing():
+            # 解析期間歌曲已結束或被跳過
+            source.cleanup()
+            raise discord.ClientException("Track changed while seeking.")
+
+        queue.position_offset = position
+        queue.position_started = None
+        old_source = voice_client.source
+        # AudioPlayer 直接換掉音訊源，不會呼叫 after
+        voice_client.source = FirstPacketSource(
+            source, asyncio.get_running_loop(), lambda: queue.mark_started(position)
+        )
+        if old_source:
+            # 播放執行緒可能正在讀取舊的音訊源，稍後再結束它的 FFmpeg
+            asyncio.get_running_loop().call_later(1, old_source.cleanup)
+        return position
+
+    @commands.hybrid_command(name="seek", description="跳到目前歌曲的指定時間（例如 90、1:30、+15、-10）")
+    async def seek(self, ctx: commands.Context, position: str):
+        """跳到目前歌曲的指定時間；+N / -N 為相對於目前的位置"""
+        await ctx.defer()
+
+        queue = self.get_queue(ctx.guild.id)
+        voice_client = queue.voice_client
+        if not (voice_client and voice_client.is_playing() and queue.current):
+            await self._send_response(ctx, "目前沒有正在播放的歌曲。", ephemeral=True)
+            return
+
+        text = position.strip()
+        seconds = parse_timestamp(text.lstrip("+-"))
+        if seconds is None:
+            await self._send_response(
+                ctx, "時間格式錯誤，請使用秒數或 分:秒（例如 90、1:30、+15、-10）。", ephemeral=True
+            )
+            return
+        if text.startswith("+"):
+            seconds = queue.elapsed() + seconds
+        elif text.startswith("-"):
+            seconds = queue.elapsed() - seconds
+        seconds = max(0.0, seconds)
+        if queue.current_duration and seconds >= queue.current_duration:
+            await self._send_response(
+                ctx, f"超過歌曲長度（{format_timestamp(queue.current_duration)}）。", ephemeral=True
+            )
+            return
+
+        try:
+            seconds = await self.seek_current(ctx.guild.id, seconds)
+        except Exception as e:
+            self.logger.error(f"跳轉播放位置時發生錯誤: {type(e).__name__}: {str(e)}")
+            await self._send_response(ctx, "跳轉失敗，請稍後再試。", ephemeral=True)
+            return
+        await self._send_response(ctx, f"⏩ 已跳到 {format_timestamp(seconds)}", ephemeral=True)
+
     @commands.hybrid_command(name="loop", description="切換循環播放模式")
     async def loop(self, ctx: commands.Context):
         """切換循環播放模式"""
@@ -892,6 +2013,7 @@ class Music(commands.Cog):
         if queue.voice_client:
             try:
                 # 先停止播放
+                await self.stop_playback(ctx.guild.id)
                 if queue.voice_client.is_playing():
                     queue.voice_client.stop()
 
@@ -903,6 +2025,9 @@ class Music(commands.Cog):
             finally:
                 # 無論如何都清空佇列
                 queue.clear()
+                self.cancel_import(ctx.guild.id)
+                self.cancel_prefetch(ctx.guild.id)
+                self.idle_scheduler.cancel(ctx.guild.id)
 
             await self._send_response(ctx, "已停止播放並清空佇列！", ephemeral=True)
         else:
@@ -922,8 +2047,14 @@ class Music(commands.Cog):
             return
 
         try:
-            # 停止當前播放
+            # 記下播放位置並把目前的歌曲放回佇列，重新加入時從這裡繼續；
+            # 先解除佇列與語音客戶端的關聯，停止播放的回調才不會接著播放下一首
             voice_client = queue.voice_client or guild.voice_client
+            queue.interrupt()
+            queue.voice_client = None
+            await self.stop_playback(ctx.guild.id)
+
+            # 停止當前播放
             if voice_client and voice_client.is_playing():
                 voice_client.stop()
                 self.logger.info(f"已停止播放 (伺服器 ID: {ctx.guild.id})")
@@ -933,9 +2064,7 @@ class Music(commands.Cog):
                 await voice_client.disconnect(force=True)
                 self.logger.info(f"已離開語音頻道 (伺服器 ID: {ctx.guild.id})")
 
-            # 更新佇列狀態但不清空
-            queue.is_playing = False
-            queue.voice_client = None
+            self.idle_scheduler.cancel(ctx.guild.id)
 
             await self._send_response(ctx, "已離開語音頻道！佇列保留。", ephemeral=True)
         except Exception as e:
@@ -971,61 +2100,464 @@ class Music(commands.Cog):
 
         # 如果正在播放，顯示目前播放時間
         if queue.voice_client and queue.voice_client.is_playing():
+            embed.add_field(
+                name="播放進度", value=self._format_progress(queue), inline=False
+            )
             embed.set_footer(
                 text=f"使用 /skip 跳過當前歌曲 | /stop 停止播放 | /leave 離開頻道"
             )
 
         await self._send_response(ctx, embed=embed)
 
-    @tasks.loop(seconds=30)
-    async def check_voice_activity(self):
-        """定期檢查機器人是否在空語音頻道中，如果是則自動離開"""
+    @staticmethod
+    def _format_progress(queue: MusicQueue, width: int = 20) -> str:
+        elapsed = queue.elapsed()
+        duration = queue.current_duration
+        if not duration:
+            return f"{format_timestamp(elapsed)} / 未知"
+        filled = min(width, int(elapsed / duration * width))
+        bar = "▬" * filled + "🔘" + "▬" * (width - filled)
+        return f"{bar}\n{format_timestamp(elapsed)} / {format_timestamp(duration)}"
+
+    @commands.hybrid_command(name="remove", description="從佇列中移除指定位置的歌曲")
+    async def remove(self, ctx: commands.Context, position: int):
+        """從佇列中移除歌曲（位置從 1 開始，與 /queue 顯示一致）"""
+        await ctx.defer()
+
+        queue = self.get_queue(ctx.guild.id)
+        try:
+            song = queue.remove(position - 1)
+        except IndexError:
+            await self._send_response(
+                ctx, f"請輸入 1-{len(queue.queue)} 之間的位置！", ephemeral=True
+            )
+            return
+
+        self.schedule_prefetch(ctx.guild.id)
+        await self._send_response(ctx, f"🗑️ 已從佇列移除：{song['title']}", ephemeral=True)
+
+    @commands.hybrid_command(name="move", description="移動佇列中歌曲的位置")
+    async def move(self, ctx: commands.Context, source: int, target: int):
+        """將歌曲從 source 移動到 target（位置從 1 開始）"""
+        await ctx.defer()
+
+        queue = self.get_queue(ctx.guild.id)
         try:
-            for guild in self.bot.guilds:
-                # 檢查機器人是否在該伺服器的語音頻道中
-                voice_client = guild.voice_client
-                if not voice_client or not voice_client.is_connected():
-                    continue
+            song = queue.move(source - 1, target - 1)
+        except IndexError:
+            await self._send_response(
+                ctx, f"請輸入 1-{len(queue.queue)} 之間的位置！", ephemeral=True
+            )
+            return
 
-                # 獲取佇列
-                queue = self.get_queue(guild.id)
+        self.schedule_prefetch(ctx.guild.id)
+        await self._send_response(
+            ctx, f"↕️ 已將 {song['title']} 移到第 {target} 首", ephemeral=True
+        )
 
-                # 檢查頻道是否只有機器人一人
-                voice_channel = voice_client.channel
-                human_members = [m for m in voice_channel.members if not m.bot]
+    @commands.hybrid_command(name="shuffle", description="隨機打亂佇列順序")
+    async def shuffle(self, ctx: commands.Context):
+        """隨機打亂佇列順序"""
+        await ctx.defer()
 
-                # 如果頻道中沒有人類成員，或閒置超過5分鐘，則離開
-                if (not human_members) or (
-                    not voice_client.is_playing()
-                    and queue.last_updated
-                    and datetime.now() - queue.last_updated > timedelta(minutes=5)
-                ):
-                    self.logger.info(
-                        f"檢測到空語音頻道或閒置超時，自動離開 (伺服器: {guild.id})"
-                    )
+        queue = self.get_queue(ctx.guild.id)
+        if len(queue.queue) < 2:
+            await self._send_response(ctx, "佇列中的歌曲不足以打亂。", ephemeral=True)
+            return
 
-                    try:
-                        # 停止播放並離開
-                        if voice_client.is_playing():
-                            voice_client.stop()
-                        await voice_client.disconnect(force=True)
-
-                        # 更新佇列狀態
-                        queue.is_playing = False
-                        queue.voice_client = None
-                    except Exception as e:
-                        self.logger.error(f"自動離開語音頻道時發生錯誤: {str(e)}")
+        queue.shuffle()
+        self.schedule_prefetch(ctx.guild.id)
+        await self._send_response(
+            ctx, f"🔀 已打亂 {len(queue.queue)} 首歌曲的順序！", ephemeral=True
+        )
+
+    @commands.hybrid_group(name="playlist", description="管理已儲存的歌單")
+    async def playlist(self, ctx: commands.Context):
+        """歌單指令群組"""
+        if ctx.invoked_subcommand is None:
+            await self._send_response(
+                ctx, "請使用 `/playlist save|load|list|delete`", ephemeral=True
+            )
+
+    def _playlist_owner(self, ctx: commands.Context, scope: str) -> str:
+        owner_id = ctx.author.id if scope == "user" else ctx.guild.id
+        return owner_key(scope, owner_id)
+
+    @playlist.command(name="save", description="將目前的佇列儲存為歌單")
+    async def playlist_save(
+        self,
+        ctx: commands.Context,
+        name: str,
+        scope: Literal["guild", "user"] = "guild",
+    ):
+        """將正在播放的歌曲與佇列儲存為歌單（只儲存影片 ID 與標題）"""
+        await ctx.defer(ephemeral=True)
+
+        queue = self.get_queue(ctx.guild.id)
+        songs = ([queue.current] if queue.current else []) + list(queue.queue)
+
+        tracks = []
+        for song in songs:
+            video_id = extract_video_id(song.get("url", ""))
+            if video_id:
+                tracks.append({"id": video_id, "title": song.get("title", video_id)})
+            if len(tracks) >= PLAYLIST_MAX_TRACKS:
+                break
+
+        if not tracks:
+            await self._send_response(ctx, "佇列中沒有可儲存的歌曲。", ephemeral=True)
+            return
+
+        await self.playlists.save(self._playlist_owner(ctx, scope), name, tracks)
+        await self._send_response(
+            ctx, f"💾 已儲存歌單「{name}」，共 {len(tracks)} 首歌曲", ephemeral=True
+        )
+
+    @playlist.command(name="load", description="將歌單加入播放佇列")
+    async def playlist_load(
+        self,
+        ctx: commands.Context,
+        name: str,
+        scope: Literal["guild", "user"] = "guild",
+    ):
+        """載入歌單：立即加入佇列，音訊 URL 於播放前才解析"""
+        await ctx.defer()
+        if not await self._check_play_rate(ctx):
+            return
+
+        tracks = await self.playlists.load(self._playlist_owner(ctx, scope), name)
+        if tracks is None:
+            await self._send_response(ctx, f"找不到歌單「{name}」。", ephemeral=True)
+            return
+
+        if not await self.ensure_voice_connected(ctx):
+            return
+
+        queue = self.get_queue(ctx.guild.id)
+        queue.extend(
+            {
+                "title": track["title"],
+                "url": f"https://www.youtube.com/watch?v={track['id']}",
+                "requester": ctx.author.display_name,
+            }
+            for track in tracks
+        )
+        self.schedule_prefetch(ctx.guild.id)
+
+        await self._send_response(
+            ctx, f"📂 已將歌單「{name}」的 {len(tracks)} 首歌曲加入佇列"
+        )
+        await self.play_next(ctx.guild.id, ctx)
+
+    @playlist.command(name="list", description="列出已儲存的歌單")
+    async def playlist_list(
+        self, ctx: commands.Context, scope: Literal["guild", "user"] = "guild"
+    ):
+        """列出歌單（只讀取索引）"""
+        await ctx.defer(ephemeral=True)
+
+        playlists = await self.playlists.list(self._playlist_owner(ctx, scope))
+        if not playlists:
+            await self._send_response(ctx, "目前沒有已儲存的歌單。", ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title="📂 伺服器歌單" if scope == "guild" else "📂 我的歌單",
+            color=discord.Color.blue(),
+        )
+        for name, entry in list(playlists.items())[:25]:
+            embed.add_field(
+                name=name,
+                value=f"{entry['count']} 首歌曲 | 更新於 {entry['updated']}",
+                inline=False,
+            )
+        await self._send_response(ctx, embed=embed, ephemeral=True)
+
+    @playlist.command(name="delete", description="刪除已儲存的歌單")
+    async def playlist_delete(
+        self,
+        ctx: commands.Context,
+        name: str,
+        scope: Literal["guild", "user"] = "guild",
+    ):
+        """刪除歌單"""
+        await ctx.defer(ephemeral=True)
+
+        if await self.playlists.delete(self._playlist_owner(ctx, scope), name):
+            await self._send_response(ctx, f"🗑️ 已刪除歌單「{name}」", ephemeral=True)
+        else:
+            await self._send_response(ctx, f"找不到歌單「{name}」。", ephemeral=True)
+
+    @commands.hybrid_command(name="idletimeout", description="設定閒置多久後自動離開語音頻道")
+    async def idle_timeout(self, ctx: commands.Context, minutes: Optional[int] = None):
+        """設定本伺服器的閒置逾時（分鐘），不指定時恢復預設值"""
+        if not ctx.author.guild_permissions.manage_guild:
+            await self._send_response(ctx, "你沒有權限使用此指令！", ephemeral=True)
+            return
+        if minutes is not None and not 1 <= minutes <= 1440:
+            await self._send_response(ctx, "逾時必須介於 1 到 1440 分鐘之間。", ephemeral=True)
+            return
+
+        await self.idle_settings.set(
+            ctx.guild.id, minutes * 60 if minutes is not None else None
+        )
+        # 以新的逾時重新排入期限
+        if self.idle_scheduler.reason(ctx.guild.id) == "idle":
+            self.idle_scheduler.cancel(ctx.guild.id)
+        self.refresh_idle(ctx.guild.id)
+
+        current = self.idle_settings.get(ctx.guild.id) / 60
+        await self._send_response(
+            ctx, f"閒置 {current:g} 分鐘後將自動離開語音頻道。", ephemeral=True
+        )
+
+    @commands.hybrid_command(name="instantplay", description="切換立即播放第一個搜尋結果（不顯示選擇畫面）")
+    async def instant_play_command(self, ctx: commands.Context, enabled: Optional[bool] = None):
+        """設定本伺服器的 /play 是否直接播放第一個搜尋結果，不指定時顯示目前設定"""
+        if enabled is not None:
+            if not ctx.author.guild_permissions.manage_guild:
+                await self._send_response(ctx, "你沒有權限使用此指令！", ephemeral=True)
+                return
+            await self.instant_play.set(ctx.guild.id, True if enabled else None)
+
+        if self.instant_play.get(ctx.guild.id):
+            message = "⚡ 立即播放已開啟：/play 會直接播放第一個搜尋結果。"
+        else:
+            message = "立即播放已關閉：/play 會先顯示搜尋結果供選擇。"
+        await self._send_response(ctx, message, ephemeral=True)
+
+    @staticmethod
+    def _format_percentiles(summary: Dict[str, Optional[float]]) -> str:
+        if not summary["count"]:
+            return "尚無資料"
+        return " / ".join(
+            f"{summary[key] * 1000:.0f}" for key in ("p50", "p95", "p99")
+        ) + f" ms（{summary['count']} 次）"
+
+    @commands.hybrid_command(name="musicstats", description="查看音樂系統的延遲統計（管理員）")
+    async def music_stats(self, ctx: commands.Context):
+        """顯示 /play 各階段的 p50/p95/p99 延遲與快取狀態"""
+        if not ctx.author.guild_permissions.manage_guild:
+            await self._send_response(ctx, "你沒有權限使用此指令！", ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title="📊 音樂系統統計",
+            description="/play 到第一個音訊封包的各階段延遲（p50 / p95 / p99）",
+            color=discord.Color.blue(),
+        )
+        stage_names = {
+            "defer": "延遲回應",
+            "voice_connect": "語音連接",
+            "search": "搜尋",
+            "results": "顯示搜尋結果（連接與搜尋並行）",
+            "select": "等待選擇",
+            "extract": "解析音訊",
+            "source": "建立音訊源",
+            "first_packet": "第一個封包",
+            "total": "總計",
+        }
+        for stage, summary in self.play_stage_stats.summary().items():
+            embed.add_field(
+                name=stage_names.get(stage, stage),
+                value=self._format_percentiles(summary),
+                inline=False,
+            )
+        if self.play_stage_stats.outcomes:
+            embed.add_field(
+                name="/play 結果",
+                value=" | ".join(
+                    f"{outcome} {count}"
+                    for outcome, count in self.play_stage_stats.outcomes.most_common()
+                ),
+                inline=False,
+            )
+
+        embed.add_field(
+            name="換歌空檔",
+            value=self._format_percentiles(self.track_gap_stats.summary()),
+            inline=False,
+        )
+
+        stream = self.stream_cache.stats()
+        search = self.search_cache.stats()
+        extractor = self.extractor.stats()
+        embed.add_field(
+            name="快取",
+            value=(
+                f"串流網址 命中率 {stream['hit_rate']:.0%}\n"
+                f"搜尋 命中率 {search['hit_rate']:.0%}（節省 {search['quota_saved']} 配額）"
+                + (
+                    f"\n音訊檔 命中率 {self.audio_cache.stats()['hit_rate']:.0%}"
+                    if self.audio_cache
+                    else ""
+                )
+                + f"\n無法播放影片 {len(self.unplayable)} 筆（略過 {self.unplayable.hits} 次）"
+            ),
+            inline=True,
+        )
+        embed.add_field(
+            name="解析池",
+            value=(
+                f"執行中 {extractor['in_flight']} / 等待中 {extractor['queue_depth']}"
+                + (
+                    f"\nyt-dlp {self.extractor_maintenance.loaded_version}"
+                    if self.extractor_maintenance
+                    else ""
+                )
+                + (
+                    f"（可更新至 {self.extractor_maintenance.available_version}）"
+                    if self.extractor_maintenance and self.extractor_maintenance.available_version
+                    else ""
+                )
+            ),
+            inline=True,
+        )
+
+        scheduling = self.extraction.stats(ctx.guild.id)
+        wait = scheduling["wait"]
+        worst = "、".join(
+            f"{self.bot.get_guild(gid).name if self.bot.get_guild(gid) else gid} "
+            f"{summary['p95'] * 1000:.0f} ms"
+            for gid, summary in scheduling["worst"]
+        )
+        embed.add_field(
+            name="解析排程等待（p50 / p95 / p99）",
+            value=(
+                f"下一首 {self._format_percentiles(wait['next'])}\n"
+                f"佇列預先解析 {self._format_percentiles(wait['prefetch'])}\n"
+                f"搜尋結果 {self._format_percentiles(wait['speculative'])}\n"
+                f"本伺服器 {self._format_percentiles(scheduling['guild']) if scheduling['guild'] else '尚無資料'}\n"
+                f"等待中 {scheduling['queued']}｜提升優先 {scheduling['promoted']}｜"
+                f"拒絕 {scheduling['rejected']}"
+                + (f"\n等待最久 (p95)：{worst}" if worst else "")
+            ),
+            inline=False,
+        )
+
+        if self.audio_node:
+            try:
+                node = await self.audio_node.request("stats")
+                value = (
+                    f"播放中 {node['playing']} / 連線 {node['players']}\n"
+                    f"FFmpeg 行程 {node['ffmpeg_processes']}｜RSS {node['rss_mb']:.0f} MB"
+                )
+            except AudioNodeError as e:
+                value = f"無法取得：{str(e)}"
+            embed.add_field(name="音訊節點", value=value, inline=True)
+
+        await self._send_response(ctx, embed=embed, ephemeral=True)
+
+    @tasks.loop(seconds=1)
+    async def flush_queue_journal(self):
+        """批次將佇列日誌寫入磁碟（在執行緒中寫入，不阻塞事件迴圈）"""
+        # 約每 15 秒記下播放中歌曲的位置，重新啟動後從這裡繼續
+        position_interval = max(1, int(15 / QUEUE_JOURNAL_FLUSH_INTERVAL))
+        if self.flush_queue_journal.current_loop % position_interval == 0:
+            for queue in self.queues.values():
+                if queue.is_playing:
+                    queue.save_position()
+
+        # 約每 5 分鐘將所有有日誌的佇列壓縮為快照
+        interval = max(1, int(300 / QUEUE_JOURNAL_FLUSH_INTERVAL))
+        if self.flush_queue_journal.current_loop % interval == interval - 1:
+            for guild_id in self.queue_store.journaled_guilds():
+                queue = self.queues.get(guild_id)
+                if queue:
+                    self.queue_store.schedule_snapshot(guild_id, queue.snapshot_state())
+
+        if not self.queue_store.pending_count:
+            return
+        try:
+            await asyncio.to_thread(self.queue_store.flush)
+        except Exception as e:
+            self.logger.error(f"寫入佇列日誌時發生錯誤: {str(e)}")
+
+    @tasks.loop(minutes=5)
+    async def flush_search_cache(self):
+        """定期將搜尋快取寫入磁碟（在執行緒中寫入，不阻塞事件迴圈）"""
+        if not self.search_cache.dirty:
+            return
+        try:
+            snapshot = self.search_cache.snapshot()
+            await asyncio.to_thread(self.search_cache.save, snapshot)
+            self.logger.debug(f"已儲存 {len(self.search_cache)} 筆搜尋快取")
+        except Exception as e:
+            self.logger.error(f"儲存搜尋快取時發生錯誤: {str(e)}")
+
+    @tasks.loop(minutes=1)
+    async def flush_unplayable_cache(self):
+        """將無法播放影片的紀錄寫入磁碟（在執行緒中寫入，不阻塞事件迴圈）"""
+        if not self.unplayable.dirty:
+            return
+        try:
+            snapshot = self.unplayable.snapshot()
+            await asyncio.to_thread(self.unplayable.save, snapshot)
         except Exception as e:
-            self.logger.error(f"檢查語音活動時發生錯誤: {str(e)}")
+            self.logger.error(f"儲存無法播放影片紀錄時發生錯誤: {str(e)}")
+
+    @tasks.loop(hours=24)
+    async def maintain_extractor(self):
+        """定期在背景檢查 yt-dlp 更新"""
+        self.extractor_maintenance.request_check("scheduled")
 
-    @check_voice_activity.before_loop
-    async def before_check_voice(self):
-        """在啟動任務前等待機器人準備好"""
+    @maintain_extractor.before_loop
+    async def before_maintain_extractor(self):
         await self.bot.wait_until_ready()
 
     def cog_unload(self):
         """當 Cog 被卸載時清理資源"""
-        self.check_voice_activity.cancel()
+        self.idle_scheduler.stop()
+        for actor in self.playback_actors.values():
+            actor.close()
+
+        # 寫入剩餘的佇列日誌（包含播放中歌曲的位置）
+        if self.queue_store:
+            self.flush_queue_journal.cancel()
+            for queue in self.queues.values():
+                if queue.is_playing:
+                    queue.save_position()
+            try:
+                # flush 與仍在執行緒中進行的寫入共用同一個鎖，會等它寫完再寫入
+                self.queue_store.flush()
+            except Exception as e:
+                self.logger.error(f"寫入佇列日誌時發生錯誤: {str(e)}")
+
+        # 儲存搜尋快取
+        if SEARCH_CACHE_PERSIST:
+            self.flush_search_cache.cancel()
+            try:
+                self.search_cache.save(self.search_cache.snapshot())
+            except Exception as e:
+                self.logger.error(f"儲存搜尋快取時發生錯誤: {str(e)}")
+
+        self.flush_unplayable_cache.cancel()
+        try:
+            self.unplayable.save(self.unplayable.snapshot())
+        except Exception as e:
+            self.logger.error(f"儲存無法播放影片紀錄時發生錯誤: {str(e)}")
+
+        # 取消背景寫入的音訊快取
+        if self.audio_cache:
+            self.audio_cache.cancel_all()
+
+        # 取消所有預先解析與播放清單匯入
+        for guild_id in list(self.import_tasks):
+            self.cancel_import(guild_id)
+        for guild_id in list(self.prefetch_tasks):
+            self.cancel_prefetch(guild_id)
+        for guild_id in list(self.speculative_tasks):
+            self.cancel_speculative(guild_id)
+
+        # 停止 yt-dlp 維護並關閉解析池
+        if self.extractor_maintenance:
+            self.maintain_extractor.cancel()
+            self.extractor_maintenance.cancel()
+        self.extractor.shutdown()
+
+        # 關閉 YouTube 搜尋連線池
+        if self.youtube:
+            self.bot.loop.create_task(self.youtube.close())
 
         # 嘗試關閉所有語音連接
         for guild_id, queue in self.queues.items():
@@ -1035,6 +2567,10 @@ class Music(commands.Cog):
                 except:
                     pass
 
+        # 關閉音訊節點連線（節點會釋放這個行程建立的播放器）
+        if self.audio_node:
+            self.bot.loop.create_task(self.audio_node.close())
+
 
 async def setup(bot):
     await bot.add_cog(Music(bot))
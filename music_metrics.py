@@ -0,0 +1,120 @@
+"""
+音樂系統統計 - 滾動視窗的延遲統計
+"""
+
+import time
+from collections import Counter, deque
+from typing import Dict, Optional
+
+
+class RollingStats:
+    """保留最近 N 筆樣本的滾動統計，用於計算百分位數"""
+
+    def __init__(self, maxlen: int = 500):
+        self.samples = deque(maxlen=maxlen)
+        self.count = 0  # 累計樣本數（不受視窗大小限制）
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """回傳視窗內的第 pct 百分位數，沒有樣本時回傳 None"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": max(self.samples) if self.samples else None,
+        }
+
+
+class PlayTrace:
+    """單次 /play 請求的階段計時
+
+    每次 mark() 記錄距離上一個階段結束的時間，最後由 StageMetrics 彙整。
+    """
+
+    def __init__(self, guild_id: int, query: str = ""):
+        self.guild_id = guild_id
+        self.query = query
+        self.started_at = time.perf_counter()
+        self._last = self.started_at
+        self.stages: Dict[str, float] = {}
+        self.tags: Dict[str, object] = {}
+        self.finished = False
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last)
+        self._last = now
+
+    def record(self, stage: str, seconds: float):
+        """記錄與其他步驟同時進行的階段耗時，不影響 mark() 的計時起點"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def tag(self, **tags):
+        """附加額外資訊（例如快取是否命中）"""
+        self.tags.update(tags)
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started_at
+
+    def to_record(self) -> Dict[str, object]:
+        return {
+            "guild_id": self.guild_id,
+            "query": self.query,
+            "total_ms": round(self.total * 1000, 1),
+            "stages_ms": {k: round(v * 1000, 1) for k, v in self.stages.items()},
+            **self.tags,
+        }
+
+
+class StageMetrics:
+    """各階段的滾動延遲統計"""
+
+    STAGES = (
+        "defer",
+        "voice_connect",
+        "search",
+        "results",
+        "select",
+        "extract",
+        "source",
+        "first_packet",
+    )
+
+    def __init__(self, maxlen: int = 500):
+        self.maxlen = maxlen
+        self.stages: Dict[str, RollingStats] = {}
+        self.total = RollingStats(maxlen)
+        self.outcomes: Counter = Counter()  # 各種結束結果的累計次數（played、import、error…）
+
+    def count(self, outcome: str):
+        self.outcomes[outcome] += 1
+
+    def record(self, trace: PlayTrace):
+        if trace.finished:
+            return
+        trace.finished = True
+        for stage, seconds in trace.stages.items():
+            self.stages.setdefault(stage, RollingStats(self.maxlen)).add(seconds)
+        self.total.add(trace.total)
+
+    def summary(self) -> Dict[str, Dict[str, Optional[float]]]:
+        ordered = [s for s in self.STAGES if s in self.stages]
+        ordered += [s for s in self.stages if s not in self.STAGES]
+        result = {stage: self.stages[stage].summary() for stage in ordered}
+        result["total"] = self.total.summary()
+        return result
@@ -0,0 +1,266 @@
+"""
+播放控制 - 每個伺服器一個任務依序處理播放事件
+
+加入歌曲、跳過、停止與音軌結束都放進同一個信箱，由伺服器自己的任務依序處理，
+不再從按鈕回調、after 回調與錯誤處理同時進入 play_next。
+每首開始播放的歌曲都有一個編號，被跳過或停止的歌曲之後才送達的結束事件會被忽略。
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# start_next 的結果
+PLAYING = "playing"  # 已開始播放
+FINISHED = "finished"  # 佇列已播放完畢
+FAILED = "failed"  # 這首歌無法播放，稍後重試下一首
+NO_VOICE = "no_voice"  # 沒有語音連線
+
+
+class PlaybackActor:
+    """單一伺服器的播放控制任務
+
+    driver 需要提供：
+    - async start_next(guild_id, ctx, trace, token) -> 上述結果之一；
+      開始播放時以 token 建立 after 回調，結束時呼叫 notify_track_end(token, error)
+    - finish_trace(trace, outcome)
+    - stop_voice(guild_id)：跳過時停止目前的音軌
+    - async playback_failed(guild_id, ctx, failures)：連續失敗達上限
+
+    連續失敗時以指數退避排入重試，不遞迴也不佔住信箱；
+    連續 max_failures 首都失敗時停止播放。
+    閒置 idle_exit 秒後任務自行結束，下一個事件送達時再啟動。
+    """
+
+    def __init__(
+        self,
+        guild_id: int,
+        driver,
+        *,
+        max_failures: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+        idle_exit: float = 300.0,
+    ):
+        self.guild_id = guild_id
+        self.driver = driver
+        self.max_failures = max_failures
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.idle_exit = idle_exit
+
+        self.token: Optional[int] = None  # 正在播放的歌曲編號
+        self.failures = 0  # 連續失敗次數
+        self._next_token = 0
+        self._ctx = None  # 最近一次可回覆的 context
+        self._advance: Optional[asyncio.Task] = None
+        self._advance_token: Optional[int] = None
+        self._ended_early = False  # 播放中的歌曲在 start_next 返回前就結束了
+        self._retry: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()  # 背景任務（保留參考，避免被回收）
+        self._mailbox: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def busy(self) -> bool:
+        """正在播放、正在準備下一首或等待重試"""
+        return self.token is not None or self._advance is not None or self._retry is not None
+
+    # ── 對外介面 ──
+
+    async def enqueue(self, ctx=None, trace=None) -> bool:
+        """佇列加入了歌曲；沒有在播放時開始播放並回傳 True"""
+        return await self._request("enqueue", ctx=ctx, trace=trace)
+
+    async def skip(self) -> bool:
+        """跳過目前（或正在準備、等待重試）的歌曲；沒有可跳過的歌曲時回傳 False"""
+        return await self._request("skip")
+
+    async def stop(self):
+        """停止播放：取消正在準備的歌曲與重試，之後送達的結束事件都會被忽略
+
+        語音客戶端由呼叫者停止或斷開。
+        """
+        await self._request("stop")
+
+    def notify_track_end(self, token: int, error: Optional[Exception] = None):
+        """音軌結束（可在語音播放執行緒中呼叫）"""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(
+            self._send, "track_ended", {"token": token, "error": error}, None
+        )
+
+    def close(self):
+        """卸載時停止任務與所有排程"""
+        self._cancel_advance()
+        self._cancel_retry()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    # ── 信箱 ──
+
+    def _request(self, kind: str, **data) -> "asyncio.Future[Any]":
+        future = asyncio.get_running_loop().create_future()
+        self._send(kind, data, future)
+        return future
+
+    def _send(self, kind: str, data: dict, future: Optional[asyncio.Future]):
+        self._mailbox.put_nowait((kind, data, future))
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                if self.busy:
+                    message = await self._mailbox.get()
+                else:
+                    message = await asyncio.wait_for(self._mailbox.get(), self.idle_exit)
+            except asyncio.TimeoutError:
+                if self._mailbox.empty():
+                    return  # 閒置：結束任務，下一個事件送達時再啟動
+                continue
+
+            kind, data, future = message
+            try:
+                result = getattr(self, f"_on_{kind}")(**data)
+            except Exception as e:
+                logger.error(f"處理播放事件 {kind} 時發生錯誤 (伺服器 ID: {self.guild_id}): {str(e)}")
+                if future and not future.done():
+                    future.set_exception(e)
+                continue
+            if future and not future.done():
+                future.set_result(result)
+
+    # ── 事件處理（只在 _run 中執行） ──
+
+    def _on_enqueue(self, ctx, trace) -> bool:
+        if ctx is not None:
+            self._ctx = ctx
+        if self.token is not None or self._advance is not None:
+            if trace:
+                self.driver.finish_trace(trace, "queued")
+            return False
+        if self._retry is not None:
+            # 退避結束後就會播放新加入的歌曲
+            if trace:
+                self.driver.finish_trace(trace, "queued")
+            return True
+        self._start_advance(ctx, trace)
+        return True
+
+    def _on_skip(self) -> bool:
+        if self._advance is not None:
+            # 正在準備的歌曲也算目前的歌曲；它可能已經開始播放
+            self._cancel_advance()
+            self.driver.stop_voice(self.guild_id)
+        elif self.token is not None:
+            self.token = None
+            self.driver.stop_voice(self.guild_id)
+        elif self._retry is None:
+            return False
+        # 退避中（上一首播放失敗、等待重試）也算可跳過：不再等待，立即嘗試下一首
+        self._cancel_retry()
+        self._start_advance(None, None)
+        return True
+
+    def _on_stop(self):
+        self._cancel_advance()
+        self._cancel_retry()
+        self.token = None
+        self.failures = 0
+
+    def _on_track_ended(self, token: int, error: Optional[Exception]):
+        if token == self._advance_token:
+            # start_next 尚未返回歌曲就已結束（極短的音軌或 FFmpeg 立即失敗）
+            self._ended_early = True
+            return
+        if token != self.token:
+            return  # 已被跳過或停止的歌曲
+        self.token = None
+        if error:
+            logger.error(f"播放時發生錯誤 (伺服器 ID: {self.guild_id}): {str(error)}")
+        self._start_advance(None, None)
+
+    def _on_advanced(self, task: asyncio.Task, token: int, outcome: str):
+        if task is not self._advance:
+            return  # 已被取消
+        self._advance = None
+        self._advance_token = None
+        ended_early, self._ended_early = self._ended_early, False
+
+        if outcome == PLAYING:
+            self.failures = 0
+            if ended_early:
+                self._start_advance(None, None)
+            else:
+                self.token = token
+        elif outcome == FAILED:
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                failures, self.failures = self.failures, 0
+                self._spawn(self.driver.playback_failed(self.guild_id, self._ctx, failures))
+                return
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (self.failures - 1))
+            logger.info(
+                f"第 {self.failures} 次連續播放失敗，{delay:g} 秒後播放下一首 (伺服器 ID: {self.guild_id})"
+            )
+            self._retry = self._loop.call_later(delay, self._send, "retry", {}, None)
+        else:
+            self.failures = 0
+
+    def _on_retry(self):
+        self._retry = None
+        if self.token is None and self._advance is None:
+            self._start_advance(self._ctx, None)
+
+    # ── 內部 ──
+
+    def _start_advance(self, ctx, trace):
+        self._next_token += 1
+        token = self._next_token
+        task = asyncio.create_task(self._run_advance(ctx, trace, token))
+        self._advance = task
+        self._advance_token = token
+        self._ended_early = False
+
+    async def _run_advance(self, ctx, trace, token: int):
+        try:
+            outcome = await self.driver.start_next(self.guild_id, ctx, trace, token)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"準備下一首歌曲時發生錯誤 (伺服器 ID: {self.guild_id}): {str(e)}")
+            outcome = FAILED
+        self._send("advanced", {"task": asyncio.current_task(), "token": token, "outcome": outcome}, None)
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                f"播放背景任務發生錯誤 (伺服器 ID: {self.guild_id}): {str(task.exception())}"
+            )
+
+    def _cancel_advance(self):
+        if self._advance is not None:
+            self._advance.cancel()
+            self._advance = None
+            self._advance_token = None
+            self._ended_early = False
+
+    def _cancel_retry(self):
+        if self._retry is not None:
+            self._retry.cancel()
+            self._retry = None
@@ -0,0 +1,127 @@
+"""
+YouTube 播放清單匯入 - 以 yt-dlp extract_flat 逐批列舉播放清單／合輯
+
+列舉在獨立執行緒中進行，每取得 chunk_size 首就交回事件迴圈，
+第一批歌曲可以在列舉完成前就開始播放。這裡只取得影片 ID 與標題，
+完整的音訊解析留到每首歌播放時才進行。
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import yt_dlp
+
+logger = logging.getLogger(__name__)
+
+FLAT_OPTS = {
+    "quiet": True,
+    "no_warnings": True,
+    "extract_flat": "in_playlist",
+    "lazy_playlist": True,
+    "skip_download": True,
+    "nocheckcertificate": True,
+}
+
+MAX_REDIRECTS = 3  # 跟隨 _type 為 url / url_transparent 結果的最大次數
+
+
+def is_playlist_url(query: str) -> bool:
+    """判斷是否為 YouTube 播放清單或合輯（Mix）網址"""
+    try:
+        parsed = urlparse(query.strip())
+    except ValueError:
+        return False
+    if not parsed.netloc or not any(
+        host in parsed.netloc for host in ("youtube.com", "youtu.be")
+    ):
+        return False
+    return bool(parse_qs(parsed.query).get("list"))
+
+
+def _extract_playlist(ydl: yt_dlp.YoutubeDL, url: str) -> Optional[Dict[str, Any]]:
+    """不處理項目地取得播放清單資訊，並跟隨指向真正播放清單的轉址結果
+
+    例如 youtu.be/<影片>?list=<清單> 會先解析為指向播放清單的 url 結果，
+    沒有 entries。
+    """
+    info = ydl.extract_info(url, download=False, process=False)
+    for _ in range(MAX_REDIRECTS):
+        if not info or info.get("_type") not in ("url", "url_transparent"):
+            break
+        info = ydl.extract_info(
+            info["url"], download=False, ie_key=info.get("ie_key"), process=False
+        )
+    return info
+
+
+def _entry_to_song(entry: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    video_id = entry.get("id")
+    if not video_id:
+        return None
+    return {
+        "title": entry.get("title") or video_id,
+        "url": f"https://www.youtube.com/watch?v={video_id}",
+    }
+
+
+async def iter_playlist_chunks(
+    url: str, chunk_size: int = 25, max_entries: int = 500
+) -> AsyncIterator[Dict[str, Any]]:
+    """逐批產生播放清單內容
+
+    產生的事件：
+    - {"type": "info", "title": 播放清單標題}
+    - {"type": "chunk", "songs": [{"title", "url"}, ...]}
+    離開迭代（完成或取消）時會通知背景執行緒停止列舉。
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def emit(event):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def worker():
+        try:
+            with yt_dlp.YoutubeDL(FLAT_OPTS) as ydl:
+                info = _extract_playlist(ydl, url)
+                if not info:
+                    return
+                emit({"type": "info", "title": info.get("title") or "播放清單"})
+
+                chunk: List[Dict[str, str]] = []
+                count = 0
+                for entry in info.get("entries") or []:
+                    if stop.is_set() or count >= max_entries:
+                        break
+                    song = _entry_to_song(entry or {})
+                    if not song:
+                        continue
+                    chunk.append(song)
+                    count += 1
+                    # 第一首立即送出，讓播放可以馬上開始
+                    if count == 1 or len(chunk) >= chunk_size:
+                        emit({"type": "chunk", "songs": chunk})
+                        chunk = []
+                if chunk:
+                    emit({"type": "chunk", "songs": chunk})
+        except Exception as e:
+            emit({"type": "error", "error": e})
+        finally:
+            emit({"type": "done"})
+
+    threading.Thread(target=worker, name="playlist-import", daemon=True).start()
+
+    try:
+        while True:
+            event = await events.get()
+            if event["type"] == "done":
+                return
+            if event["type"] == "error":
+                raise event["error"]
+            yield event
+    finally:
+        stop.set()
@@ -0,0 +1,169 @@
+"""
+歌單儲存 - 伺服器與使用者的已儲存歌單
+
+PLAYLIST_DATA_PATH 作為索引檔，只記錄每個歌單的名稱、歌曲數與資料檔；
+每個歌單的歌曲（影片 ID 與標題）各自存放在獨立的檔案中。
+索引在啟動時載入記憶體，載入歌單只讀取單一歌單檔。
+寫入索引時會先重新讀取磁碟上的索引，叢集模式下多個行程不會互相覆蓋；
+讀取前檢查索引檔的修改時間，其他行程寫入的歌單也會出現。
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def owner_key(scope: str, owner_id: int) -> str:
+    """歌單擁有者的索引鍵，例如 guild:123 或 user:456"""
+    return f"{scope}:{owner_id}"
+
+
+class PlaylistStore:
+    """以索引檔 + 每個歌單一個檔案的方式儲存歌單"""
+
+    def __init__(self, index_path: str, directory: str):
+        self.index_path = index_path
+        self.directory = directory
+        self._lock = asyncio.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index_stamp: Optional[Tuple[int, int]] = None  # 索引檔的 (修改時間, 大小)
+        self.index: Dict[str, Dict[str, Dict[str, Any]]] = self._load_index()
+
+    def _stat_index(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load_index(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        try:
+            self._index_stamp = self._stat_index()
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            logger.info(f"已載入歌單索引：{sum(len(v) for v in data.values())} 個歌單")
+            return data
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.error(f"歌單索引檔案格式錯誤：{self.index_path}")
+            return {}
+
+    def _playlist_path(self, key: str, name: str) -> str:
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{key.replace(':', '_')}_{digest}.json")
+
+    @staticmethod
+    def _write_json(path: str, data: Any):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_json(path: str) -> Any:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _update_index(
+        self, key: str, name: str, entry: Optional[Dict[str, Any]], fallback
+    ) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """以磁碟上最新的索引為基礎更新單一歌單並寫回（在執行緒中執行）"""
+        try:
+            index = self._read_json(self.index_path)
+        except FileNotFoundError:
+            index = {}
+        except json.JSONDecodeError:
+            index = fallback
+
+        if entry is None:
+            index.get(key, {}).pop(name, None)
+            if key in index and not index[key]:
+                del index[key]
+        else:
+            index.setdefault(key, {})[name] = entry
+        self._write_json(self.index_path, index)
+        self._index_stamp = self._stat_index()
+        return index
+
+    def _reload_if_changed(self) -> Optional[Dict[str, Dict[str, Dict[str, Any]]]]:
+        """索引檔自上次讀寫後有變動時重新讀取（在執行緒中執行）"""
+        stamp = self._stat_index()
+        if stamp == self._index_stamp:
+            return None
+        try:
+            index = self._read_json(self.index_path) if stamp else {}
+        except json.JSONDecodeError:
+            return None  # 其他行程正在寫入時不應發生（os.replace），保留記憶體中的索引
+        self._index_stamp = stamp
+        return index
+
+    async def refresh(self):
+        """重新載入其他行程（叢集）修改過的索引"""
+        async with self._lock:
+            index = await asyncio.to_thread(self._reload_if_changed)
+            if index is not None:
+                self.index = index
+
+    async def list(self, key: str) -> Dict[str, Dict[str, Any]]:
+        """列出擁有者的所有歌單（索引檔沒有變動時只讀取記憶體中的索引）"""
+        await self.refresh()
+        return self.index.get(key, {})
+
+    def get(self, key: str, name: str) -> Optional[Dict[str, Any]]:
+        return self.index.get(key, {}).get(name)
+
+    async def save(self, key: str, name: str, tracks: List[Dict[str, str]]):
+        """儲存歌單；tracks 為 {"id", "title"} 紀錄"""
+        path = self._playlist_path(key, name)
+        async with self._lock:
+            await asyncio.to_thread(self._write_json, path, tracks)
+            entry = {
+                "count": len(tracks),
+                "file": os.path.basename(path),
+                "updated": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            }
+            self.index.setdefault(key, {})[name] = entry
+            self.index = await asyncio.to_thread(
+                self._update_index, key, name, entry, copy.deepcopy(self.index)
+            )
+
+    async def load(self, key: str, name: str) -> Optional[List[Dict[str, str]]]:
+        """讀取歌單的歌曲紀錄，歌單不存在時回傳 None"""
+        await self.refresh()
+        entry = self.get(key, name)
+        if not entry:
+            return None
+        path = os.path.join(self.directory, entry["file"])
+        try:
+            return await asyncio.to_thread(self._read_json, path)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logger.error(f"讀取歌單 {name} 失敗：{str(e)}")
+            return None
+
+    async def delete(self, key: str, name: str) -> bool:
+        """刪除歌單，回傳是否存在"""
+        await self.refresh()
+        async with self._lock:
+            entry = self.index.get(key, {}).pop(name, None)
+            if entry is None:
+                return False
+            if not self.index[key]:
+                del self.index[key]
+            self.index = await asyncio.to_thread(
+                self._update_index, key, name, None, copy.deepcopy(self.index)
+            )
+            try:
+                await asyncio.to_thread(
+                    os.remove, os.path.join(self.directory, entry["file"])
+                )
+            except FileNotFoundError:
+                pass
+            return True
@@ -0,0 +1,157 @@
+"""
+音樂佇列持久化 - 預寫式日誌（journal）與快照
+
+每個伺服器各自有一個快照檔與一個只追加的日誌檔：
+- <guild_id>.snapshot.json：某個時間點的完整佇列狀態
+- <guild_id>.journal：快照之後的佇列變動，每行一筆 JSON
+
+變動先放入記憶體中的待寫清單，由背景批次寫入（在執行緒中執行），
+日誌過長時壓縮為新的快照。啟動時不讀取任何檔案，
+伺服器第一次使用佇列時才載入該伺服器的資料。
+
+每筆日誌紀錄帶有遞增的序號（seq），快照記下它涵蓋到的序號（journal_seq）。
+替換快照後、清空日誌前當機時，日誌中已被快照涵蓋的紀錄在載入時會被略過，
+不會重複套用。
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueStore:
+    """佇列日誌與快照的讀寫"""
+
+    def __init__(self, directory: str, compact_threshold: int = 500):
+        self.directory = directory
+        self.compact_threshold = compact_threshold
+        self._pending: List[Tuple[int, str, Any]] = []  # (guild_id, 類型, 資料)
+        self._journal_lengths: Dict[int, int] = defaultdict(int)
+        self._seq: Dict[int, int] = defaultdict(int)  # 每個伺服器最後一筆紀錄的序號
+        self._write_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _snapshot_path(self, guild_id: int) -> str:
+        return os.path.join(self.directory, f"{guild_id}.snapshot.json")
+
+    def _journal_path(self, guild_id: int) -> str:
+        return os.path.join(self.directory, f"{guild_id}.journal")
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def append(self, guild_id: int, record: Dict[str, Any]):
+        """記錄一筆佇列變動（只放入記憶體，由 flush 批次寫入）"""
+        self._seq[guild_id] += 1
+        self._pending.append((guild_id, "record", dict(record, seq=self._seq[guild_id])))
+        self._journal_lengths[guild_id] += 1
+
+    def journaled_guilds(self) -> List[int]:
+        """日誌中仍有未壓縮紀錄的伺服器"""
+        return [gid for gid, length in self._journal_lengths.items() if length > 0]
+
+    def needs_compaction(self, guild_id: int) -> bool:
+        return self._journal_lengths[guild_id] >= self.compact_threshold
+
+    def schedule_snapshot(self, guild_id: int, state: Dict[str, Any]):
+        """排入一個快照；寫入快照後會清空該伺服器的日誌"""
+        state = dict(state, journal_seq=self._seq[guild_id])
+        self._pending.append((guild_id, "snapshot", state))
+        self._journal_lengths[guild_id] = 0
+
+    def take_batch(self) -> List[Tuple[int, str, Any]]:
+        """取出目前所有待寫資料（在事件迴圈上呼叫）"""
+        batch, self._pending = self._pending, []
+        return batch
+
+    def flush(self) -> int:
+        """取出並寫入所有待寫資料，回傳寫入的筆數（可在執行緒中執行）
+
+        取出與寫入在同一個鎖內完成：背景寫入與卸載時的最後一次寫入不會重疊，
+        也不會以相反的順序寫入。
+        """
+        with self._write_lock:
+            batch = self.take_batch()
+            if batch:
+                self.write_batch(batch)
+            return len(batch)
+
+    def write_batch(self, batch: List[Tuple[int, str, Any]]):
+        """依序寫入一批資料（可在執行緒中執行）
+
+        同一伺服器的日誌行會合併為一次寫入並 fsync；
+        快照以原子方式替換並清空日誌，快照之前尚未寫入的紀錄直接捨棄
+        （快照已包含這些變動）。
+        """
+        lines: Dict[int, List[str]] = defaultdict(list)
+
+        for guild_id, kind, data in batch:
+            if kind == "record":
+                lines[guild_id].append(json.dumps(data, ensure_ascii=False) + "\n")
+            else:
+                lines.pop(guild_id, None)
+                self._write_snapshot(guild_id, data)
+
+        for guild_id, guild_lines in lines.items():
+            with open(self._journal_path(guild_id), "a", encoding="utf-8") as f:
+                f.write("".join(guild_lines))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _write_snapshot(self, guild_id: int, state: Dict[str, Any]):
+        path = self._snapshot_path(guild_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        # 快照已涵蓋日誌內容，清空日誌
+        open(self._journal_path(guild_id), "w", encoding="utf-8").close()
+
+    def load(
+        self, guild_id: int
+    ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """讀取伺服器的快照與其後的日誌紀錄"""
+        snapshot = None
+        snapshot_seq = last_seq = 0
+        records: List[Dict[str, Any]] = []
+
+        try:
+            with open(self._snapshot_path(guild_id), "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot.pop("journal_seq", 0)
+        except FileNotFoundError:
+            pass
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"讀取佇列快照失敗 (伺服器 ID: {guild_id}): {str(e)}")
+
+        try:
+            with open(self._journal_path(guild_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 當機時最後一行可能只寫了一半，忽略之後的內容
+                        logger.warning(f"佇列日誌有不完整的紀錄 (伺服器 ID: {guild_id})")
+                        break
+                    seq = record.pop("seq", None)
+                    if seq is not None:
+                        if seq <= snapshot_seq:
+                            continue  # 已包含在快照中（替換快照後、清空日誌前當機）
+                        last_seq = max(last_seq, seq)
+                    records.append(record)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"讀取佇列日誌失敗 (伺服器 ID: {guild_id}): {str(e)}")
+
+        self._journal_lengths[guild_id] = len(records)
+        self._seq[guild_id] = max(self._seq[guild_id], snapshot_seq, last_seq)
+        return snapshot, records
@@ -0,0 +1,199 @@
+"""PlaybackActor 的事件順序：跳過、停止、過期的結束事件與失敗退避"""
+
+import asyncio
+
+from playback_actor import FAILED, FINISHED, PLAYING, PlaybackActor
+
+GUILD_ID = 1
+
+
+class FakeDriver:
+    """依序回傳 outcomes 中的結果；用完後一律回傳 PLAYING"""
+
+    def __init__(self, outcomes=()):
+        self.outcomes = list(outcomes)
+        self.started = []  # (token, 開始時間)
+        self.stopped = 0
+        self.traces = []
+        self.failed = []
+        self.gate = None  # 設定後 start_next 會等待這個事件
+
+    async def start_next(self, guild_id, ctx, trace, token):
+        self.started.append((token, asyncio.get_running_loop().time()))
+        if self.gate is not None:
+            await self.gate.wait()
+        return self.outcomes.pop(0) if self.outcomes else PLAYING
+
+    def finish_trace(self, trace, outcome):
+        self.traces.append((trace, outcome))
+
+    def stop_voice(self, guild_id):
+        self.stopped += 1
+
+    async def playback_failed(self, guild_id, ctx, failures):
+        self.failed.append(failures)
+
+
+async def settle():
+    """讓信箱與準備任務處理完目前的事件"""
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+def make_actor(driver, **kwargs):
+    kwargs.setdefault("backoff_base", 0.05)
+    kwargs.setdefault("backoff_max", 1.0)
+    return PlaybackActor(GUILD_ID, driver, **kwargs)
+
+
+async def test_enqueue_starts_once_and_track_end_advances():
+    driver = FakeDriver()
+    actor = make_actor(driver)
+
+    assert await actor.enqueue() is True
+    await settle()
+    assert await actor.enqueue(trace="t") is False  # 已在播放：只加入佇列
+    assert driver.traces == [("t", "queued")]
+    first = actor.token
+    assert [token for token, _ in driver.started] == [first]
+
+    actor.notify_track_end(first)
+    await settle()
+    assert len(driver.started) == 2
+    assert actor.token == driver.started[-1][0] != first
+    actor.close()
+
+
+async def test_skip_ignores_the_skipped_tracks_end_event():
+    driver = FakeDriver()
+    actor = make_actor(driver)
+    await actor.enqueue()
+    await settle()
+    skipped = actor.token
+
+    assert await actor.skip() is True
+    await settle()
+    assert driver.stopped == 1
+    current = actor.token
+    assert current != skipped
+
+    # 被跳過的歌曲在停止後才送達的結束事件不會再跳一首
+    actor.notify_track_end(skipped)
+    await settle()
+    assert actor.token == current
+    assert len(driver.started) == 2
+    actor.close()
+
+
+async def test_skip_while_preparing_cancels_and_starts_next():
+    driver = FakeDriver()
+    driver.gate = asyncio.Event()
+    actor = make_actor(driver)
+    await actor.enqueue()
+    await settle()
+    preparing = driver.started[0][0]
+
+    assert await actor.skip() is True
+    driver.gate.set()
+    await settle()
+    assert driver.stopped == 1
+    assert len(driver.started) == 2
+    assert actor.token == driver.started[1][0] != preparing
+    actor.close()
+
+
+async def test_stop_cancels_retry_and_ignores_later_events():
+    driver = FakeDriver([FAILED])
+    actor = make_actor(driver, backoff_base=0.05)
+    await actor.enqueue()
+    await settle()
+    assert actor.busy  # 等待重試
+
+    await actor.stop()
+    assert not actor.busy
+    await asyncio.sleep(0.1)
+    await settle()
+    assert len(driver.started) == 1  # 停止後不會重試
+
+    await actor.enqueue()
+    await settle()
+    token = actor.token
+    await actor.stop()
+    actor.notify_track_end(token)
+    await settle()
+    assert actor.token is None
+    assert len(driver.started) == 2
+    actor.close()
+
+
+async def test_failures_back_off_exponentially_then_reset():
+    driver = FakeDriver([FAILED, FAILED, PLAYING])
+    actor = make_actor(driver, backoff_base=0.05)
+    await actor.enqueue()
+    await asyncio.sleep(0.3)
+    await settle()
+
+    times = [started for _, started in driver.started]
+    assert len(times) == 3
+    first_gap, second_gap = times[1] - times[0], times[2] - times[1]
+    assert first_gap >= 0.05
+    assert second_gap >= 0.1  # 第二次失敗等待加倍
+    assert actor.failures == 0
+    assert actor.token == driver.started[-1][0]
+    actor.close()
+
+
+async def test_max_failures_reports_and_stops_retrying():
+    driver = FakeDriver([FAILED, FAILED])
+    actor = make_actor(driver, max_failures=2, backoff_base=0.01)
+    await actor.enqueue()
+    await asyncio.sleep(0.1)
+    await settle()
+
+    assert driver.failed == [2]
+    assert len(driver.started) == 2
+    assert not actor.busy
+    actor.close()
+
+
+async def test_skip_during_backoff_retries_immediately():
+    driver = FakeDriver([FAILED])
+    actor = make_actor(driver, backoff_base=10.0)
+    await actor.enqueue()
+    await settle()
+    assert actor.busy and actor.token is None
+
+    assert await actor.skip() is True  # 不應回報「目前沒有正在播放的歌曲」
+    await settle()
+    assert len(driver.started) == 2
+    assert actor.token == driver.started[1][0]
+    assert driver.stopped == 0  # 退避中沒有正在播放的音軌需要停止
+    actor.close()
+
+
+async def test_skip_when_idle_returns_false():
+    driver = FakeDriver([FINISHED])
+    actor = make_actor(driver)
+    assert await actor.skip() is False
+
+    await actor.enqueue()
+    await settle()
+    assert not actor.busy  # 佇列已播放完畢
+    assert await actor.skip() is False
+    actor.close()
+
+
+async def test_playback_failed_errors_are_logged(caplog):
+    driver = FakeDriver([FAILED])
+
+    async def playback_failed(guild_id, ctx, failures):
+        raise RuntimeError("無法回覆")
+
+    driver.playback_failed = playback_failed
+    actor = make_actor(driver, max_failures=1)
+    await actor.enqueue()
+    await settle()
+
+    assert not actor._tasks  # 任務完成後釋放參考
+    assert "無法回覆" in caplog.text
+    actor.close()
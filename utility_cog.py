@@ -7,6 +7,9 @@ from datetime import datetime, timedelta
 import json
 import os
 
+# 此擴展需要的 Gateway 意圖（由 main.build_gateway_profile 彙整）
+REQUIRED_INTENTS = ("guilds", "voice_states")
+
 
 class Utility(commands.Cog):
     def __init__(self, bot):
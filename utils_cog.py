@@ -9,6 +9,9 @@ from config import REMINDERS_DATA_PATH, DATA_DIR
 import logging
 from pathlib import Path
 
+# 此擴展需要的 Gateway 意圖：/random 讀取語音頻道成員，提醒需要頻道快取
+REQUIRED_INTENTS = ("guilds", "voice_states")
+
 
 class Utils(commands.Cog):
     def __init__(self, bot):
@@ -0,0 +1,95 @@
+"""
+語音閒置管理 - 以單一計時器堆積管理每個伺服器的離開期限
+
+取代定期輪詢所有伺服器：語音狀態或播放狀態改變時才排入／取消期限，
+由一個背景任務等待最早到期的期限，到期時立即呼叫回調釋放資源。
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from guild_settings import GuildSettings
+
+logger = logging.getLogger(__name__)
+
+
+class IdleScheduler:
+    """每個伺服器最多一個期限的計時器堆積
+
+    heap 中的過期項目採延遲刪除：取消或重新排程時只更新 _deadlines，
+    彈出時與 _deadlines 不一致的項目直接略過。
+    """
+
+    def __init__(self, callback: Callable[[int, str], Awaitable[None]]):
+        self.callback = callback
+        self._heap: List[Tuple[float, int, str]] = []
+        self._deadlines: Dict[int, Tuple[float, str]] = {}  # guild_id -> (期限, 原因)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, guild_id):
+        return guild_id in self._deadlines
+
+    def reason(self, guild_id: int) -> Optional[str]:
+        entry = self._deadlines.get(guild_id)
+        return entry[1] if entry else None
+
+    def schedule(self, guild_id: int, delay: float, reason: str):
+        """排入期限；已有相同原因的期限時保留原本的期限（不因其他事件延後）"""
+        if self.reason(guild_id) == reason:
+            return
+        deadline = time.monotonic() + max(0.0, delay)
+        self._deadlines[guild_id] = (deadline, reason)
+        heapq.heappush(self._heap, (deadline, guild_id, reason))
+        self._wakeup.set()
+
+    def cancel(self, guild_id: int):
+        self._deadlines.pop(guild_id, None)
+        # 取消很常見（每次開始播放），過期項目太多時重建堆積
+        if len(self._heap) > 64 and len(self._heap) > 4 * len(self._deadlines):
+            self._heap = [(d, g, r) for g, (d, r) in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            while self._heap:
+                deadline, guild_id, reason = self._heap[0]
+                if self._deadlines.get(guild_id) != (deadline, reason):
+                    heapq.heappop(self._heap)  # 已取消或已重新排程
+                    continue
+                timeout = deadline - time.monotonic()
+                if timeout > 0:
+                    break
+                heapq.heappop(self._heap)
+                del self._deadlines[guild_id]
+                try:
+                    await self.callback(guild_id, reason)
+                except Exception as e:
+                    logger.error(f"處理閒置期限時發生錯誤 (伺服器 ID: {guild_id}): {str(e)}")
+                timeout = None
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+
+class IdleTimeoutSettings(GuildSettings):
+    """每個伺服器的閒置逾時設定（秒），未設定時使用預設值"""
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+
+import discord
+from discord.ext import commands, tasks
+
+from config import (
+    LOOP_WATCHDOG_ENABLED,
+    LOOP_WATCHDOG_INTERVAL,
+    LOOP_WATCHDOG_THRESHOLD,
+    LOOP_WATCHDOG_REPORT_MINUTES,
+)
+from loop_watchdog import LoopWatchdog
+
+# 此擴展需要的 Gateway 意圖（由 main.build_gateway_profile 彙整）
+REQUIRED_INTENTS = ("guilds",)
+
+
+class Watchdog(commands.Cog):
+    """事件迴圈看門狗：標記指令所屬的任務，定期彙整阻塞位置"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.logger = logging.getLogger(__name__)
+        self.watchdog = LoopWatchdog(
+            interval=LOOP_WATCHDOG_INTERVAL,
+            threshold=LOOP_WATCHDOG_THRESHOLD,
+            cog_for_module=self._cog_for_module,
+        )
+        self._reported_stalls = 0
+
+    async def cog_load(self):
+        self.watchdog.start()
+        # 前綴與混合指令：在執行指令的任務上標記 cog 與指令
+        self.bot.before_invoke(self._label_command)
+        # 斜線指令：CommandTree 在同一個任務中先呼叫 interaction_check
+        self.bot.tree.interaction_check = self._label_interaction
+        self.report_stalls.change_interval(minutes=LOOP_WATCHDOG_REPORT_MINUTES)
+        self.report_stalls.start()
+        self.logger.info(
+            f"事件迴圈看門狗已啟動（每 {LOOP_WATCHDOG_INTERVAL * 1000:.0f} ms 檢查，"
+            f"阻塞超過 {LOOP_WATCHDOG_THRESHOLD * 1000:.0f} ms 時擷取堆疊）"
+        )
+
+    async def cog_unload(self):
+        self.report_stalls.cancel()
+        self.watchdog.stop()
+        if getattr(self.bot, "_before_invoke", None) == self._label_command:
+            self.bot._before_invoke = None
+        if self.bot.tree.__dict__.get("interaction_check") == self._label_interaction:
+            del self.bot.tree.interaction_check
+
+    def _cog_for_module(self, module: str):
+        """在看門狗執行緒中呼叫：模組所屬的 cog 名稱"""
+        try:
+            for cog in list(self.bot.cogs.values()):
+                if type(cog).__module__ == module:
+                    return cog.qualified_name
+        except RuntimeError:
+            pass  # 載入或卸載 cog 時字典正在變動
+        return None
+
+    async def _label_command(self, ctx: commands.Context):
+        self.watchdog.label_task(
+            asyncio.current_task(),
+            cog=ctx.cog.qualified_name if ctx.cog else None,
+            command=ctx.command.qualified_name if ctx.command else ctx.invoked_with,
+        )
+
+    async def _label_interaction(self, interaction: discord.Interaction) -> bool:
+        command = interaction.command
+        if command is not None:
+            binding = getattr(command, "binding", None)
+            self.watchdog.label_task(
+                asyncio.current_task(),
+                cog=binding.qualified_name if isinstance(binding, commands.Cog) else None,
+                command=command.qualified_name,
+            )
+        return True
+
+    @tasks.loop(minutes=30)
+    async def report_stalls(self):
+        """有新的阻塞時將累計阻塞最久的位置寫入日誌"""
+        if self.watchdog.stalls > self._reported_stalls:
+            self._reported_stalls = self.watchdog.stalls
+            self.watchdog.log_summary()
+
+    @commands.hybrid_command(name="loopstats", description="查看事件迴圈延遲與阻塞位置（機器人擁有者）")
+    async def loop_stats(self, ctx: commands.Context):
+        """顯示事件迴圈延遲與累計阻塞最久的程式碼位置"""
+        if not await self.bot.is_owner(ctx.author):
+            await ctx.send("你沒有權限使用此指令！", ephemeral=True)
+            return
+
+        lag = self.watchdog.lag_stats.summary()
+        if lag["count"]:
+            lag_text = " / ".join(
+                f"{lag[key] * 1000:.1f}" for key in ("p50", "p95", "p99", "max")
+            ) + " ms"
+        else:
+            lag_text = "尚無資料"
+        embed = discord.Embed(
+            title="⏱️ 事件迴圈看門狗",
+            description=(
+                f"延遲 p50 / p95 / p99 / 最大：{lag_text}\n"
+                f"阻塞超過 {self.watchdog.threshold * 1000:.0f} ms：{self.watchdog.stalls} 次"
+            ),
+            color=discord.Color.blue(),
+        )
+        for index, offender in enumerate(self.watchdog.worst(5), 1):
+            embed.add_field(
+                name=f"{index}. {offender['location']}",
+                value=(
+                    f"{offender['count']} 次｜累計 {offender['total'] * 1000:.0f} ms｜"
+                    f"最長 {offender['max'] * 1000:.0f} ms\n"
+                    f"cog: {offender['cog'] or '-'}｜指令: {offender['command'] or '-'}｜"
+                    f"協程: {offender['coroutine'] or '-'}"
+                    + (f"\n```py\n{offender['code'][:200]}\n```" if offender["code"] else "")
+                ),
+                inline=False,
+            )
+        if not self.watchdog.offenders:
+            embed.add_field(name="阻塞位置", value="沒有記錄到阻塞", inline=False)
+        await ctx.send(embed=embed, ephemeral=True)
+
+
+async def setup(bot):
+    """設置事件迴圈看門狗"""
+    if not LOOP_WATCHDOG_ENABLED:
+        logging.getLogger(__name__).info("事件迴圈看門狗已停用 (LOOP_WATCHDOG_ENABLED=false)")
+        return
+    await bot.add_cog(Watchdog(bot))
@@ -0,0 +1,114 @@
+"""
+YouTube Data API 非同步搜尋客戶端 - 以 aiohttp 取代在事件迴圈上阻塞的 googleapiclient
+"""
+
+import asyncio
+import logging
+import re
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+YOUTUBE_API_BASE_URL = "https://www.googleapis.com/youtube/v3"
+
+
+class YouTubeSearchError(Exception):
+    """YouTube API 回傳非 2xx 狀態或無法解析的回應"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class YouTubeSearchClient:
+    """共用連線池的 YouTube 搜尋客戶端
+
+    ClientSession 會在第一次搜尋時才建立（必須在事件迴圈內建立），
+    之後所有搜尋共用同一個 keep-alive 連線池。
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        base_url: str = YOUTUBE_API_BASE_URL,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        pool_size: int = 20,
+        keepalive_timeout: float = 60.0,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout, sock_connect=connect_timeout
+        )
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """取得（必要時建立）共用的 ClientSession"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                limit_per_host=self.pool_size,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+                ssl=False,  # 與機器人其他部分一致，不驗證 SSL 憑證
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout
+            )
+        return self._session
+
+    async def search(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        """搜尋影片，回傳與 search().list().execute() 相同格式的回應"""
+        if not self.api_key:
+            raise YouTubeSearchError("YOUTUBE_API_KEY 未設定")
+
+        params = {
+            "q": query,
+            "part": "id,snippet",
+            "maxResults": str(max_results),
+            "type": "video",
+            "key": self.api_key,
+        }
+        session = self._get_session()
+        try:
+            async with session.get(f"{self.base_url}/search", params=params) as resp:
+                if resp.status != 200:
+                    text = await resp.text()
+                    raise YouTubeSearchError(
+                        f"YouTube API 回傳 HTTP {resp.status}: {text[:200]}",
+                        status=resp.status,
+                    )
+                return await resp.json(content_type=None)
+        except asyncio.TimeoutError:
+            raise YouTubeSearchError(f"YouTube API 搜尋逾時: {query}")
+        except aiohttp.ClientError as e:
+            raise YouTubeSearchError(f"YouTube API 連線錯誤: {str(e)}")
+
+    async def close(self):
+        """關閉連線池"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+_VIDEO_ID_PATTERN = re.compile(
+    r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/)([A-Za-z0-9_-]{11})"
+)
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """從 YouTube 網址取出 11 字元的影片 ID，無法辨識時回傳 None"""
+    if not url:
+        return None
+    match = _VIDEO_ID_PATTERN.search(url)
+    if match:
+        return match.group(1)
+    if re.fullmatch(r"[A-Za-z0-9_-]{11}", url):
+        return url
+    return None